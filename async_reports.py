@@ -0,0 +1,109 @@
+# Async insights report jobs
+# For long ranges on big accounts the synchronous /insights call times out or
+# pages very slowly, so we submit the query as a report run, poll it, and then
+# read the finished result page by page
+
+import threading
+import time
+from datetime import datetime
+
+# When to switch from the normal call to an async job
+ASYNC_LEVELS = ('adset', 'ad')
+ASYNC_MIN_DAYS = 45
+ASYNC_MIN_ROWS = 5000
+
+# Polling - start quick, back off to at most POLL_MAX_DELAY between checks
+POLL_INITIAL_DELAY = 1.0
+POLL_MAX_DELAY = 30.0
+POLL_BACKOFF = 1.5
+JOB_TIMEOUT = 15 * 60
+
+# Rows per result page when reading the finished report
+PAGE_LIMIT = 500
+
+JOB_COMPLETED = 'Job Completed'
+JOB_FAILED_STATUSES = ('Job Failed', 'Job Skipped')
+
+
+class AsyncReportError(Exception):
+    pass
+
+
+# Row counts from earlier pulls, used to guess how big the next one will be
+_row_counts = {}
+_row_counts_lock = threading.Lock()
+
+
+# Daily (time_increment=1) pulls return one row per entity per day, so they are tracked separately
+def remember_row_count(account_id, level, since, until, row_count, daily=False):
+    days = _days_in_range(since, until)
+    with _row_counts_lock:
+        _row_counts[(account_id, level, daily)] = row_count / days
+
+
+def expected_row_count(account_id, level, since, until, daily=False):
+    with _row_counts_lock:
+        rows_per_day = _row_counts.get((account_id, level, daily))
+    if rows_per_day is None:
+        return None
+    return int(rows_per_day * _days_in_range(since, until))
+
+
+def _days_in_range(since, until):
+    since_day = datetime.strptime(str(since)[:10], '%Y-%m-%d')
+    until_day = datetime.strptime(str(until)[:10], '%Y-%m-%d')
+    return max((until_day - since_day).days + 1, 1)
+
+
+# Decide whether a query should go through an async report job
+def should_use_async(level, since, until, expected_rows=None):
+    if level not in ASYNC_LEVELS:
+        return False
+    if _days_in_range(since, until) >= ASYNC_MIN_DAYS:
+        return True
+    return expected_rows is not None and expected_rows >= ASYNC_MIN_ROWS
+
+
+# Start the report job - returns an AdReportRun
+def submit_report(account, fields, params):
+    return account.get_insights(fields=fields, params=params, is_async=True)
+
+
+# Poll the job until it finishes, backing off between checks
+def wait_for_report(report_run, timeout=JOB_TIMEOUT, sleep=time.sleep, clock=time.monotonic):
+    deadline = clock() + timeout
+    delay = POLL_INITIAL_DELAY
+
+    while True:
+        report_run.api_get(fields=['async_status', 'async_percent_completion'])
+        status = report_run.get('async_status')
+
+        if status == JOB_COMPLETED:
+            return report_run
+        if status in JOB_FAILED_STATUSES:
+            raise AsyncReportError(f"Report {report_run.get('id')} ended with status: {status}")
+        if clock() + delay > deadline:
+            raise AsyncReportError(f"Report {report_run.get('id')} still running after {timeout}s "
+                                   f"({report_run.get('async_percent_completion', 0)}% done)")
+
+        sleep(delay)
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+
+# Yield the finished report one page at a time, as plain dicts
+def iter_report_pages(report_run, page_limit=PAGE_LIMIT):
+    cursor = report_run.get_insights(params={'limit': page_limit})
+    while len(cursor) > 0:
+        yield [cursor[i].export_all_data() for i in range(len(cursor))]
+        if not cursor.load_next_page():
+            break
+
+
+# Run one insights query as an async job and yield the finished result a page of
+# row dicts at a time, so each page can be reduced before the next one is read
+# (a 'limit' in params sizes the result pages instead of going to the job)
+def iter_insights_async(account, fields, params):
+    params = dict(params)
+    page_limit = params.pop('limit', PAGE_LIMIT)
+    report_run = wait_for_report(submit_report(account, fields, params))
+    yield from iter_report_pages(report_run, page_limit=page_limit)
@@ -0,0 +1,408 @@
+# Local stand-in for the Graph API insights endpoints and the Klaviyo endpoints
+# the dashboard uses - for load tests that must not touch real ad accounts.
+#
+#   python -m benchmarks.fake_api --port 8765 --latency-ms 150 --page-size 100
+#
+# Point the dashboard at it with
+#   FACEBOOK_GRAPH_URL=http://127.0.0.1:8765 KLAVIYO_BASE_URL=http://127.0.0.1:8765/api
+#
+# Graph: GET/POST act_<id>/insights (sync + async report jobs), report status,
+# report insights, cursor pagination and usage headers that climb with traffic.
+# Klaviyo: campaigns (links.next pagination), metrics, campaign-values-reports.
+# Latency, page sizes and error / throttle injection are configurable.
+# GET /__stats returns call counts, POST /__reset clears them.
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import date, timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_insights, shape_for
+
+ID_FIELDS = ['campaign_id', 'adset_id', 'ad_id', 'date_start', 'date_stop']
+KLAVIYO_STATISTICS = ['recipients', 'delivered', 'opens_unique', 'clicks_unique', 'conversions', 'conversion_value']
+PLACED_ORDER_METRIC_ID = 'PLACEDORDER'
+
+
+class FakeApiConfig:
+    def __init__(self, latency_ms=120, jitter_ms=60, page_size=25, ads_per_account=300,
+                 error_rate=0.0, throttle_rate=0.0, call_budget=600, budget_window=60,
+                 report_seconds=2.0, klaviyo_campaigns=40, klaviyo_page_size=10, klaviyo_429_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        # Rows per page when the request doesn't ask for a limit (Graph's default is 25)
+        self.page_size = page_size
+        self.ads_per_account = ads_per_account
+        # Fraction of Graph calls answered with a 500 / a throttle error
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        # Calls per account per window before usage hits 100% and calls get throttled
+        self.call_budget = call_budget
+        self.budget_window = budget_window
+        self.report_seconds = report_seconds
+        self.klaviyo_campaigns = klaviyo_campaigns
+        self.klaviyo_page_size = klaviyo_page_size
+        self.klaviyo_429_rate = klaviyo_429_rate
+
+
+def _seed(*parts):
+    return int(hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:12], 16)
+
+
+def _days(since, until):
+    start = date.fromisoformat(since)
+    end = date.fromisoformat(until)
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+@lru_cache(maxsize=512)
+def _day_rows(account_id, day, ads_per_account):
+    # A day is roughly a thirtieth of the generator's month of traffic; only
+    # a slice of the ads deliver on any given day
+    rows = generate_insights(*shape_for(ads_per_account), seed=_seed(account_id, day))
+    rnd = random.Random(_seed(account_id, day, 'active'))
+    active = [row for row in rows if rnd.random() < 0.6]
+    for row in active:
+        row['date_start'] = row['date_stop'] = day
+    return active
+
+
+@lru_cache(maxsize=256)
+def insights_rows(account_id, level, since, until, daily, ads_per_account):
+    # Imported here, not at the top: daily_store pulls in the dashboard's cache
+    # modules, which read their settings from the environment on import - and the
+    # load test only sets that environment after importing this module
+    from daily_store import combine_daily_rows
+
+    rows = []
+    for day in _days(since, until):
+        day_rows = _day_rows(account_id, day.isoformat(), ads_per_account)
+        if daily:
+            for row in combine_daily_rows(day_rows, level):
+                row['date_start'] = row['date_stop'] = day.isoformat()
+                rows.append(row)
+        else:
+            rows.extend(day_rows)
+    if daily:
+        return rows
+    combined = combine_daily_rows(rows, level)
+    for row in combined:
+        row['date_start'], row['date_stop'] = since, until
+    return combined
+
+
+def select_fields(rows, fields):
+    keep = set(fields) | set(ID_FIELDS)
+    return [{key: value for key, value in row.items() if key in keep} for row in rows]
+
+
+class FakeApiState:
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.injected = defaultdict(int)
+        self.recent = defaultdict(deque)
+        self.reports = {}
+        self.report_ids = itertools.count(900000000000001)
+
+    def count(self, name):
+        with self.lock:
+            self.calls[name] += 1
+
+    def inject(self, name):
+        with self.lock:
+            self.injected[name] += 1
+
+    # Usage percent for an account over the budget window (and record this call)
+    def usage(self, account_id):
+        now = time.monotonic()
+        with self.lock:
+            calls = self.recent[account_id]
+            calls.append(now)
+            while calls and calls[0] < now - self.config.budget_window:
+                calls.popleft()
+            return min(len(calls) / self.config.call_budget * 100, 100.0)
+
+    def stats(self):
+        with self.lock:
+            return {'calls': dict(self.calls), 'injected': dict(self.injected), 'total_calls': sum(self.calls.values())}
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+            self.injected.clear()
+            self.recent.clear()
+
+
+def _graph_params(query, body):
+    raw = {key: values[-1] for key, values in parse_qs(query).items()}
+    raw.update({key: values[-1] for key, values in parse_qs(body).items()})
+    params = {}
+    for key, value in raw.items():
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    if isinstance(params.get('fields'), str):
+        params['fields'] = params['fields'].split(',')
+    return params
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None  # set on the server's handler class
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        config = self.state.config
+        time.sleep(max(config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms), 0) / 1000)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length).decode('utf-8') if length else ''
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+    def _route(self, method):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        body = self._body()
+
+        if parts == ['__stats']:
+            return self._send(200, self.state.stats())
+        if parts == ['__reset'] and method == 'POST':
+            self.state.reset()
+            return self._send(200, {'ok': True})
+
+        if parts and parts[0] == 'api':
+            return self._klaviyo(method, parts[1:], url, body)
+        if parts and parts[0].startswith('v'):
+            return self._graph(method, parts[1:], url, body)
+        return self._send(404, {'error': 'not found'})
+
+    # Graph API
+    def _graph_error(self, status, code, message, headers=None):
+        return self._send(status, {'error': {'message': message, 'type': 'OAuthException', 'code': code, 'fbtrace_id': 'fake'}}, headers)
+
+    def _usage_headers(self, account_id):
+        usage_pct = self.state.usage(account_id)
+        regain = 0 if usage_pct < 100 else max(int(self.state.config.budget_window / 60), 1)
+        return usage_pct, {
+            'x-fb-ads-insights-throttle': json.dumps({'app_id_util_pct': usage_pct / 2, 'acc_id_util_pct': usage_pct}),
+            'x-business-use-case-usage': json.dumps({account_id.replace('act_', ''): [{
+                'type': 'ads_insights', 'call_count': usage_pct, 'total_cputime': usage_pct / 2,
+                'total_time': usage_pct / 2, 'estimated_time_to_regain_access': regain
+            }]})
+        }
+
+    def _graph(self, method, parts, url, body):
+        config = self.state.config
+        params = _graph_params(url.query, body)
+        self._delay()
+
+        account_id = parts[0] if parts and parts[0].startswith('act_') else self.state.reports.get(parts[0], {}).get('account_id', 'other') if parts else 'other'
+        usage_pct, headers = self._usage_headers(account_id)
+
+        if random.random() < config.error_rate:
+            self.state.inject('graph_500')
+            return self._graph_error(500, 2, 'Service temporarily unavailable', headers)
+        if usage_pct >= 100 or random.random() < config.throttle_rate:
+            self.state.inject('graph_throttle')
+            return self._graph_error(400, 80004, 'There have been too many calls to this ad-account.', headers)
+
+        if len(parts) == 2 and parts[1] == 'insights' and parts[0].startswith('act_'):
+            if method == 'POST':
+                self.state.count('graph_report_submit')
+                report_id = str(next(self.state.report_ids))
+                self.state.reports[report_id] = {'account_id': parts[0], 'params': params, 'started': time.monotonic()}
+                return self._send(200, {'report_run_id': report_id}, headers)
+            self.state.count('graph_insights_page')
+            return self._insights_page(parts[0], params, url, headers)
+
+        report = self.state.reports.get(parts[0]) if parts else None
+        if report is not None and len(parts) == 1:
+            self.state.count('graph_report_status')
+            progress = min((time.monotonic() - report['started']) / config.report_seconds, 1.0)
+            return self._send(200, {
+                'id': parts[0],
+                'async_status': 'Job Completed' if progress >= 1 else 'Job Running',
+                'async_percent_completion': int(progress * 100)
+            }, headers)
+        if report is not None and len(parts) == 2 and parts[1] == 'insights':
+            self.state.count('graph_insights_page')
+            report_params = dict(report['params'])
+            report_params.update({key: value for key, value in params.items() if key in ('limit', 'after')})
+            return self._insights_page(report['account_id'], report_params, url, headers)
+
+        return self._graph_error(400, 100, f"Unsupported request: {method} {url.path}")
+
+    def _insights_page(self, account_id, params, url, headers):
+        time_range = params.get('time_range') or {}
+        today = date.today().isoformat()
+        rows = insights_rows(
+            account_id, params.get('level', 'ad'),
+            time_range.get('since', today), time_range.get('until', today),
+            bool(params.get('time_increment')), self.state.config.ads_per_account
+        )
+        limit = int(params.get('limit') or self.state.config.page_size)
+        offset = int(params.get('after') or 0)
+        page = select_fields(rows[offset:offset + limit], params.get('fields') or [])
+
+        payload = {'data': page, 'paging': {'cursors': {'before': str(offset), 'after': str(offset + limit)}}}
+        if offset + limit < len(rows):
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            query['after'] = str(offset + limit)
+            payload['paging']['next'] = f"http://{self.headers.get('Host')}{url.path}?{urlencode(query)}"
+        return self._send(200, payload, headers)
+
+    # Klaviyo
+    def _klaviyo(self, method, parts, url, body):
+        config = self.state.config
+        self._delay()
+        if random.random() < config.klaviyo_429_rate:
+            self.state.inject('klaviyo_429')
+            return self._send(429, {'errors': [{'status': 429, 'detail': 'Request was throttled.'}]}, {'Retry-After': '1'})
+
+        api_key = (self.headers.get('Authorization') or '').replace('Klaviyo-API-Key ', '')
+        if parts == ['campaigns']:
+            self.state.count('klaviyo_campaigns_page')
+            return self._klaviyo_campaigns(api_key, url)
+        if parts == ['metrics']:
+            self.state.count('klaviyo_metrics')
+            return self._send(200, {'data': [
+                {'type': 'metric', 'id': 'OPENEDEMAIL', 'attributes': {'name': 'Opened Email'}},
+                {'type': 'metric', 'id': PLACED_ORDER_METRIC_ID, 'attributes': {'name': 'Placed Order'}}
+            ], 'links': {'next': None}})
+        if parts == ['campaign-values-reports'] and method == 'POST':
+            self.state.count('klaviyo_values_report')
+            return self._klaviyo_values(api_key)
+        return self._send(404, {'errors': [{'status': 404, 'detail': f"Unsupported request: {method} {url.path}"}]})
+
+    def _campaigns(self, api_key):
+        rnd = random.Random(_seed('klaviyo', api_key))
+        return [
+            {'type': 'campaign', 'id': f"CAMP{i:05d}", 'attributes': {
+                'name': rnd.choice(['Weekly Newsletter', 'Flash Sale', 'New Arrivals', 'Win-back', 'VIP Early Access']) + f" #{i}",
+                'status': 'Sent', 'send_strategy': {'method': 'static'},
+                'created_at': '2025-01-01T00:00:00+00:00', 'send_time': '2025-01-02T15:00:00+00:00'
+            }}
+            for i in range(self.state.config.klaviyo_campaigns)
+        ]
+
+    def _klaviyo_campaigns(self, api_key, url):
+        query = parse_qs(url.query)
+        offset = int((query.get('page[cursor]') or ['0'])[-1])
+        size = self.state.config.klaviyo_page_size
+        campaigns = self._campaigns(api_key)
+        next_link = None
+        if offset + size < len(campaigns):
+            query['page[cursor]'] = [str(offset + size)]
+            next_link = f"http://{self.headers.get('Host')}{url.path}?{urlencode(query, doseq=True)}"
+        return self._send(200, {'data': campaigns[offset:offset + size], 'links': {'next': next_link}})
+
+    def _klaviyo_values(self, api_key):
+        rnd = random.Random(_seed('klaviyo-values', api_key))
+        results = []
+        for campaign in self._campaigns(api_key):
+            recipients = rnd.randint(500, 20000)
+            delivered = int(recipients * rnd.uniform(0.95, 0.995))
+            opens = int(delivered * rnd.uniform(0.1, 0.45))
+            clicks = int(opens * rnd.uniform(0.02, 0.2))
+            conversions = int(clicks * rnd.uniform(0.01, 0.1))
+            results.append({
+                'groupings': {'campaign_id': campaign['id'], 'send_channel': 'email'},
+                'statistics': {
+                    'recipients': recipients, 'delivered': delivered, 'opens_unique': opens,
+                    'clicks_unique': clicks, 'conversions': conversions,
+                    'conversion_value': round(conversions * rnd.uniform(30, 90), 2)
+                }
+            })
+        return self._send(200, {'data': {'type': 'campaign-values-report', 'attributes': {'results': results}}})
+
+
+# Start the fake API in a background thread; returns the server (call .shutdown() to stop)
+def start_server(config=None, host='127.0.0.1', port=0):
+    handler = type('BoundFakeApiHandler', (FakeApiHandler,), {'state': FakeApiState(config or FakeApiConfig())})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = handler.state
+    threading.Thread(target=server.serve_forever, name='fake-api', daemon=True).start()
+    return server
+
+
+def config_arguments(parser):
+    defaults = FakeApiConfig()
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms)
+    parser.add_argument('--jitter-ms', type=float, default=defaults.jitter_ms)
+    parser.add_argument('--page-size', type=int, default=defaults.page_size, help="Graph rows per page when no limit is sent")
+    parser.add_argument('--ads-per-account', type=int, default=defaults.ads_per_account)
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help="fraction of Graph calls that return a 500")
+    parser.add_argument('--throttle-rate', type=float, default=defaults.throttle_rate, help="fraction of Graph calls that are throttled")
+    parser.add_argument('--call-budget', type=int, default=defaults.call_budget, help="Graph calls per account per window")
+    parser.add_argument('--budget-window', type=float, default=defaults.budget_window)
+    parser.add_argument('--report-seconds', type=float, default=defaults.report_seconds, help="how long async report jobs run")
+    parser.add_argument('--klaviyo-campaigns', type=int, default=defaults.klaviyo_campaigns)
+    parser.add_argument('--klaviyo-page-size', type=int, default=defaults.klaviyo_page_size)
+    parser.add_argument('--klaviyo-429-rate', type=float, default=defaults.klaviyo_429_rate)
+
+
+def config_from_args(args):
+    return FakeApiConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, page_size=args.page_size,
+        ads_per_account=args.ads_per_account, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        call_budget=args.call_budget, budget_window=args.budget_window, report_seconds=args.report_seconds,
+        klaviyo_campaigns=args.klaviyo_campaigns, klaviyo_page_size=args.klaviyo_page_size,
+        klaviyo_429_rate=args.klaviyo_429_rate
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local fake Graph API + Klaviyo server for load tests")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = start_server(config_from_args(args), host=args.host, port=args.port)
+    print(f"fake API on http://{args.host}:{server.server_port}")
+    print(f"  FACEBOOK_GRAPH_URL=http://{args.host}:{server.server_port}")
+    print(f"  KLAVIYO_BASE_URL=http://{args.host}:{server.server_port}/api")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# Local stand-in for a Redis server - enough of the protocol for the dashboard's
+# cache backend (cache_backends.RedisBackend), so replica setups can be tried
+# without installing Redis.
+#
+#   python -m benchmarks.fake_redis --port 6390
+#
+# Point the dashboard at it with
+#   DASHBOARD_CACHE_BACKEND=redis DASHBOARD_REDIS_URL=redis://127.0.0.1:6390/0
+#
+# Commands: PING, AUTH, SELECT, GET, SET (EX / PX / NX / XX), DEL, EXISTS, PTTL,
+# SCAN, DBSIZE, FLUSHDB, and EVAL for the backend's lock-release script only (there
+# is no Lua here). Everything lives in memory; expiry is checked on access.
+
+import argparse
+import fnmatch
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_backends import RELEASE_LOCK_SCRIPT
+
+
+class FakeRedisState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.databases = {}
+        self.calls = Counter()
+
+    def db(self, index):
+        return self.databases.setdefault(index, {})
+
+    # Value for a key, dropping it first if it has expired (caller holds the lock)
+    def lookup(self, db, key):
+        entry = db.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del db[key]
+            return None
+        return entry
+
+    def stats(self):
+        with self.lock:
+            return {
+                'calls': dict(self.calls),
+                'keys': sum(len(db) for db in self.databases.values()),
+                'bytes': sum(len(value) for db in self.databases.values() for value, expires_at in db.values())
+            }
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    state = None  # set on the bound subclass by start_server
+
+    def handle(self):
+        self.db_index = 0
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            try:
+                reply = self._run(args)
+            except ValueError as e:
+                reply = RedisErrorReply(f"ERR {e}")
+            self.wfile.write(_encode(reply))
+            self.wfile.flush()
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.strip().split()  # inline command (e.g. from telnet)
+        args = []
+        for _ in range(int(line[1:-2])):
+            header = self.rfile.readline()
+            length = int(header[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _run(self, args):
+        name = args[0].decode('utf-8').upper()
+        state = self.state
+        with state.lock:
+            state.calls[name] += 1
+            db = state.db(self.db_index)
+            if name == 'PING':
+                return SimpleReply('PONG')
+            if name == 'AUTH':
+                return SimpleReply('OK')
+            if name == 'SELECT':
+                self.db_index = int(args[1])
+                return SimpleReply('OK')
+            if name == 'GET':
+                entry = state.lookup(db, args[1])
+                return entry[0] if entry else None
+            if name == 'SET':
+                return self._set(db, args[1:])
+            if name == 'DEL':
+                return sum(1 for key in args[1:] if state.lookup(db, key) is not None and db.pop(key))
+            if name == 'EXISTS':
+                return sum(1 for key in args[1:] if state.lookup(db, key) is not None)
+            if name == 'PTTL':
+                entry = state.lookup(db, args[1])
+                if entry is None:
+                    return -2
+                return -1 if entry[1] is None else int((entry[1] - time.monotonic()) * 1000)
+            if name == 'SCAN':
+                return self._scan(db, args[1:])
+            if name == 'DBSIZE':
+                return len(db)
+            if name == 'FLUSHDB':
+                db.clear()
+                return SimpleReply('OK')
+            if name == 'EVAL':
+                return self._eval(db, args[1:])
+        return RedisErrorReply(f"ERR unknown command '{name}'")
+
+    def _set(self, db, args):
+        key, value = args[0], args[1]
+        options = [arg.decode('utf-8').upper() for arg in args[2:]]
+        expires_at = None
+        i = 0
+        while i < len(options):
+            if options[i] in ('EX', 'PX'):
+                seconds = float(options[i + 1]) / (1 if options[i] == 'EX' else 1000)
+                expires_at = time.monotonic() + seconds
+                i += 2
+                continue
+            i += 1
+        exists = self.state.lookup(db, key) is not None
+        if ('NX' in options and exists) or ('XX' in options and not exists):
+            return None
+        db[key] = (value, expires_at)
+        return SimpleReply('OK')
+
+    # Compare-and-delete, run under the state lock like the real script is atomic
+    def _eval(self, db, args):
+        if args[0].decode('utf-8') != RELEASE_LOCK_SCRIPT or int(args[1]) != 1:
+            return RedisErrorReply("ERR only the cache backend's lock-release script is supported")
+        key, token = args[2], args[3]
+        entry = self.state.lookup(db, key)
+        if entry is None or entry[0] != token:
+            return 0
+        del db[key]
+        return 1
+
+    # The whole keyspace in one page - fine for a stand-in
+    def _scan(self, db, args):
+        pattern = '*'
+        for i, arg in enumerate(args):
+            if arg.upper() == b'MATCH':
+                pattern = args[i + 1].decode('utf-8')
+        keys = [key for key in list(db) if self.state.lookup(db, key) is not None
+                and fnmatch.fnmatchcase(key.decode('utf-8', 'replace'), pattern)]
+        return [b'0', keys]
+
+
+class SimpleReply(str):
+    pass
+
+
+class RedisErrorReply(str):
+    pass
+
+
+def _encode(reply):
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, RedisErrorReply):
+        return f"-{reply}\r\n".encode('utf-8')
+    if isinstance(reply, SimpleReply):
+        return f"+{reply}\r\n".encode('utf-8')
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode('utf-8')
+    if isinstance(reply, list):
+        return f"*{len(reply)}\r\n".encode('utf-8') + b''.join(_encode(item) for item in reply)
+    if isinstance(reply, str):
+        reply = reply.encode('utf-8')
+    return f"${len(reply)}\r\n".encode('utf-8') + reply + b"\r\n"
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+# Start the stand-in in a background thread; returns the server (call .shutdown() to stop)
+def start_server(host='127.0.0.1', port=0):
+    handler = type('BoundFakeRedisHandler', (FakeRedisHandler,), {'state': FakeRedisState()})
+    server = _Server((host, port), handler)
+    server.state = handler.state
+    server.server_port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, name='fake-redis', daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Redis stand-in for the dashboard's shared cache")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args(argv)
+
+    server = start_server(host=args.host, port=args.port)
+    print(f"fake Redis on {args.host}:{server.server_port}")
+    print(f"  DASHBOARD_CACHE_BACKEND=redis DASHBOARD_REDIS_URL=redis://{args.host}:{server.server_port}/0")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+# Load test - N simulated dashboard sessions against the local fake API
+#
+#   python -m benchmarks.load_test --sessions 8 --loads 5
+#   python -m benchmarks.load_test --sessions 20 --latency-ms 300 --error-rate 0.02
+#   python -m benchmarks.load_test --api-url http://127.0.0.1:8765   # fake API already running
+#
+# Every session is a Streamlit AppTest of dashboard.py in its own process: AppTest
+# swaps process-wide state (the runtime, st.secrets) on every run and compiles the
+# script as it goes, so sessions sharing a process break each other. The sessions
+# share the run's cache directory - the shared cache tier (or whatever
+# DASHBOARD_CACHE_BACKEND names), its fill locks and the daily store - like
+# replicas on one host; each has its own memory tier, single-flight and rate
+# limiter. Each load picks a client and a date preset and is timed end to end.
+# Reports p50/p95/p99 page-load latency, throughput, and the upstream calls the
+# fake API saw.
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_api import config_arguments, config_from_args, start_server
+
+DASHBOARD_PATH = os.path.join(ROOT, 'dashboard.py')
+DEFAULT_SESSIONS = 4
+DEFAULT_LOADS = 3
+PAGE_TIMEOUT = 300
+
+# st.error messages that mean a fetch failed (the rest are recommendation cards)
+FETCH_ERROR_PREFIXES = ('API Error', 'Klaviyo API Error', '❌ Could not connect')
+
+# Session state / secrets every simulated session starts with
+SECRETS = {
+    'dashboard_password': 'load-test',
+    'facebook_token': 'load-test-token',
+    'klaviyo_api_key': 'load-test-klaviyo'
+}
+
+
+# The dashboard's modules read their settings at import time, so this runs
+# before anything imports them: fake API hosts, a throwaway cache directory, no warmer
+def configure_environment(api_url, cache_dir):
+    os.environ['FACEBOOK_GRAPH_URL'] = api_url
+    os.environ['KLAVIYO_BASE_URL'] = f"{api_url}/api"
+    os.environ['DASHBOARD_CACHE_WARMER'] = '0'
+    os.environ['DASHBOARD_CACHE_DIR'] = os.path.join(cache_dir, 'insights')
+    os.environ['DASHBOARD_KLAVIYO_CACHE_DIR'] = os.path.join(cache_dir, 'klaviyo')
+    os.environ['DASHBOARD_DAILY_STORE_PATH'] = os.path.join(cache_dir, 'daily.sqlite')
+    os.environ['DASHBOARD_METRICS_FILE'] = os.path.join(cache_dir, 'metrics.prom')
+    os.environ['DASHBOARD_METRICS_LOG'] = '0'
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def fetch_json(url, method='GET'):
+    request = urllib.request.Request(url, method=method, data=b'' if method == 'POST' else None)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+# One simulated user: open the dashboard, then switch client / date range `loads` times.
+# Runs in its own process; the environment set by configure_environment is inherited.
+def run_session(session_id, loads, presets, clients, seed, think_seconds, start_delay, barrier, results):
+    from streamlit.testing.v1 import AppTest
+    import pipeline  # noqa: F401 - import the dashboard's modules before the clock starts
+
+    rnd = random.Random(seed + session_id)
+    at = AppTest.from_file(DASHBOARD_PATH, default_timeout=PAGE_TIMEOUT)
+    for key, value in SECRETS.items():
+        at.secrets[key] = value
+    at.session_state['password_correct'] = True
+
+    barrier.wait()
+    time.sleep(start_delay)
+    for load in range(loads):
+        client = rnd.choice(clients)
+        preset = rnd.choice(presets)
+        started_at = time.time()
+        started = time.perf_counter()
+        error = None
+        try:
+            if load == 0:
+                at.run()
+            if at.sidebar.selectbox[0].value != client or at.sidebar.selectbox[1].value != preset:
+                at.sidebar.selectbox[0].set_value(client)
+                at.sidebar.selectbox[1].set_value(preset)
+                at.run()
+            if at.exception:
+                error = at.exception[0].value
+            else:
+                error = next((e.value for e in at.error if e.value.startswith(FETCH_ERROR_PREFIXES)), None)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - started
+        results.put({
+            'session': session_id,
+            'load': load,
+            'client': client,
+            'preset': preset,
+            'started_at': started_at,
+            'seconds': seconds,
+            'error': error
+        })
+        if think_seconds:
+            time.sleep(rnd.uniform(0, think_seconds))
+
+
+# Sessions start together once every process has imported the dashboard's modules
+# (process start-up isn't timed); wall time runs from the first load to the last
+def run_load_test(sessions, loads, presets, clients, seed=42, think_seconds=0.0, ramp_seconds=0.0):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(sessions)
+    queue = context.Queue()
+    processes = []
+    for session_id in range(sessions):
+        start_delay = ramp_seconds * session_id / (sessions - 1) if ramp_seconds and sessions > 1 else 0.0
+        process = context.Process(
+            target=run_session, name=f"session-{session_id}",
+            args=(session_id, loads, presets, clients, seed, think_seconds, start_delay, barrier, queue)
+        )
+        process.start()
+        processes.append(process)
+    results = [queue.get() for _ in range(sessions * loads)]
+    for process in processes:
+        process.join()
+    wall_seconds = max(result['started_at'] + result['seconds'] for result in results) - min(result['started_at'] for result in results)
+    return results, wall_seconds
+
+
+def summarize(results, wall_seconds, upstream):
+    latencies = [result['seconds'] for result in results if not result['error']]
+    errors = [result for result in results if result['error']]
+    return {
+        'page_loads': len(results),
+        'errors': len(errors),
+        'error_samples': sorted({result['error'][:160] for result in errors})[:5],
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_loads_per_s': round(len(results) / wall_seconds, 3) if wall_seconds else None,
+        'latency_seconds': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies) if latencies else None
+        },
+        'upstream': upstream
+    }
+
+
+def format_summary(summary):
+    latency = summary['latency_seconds']
+
+    def ms(value):
+        return f"{value * 1000:9.0f} ms" if value is not None else '        -'
+
+    lines = [
+        f"page loads     {summary['page_loads']} ({summary['errors']} with errors) in {summary['wall_seconds']:.1f}s",
+        f"throughput     {summary['throughput_loads_per_s']} loads/s",
+        f"latency p50    {ms(latency['p50'])}",
+        f"        p95    {ms(latency['p95'])}",
+        f"        p99    {ms(latency['p99'])}",
+        f"        max    {ms(latency['max'])}",
+        f"upstream calls {summary['upstream'].get('total_calls', 0)}"
+    ]
+    for name, count in sorted(summary['upstream'].get('calls', {}).items()):
+        lines.append(f"  {name:<24} {count}")
+    for name, count in sorted(summary['upstream'].get('injected', {}).items()):
+        lines.append(f"  injected {name:<15} {count}")
+    for sample in summary['error_samples']:
+        lines.append(f"  error: {sample}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive simulated dashboard sessions against the fake API")
+    parser.add_argument('--sessions', type=int, default=DEFAULT_SESSIONS, help="concurrent sessions")
+    parser.add_argument('--loads', type=int, default=DEFAULT_LOADS, help="page loads per session")
+    parser.add_argument('--presets', nargs='+', default=['Last 7 Days', 'Last 14 Days', 'Last 30 Days'],
+                        help="date presets sessions pick from")
+    parser.add_argument('--clients', nargs='+', help="clients sessions pick from (default: all)")
+    parser.add_argument('--think-seconds', type=float, default=0.0, help="max pause between a session's loads")
+    parser.add_argument('--ramp-seconds', type=float, default=0.0, help="spread session starts over this long")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--api-url', help="use an already running fake API instead of starting one")
+    parser.add_argument('--cache-dir', help="dashboard cache directory (default: a fresh temp dir, i.e. cold caches)")
+    parser.add_argument('--output', help="write the summary (and every load) as JSON here")
+    config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = None
+    api_url = args.api_url
+    if not api_url:
+        server = start_server(config_from_args(args))
+        api_url = f"http://127.0.0.1:{server.server_port}"
+    api_url = api_url.rstrip('/')
+    configure_environment(api_url, args.cache_dir or tempfile.mkdtemp(prefix='dashboard-load-'))
+    fetch_json(f"{api_url}/__reset", method='POST')
+
+    # Imported only now - pipeline's modules read the environment set above
+    from pipeline import CLIENTS
+    clients = args.clients or list(CLIENTS)
+
+    print(f"{args.sessions} sessions x {args.loads} loads against {api_url}")
+    results, wall_seconds = run_load_test(
+        args.sessions, args.loads, args.presets, clients,
+        seed=args.seed, think_seconds=args.think_seconds, ramp_seconds=args.ramp_seconds
+    )
+    summary = summarize(results, wall_seconds, fetch_json(f"{api_url}/__stats"))
+    print(format_summary(summary))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'loads': results}, f, indent=2)
+    if server is not None:
+        server.shutdown()
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
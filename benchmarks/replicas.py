@@ -0,0 +1,142 @@
+# Replica test - N dashboard processes sharing one cache backend, all asking for
+# the same reports at the same moment, against the local fake API
+#
+#   python -m benchmarks.replicas --replicas 4 --backend redis
+#   python -m benchmarks.replicas --replicas 4 --backend sqlite --presets "Last 7 Days" "Last 30 Days"
+#   python -m benchmarks.replicas --replicas 4 --backend none      # every replica on its own
+#
+# Each replica is a separate process with its own memory tier and daily store
+# (like a replica on its own node); only the cache backend is shared. With a
+# shared backend the upstream call counts should match a single replica's: one
+# replica fetches each query while the others wait for its entry.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_api import config_arguments, config_from_args, start_server
+from benchmarks.load_test import SECRETS, configure_environment, fetch_json
+
+BACKENDS = ['redis', 'sqlite', 'none']
+DEFAULT_REPLICAS = 4
+
+
+# One replica: wait for the others, then build every requested report and time it.
+# Its environment (own cache directories, shared backend) is set by the parent
+# before the process starts - the cache modules read it as soon as they are imported.
+def run_replica(replica_id, clients, presets, barrier, results):
+    from pipeline import CLIENTS, build_client_report, preset_date_range
+
+    barrier.wait()
+    for client_name in clients:
+        for preset in presets:
+            start_date, end_date = preset_date_range(preset)
+            started = time.perf_counter()
+            error = None
+            try:
+                build_client_report(SECRETS['facebook_token'], CLIENTS[client_name], start_date, end_date,
+                                    klaviyo_api_key=SECRETS['klaviyo_api_key'])
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            results.put({
+                'replica': replica_id,
+                'client': client_name,
+                'preset': preset,
+                'seconds': time.perf_counter() - started,
+                'error': error
+            })
+
+
+def backend_environment(backend, work_dir):
+    if backend == 'redis':
+        from benchmarks.fake_redis import start_server as start_redis
+        server = start_redis()
+        return server, {'DASHBOARD_CACHE_BACKEND': 'redis',
+                        'DASHBOARD_REDIS_URL': f"redis://127.0.0.1:{server.server_port}/0"}
+    if backend == 'sqlite':
+        return None, {'DASHBOARD_CACHE_BACKEND': 'sqlite',
+                      'DASHBOARD_CACHE_SQLITE_PATH': os.path.join(work_dir, 'shared-cache.sqlite')}
+    # Nothing shared: each replica keeps its own disk cache
+    return None, {'DASHBOARD_CACHE_BACKEND': 'disk'}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several dashboard processes against one shared cache backend")
+    parser.add_argument('--replicas', type=int, default=DEFAULT_REPLICAS)
+    parser.add_argument('--backend', choices=BACKENDS, default='redis', help="shared cache backend ('none': no sharing)")
+    parser.add_argument('--presets', nargs='+', default=['Last 7 Days'], help="date presets every replica builds")
+    parser.add_argument('--clients', nargs='+', help="clients every replica builds (default: all)")
+    parser.add_argument('--output', help="write the summary (and every report) as JSON here")
+    config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='dashboard-replicas-')
+    server = start_server(config_from_args(args))
+    api_url = f"http://127.0.0.1:{server.server_port}"
+    backend_server, backend_env = backend_environment(args.backend, work_dir)
+
+    configure_environment(api_url, os.path.join(work_dir, 'main'))
+    from pipeline import CLIENTS
+    clients = args.clients or list(CLIENTS)
+
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(args.replicas)
+    results = context.Queue()
+    print(f"{args.replicas} replicas x {len(clients)} clients x {len(args.presets)} presets, "
+          f"backend {args.backend}, against {api_url}")
+
+    started = time.perf_counter()
+    processes = [
+        context.Process(target=run_replica, name=f"replica-{replica_id}",
+                        args=(replica_id, clients, args.presets, barrier, results))
+        for replica_id in range(args.replicas)
+    ]
+    for replica_id, process in enumerate(processes):
+        configure_environment(api_url, os.path.join(work_dir, f"replica-{replica_id}"))
+        os.environ.update(backend_env)
+        process.start()
+    reports = [results.get() for _ in range(args.replicas * len(clients) * len(args.presets))]
+    for process in processes:
+        process.join()
+    wall_seconds = time.perf_counter() - started
+
+    upstream = fetch_json(f"{api_url}/__stats")
+    errors = [report for report in reports if report['error']]
+    summary = {
+        'replicas': args.replicas,
+        'backend': args.backend,
+        'reports': len(reports),
+        'errors': len(errors),
+        'wall_seconds': round(wall_seconds, 3),
+        'slowest_report_seconds': round(max(report['seconds'] for report in reports), 3),
+        'upstream': upstream
+    }
+    if backend_server is not None:
+        summary['backend_calls'] = backend_server.state.stats()['calls']
+
+    print(f"reports        {summary['reports']} ({summary['errors']} with errors) in {summary['wall_seconds']:.1f}s")
+    print(f"slowest report {summary['slowest_report_seconds']:.2f}s")
+    print(f"upstream calls {upstream.get('total_calls', 0)}")
+    for name, count in sorted(upstream.get('calls', {}).items()):
+        print(f"  {name:<24} {count}")
+    for error in sorted({report['error'][:160] for report in errors})[:5]:
+        print(f"  error: {error}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'reports': reports}, f, indent=2)
+    server.shutdown()
+    if backend_server is not None:
+        backend_server.shutdown()
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
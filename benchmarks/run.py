@@ -0,0 +1,201 @@
+# Benchmark suite for the insights pipeline - runs offline (no Streamlit, no network)
+#
+#   python -m benchmarks.run                                  # 100 / 1k / 10k / 100k ads
+#   python -m benchmarks.run --sizes 1000 10000 --repeat 5
+#   python -m benchmarks.run --compare benchmarks/results/<commit>.json
+#
+# Every stage is timed (best of --repeat runs), then run once more under
+# tracemalloc for its peak memory. Results are written as JSON keyed by
+# commit, so two runs can be compared stage by stage.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_insights, as_ads_insights, shape_for
+from cache_backends import encode_entry
+from data_table import filter_by_name, sorted_page
+from insights_frame import process_insights_data
+from pipeline import account_totals
+from recommendations import evaluate_rules
+from rollups import rollup_insights
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+DEFAULT_REPEAT = 3
+AVG_ORDER_VALUE = 50
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# A stage slower than this (percent) than the baseline is flagged in --compare
+REGRESSION_PCT = 10.0
+
+
+def _rules(frames):
+    return [evaluate_rules(frames[level], level) for level in ('campaign', 'adset', 'ad')]
+
+
+def _table_page(ads_df):
+    filtered = filter_by_name(ads_df, 'ugc', ['campaign_name', 'adset_name', 'ad_name'])
+    return sorted_page(filtered, 'roas', False, 1, 50)
+
+
+# (name, fn(inputs)) - inputs are built once per size, outside the timings
+STAGES = [
+    ('export_all_data', lambda inputs: [insight.export_all_data() for insight in inputs['objects']]),
+    ('process_insights', lambda inputs: process_insights_data(inputs['rows'], AVG_ORDER_VALUE)),
+    ('rollup_campaign', lambda inputs: rollup_insights(inputs['ads_df'], 'campaign')),
+    ('rollup_adset', lambda inputs: rollup_insights(inputs['ads_df'], 'adset')),
+    ('totals', lambda inputs: account_totals(inputs['frames']['campaign'])),
+    ('rules', lambda inputs: _rules(inputs['frames'])),
+    ('table_page', lambda inputs: _table_page(inputs['ads_df'])),
+    ('cache_payload', lambda inputs: encode_entry(None, 0.0, inputs['rows']))
+]
+
+
+def build_inputs(ads):
+    rows = generate_insights(*shape_for(ads), avg_order_value=AVG_ORDER_VALUE)
+    ads_df = process_insights_data(rows, AVG_ORDER_VALUE)
+    return {
+        'rows': rows,
+        'objects': as_ads_insights(rows),
+        'ads_df': ads_df,
+        'frames': {
+            'campaign': rollup_insights(ads_df, 'campaign'),
+            'adset': rollup_insights(ads_df, 'adset'),
+            'ad': ads_df
+        }
+    }
+
+
+def time_stage(fn, inputs, repeat):
+    # One untimed run first so imports / caches warming up don't count
+    fn(inputs)
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn(inputs)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def peak_memory(fn, inputs):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(inputs)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_suite(sizes, repeat, stages=None, log=print):
+    results = []
+    for ads in sizes:
+        shape = shape_for(ads)
+        inputs = build_inputs(ads)
+        log(f"{len(inputs['rows']):,} ads ({shape[0]} campaigns x {shape[1]} ad sets x {shape[2]} ads)")
+        for name, fn in STAGES:
+            if stages and name not in stages:
+                continue
+            timings = time_stage(fn, inputs, repeat)
+            peak = peak_memory(fn, inputs)
+            results.append({
+                'ads': ads,
+                'rows': len(inputs['rows']),
+                'shape': list(shape),
+                'stage': name,
+                'best_seconds': min(timings),
+                'mean_seconds': sum(timings) / len(timings),
+                'peak_mb': peak / (1024 * 1024)
+            })
+            log(f"  {name:<18} {min(timings) * 1000:10.2f} ms   peak {peak / (1024 * 1024):8.2f} MB")
+    return results
+
+
+def git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment():
+    return {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+
+# Stage-by-stage change against a baseline report
+def compare(baseline, report, regression_pct=REGRESSION_PCT):
+    base = {(result['ads'], result['stage']): result for result in baseline['results']}
+    lines = [f"baseline {baseline['meta']['commit']} -> {report['meta']['commit']}",
+             f"{'ads':>8}  {'stage':<18} {'base ms':>10} {'new ms':>10} {'change':>8} {'peak MB':>9}"]
+    regressions = 0
+    for result in report['results']:
+        previous = base.get((result['ads'], result['stage']))
+        if previous is None:
+            continue
+        change = (result['best_seconds'] / previous['best_seconds'] - 1) * 100 if previous['best_seconds'] else 0.0
+        flag = ''
+        if change > regression_pct:
+            flag = '  << slower'
+            regressions += 1
+        lines.append(f"{result['ads']:>8}  {result['stage']:<18} {previous['best_seconds'] * 1000:10.2f} "
+                     f"{result['best_seconds'] * 1000:10.2f} {change:+7.1f}% {result['peak_mb']:9.2f}{flag}")
+    return "\n".join(lines), regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the insights pipeline on synthetic data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="approximate ad counts to run")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="timed runs per stage (best is kept)")
+    parser.add_argument('--stages', nargs='+', choices=[name for name, fn in STAGES], help="only run these stages")
+    parser.add_argument('--output', help="report path (default benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="baseline report to compare against")
+    parser.add_argument('--fail-on-regression', action='store_true', help="exit 1 if any stage is slower than the baseline")
+    args = parser.parse_args(argv)
+
+    report = {'meta': environment(), 'results': run_suite(args.sizes, args.repeat, stages=args.stages)}
+    report['meta']['repeat'] = args.repeat
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nreport written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        text, regressions = compare(baseline, report)
+        print("\n" + text)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# Synthetic Graph API insights - N campaigns x M ad sets x K ads with the same
+# shape the API returns (numbers as strings, nested actions / action_values /
+# cost_per_action_type arrays), so the pipeline can be measured offline
+
+import random
+
+from facebook_business.adobjects.adsinsights import AdsInsights
+
+# Funnel steps in order - each step converts a fraction of the one before
+FUNNEL_ACTIONS = ['link_click', 'landing_page_view', 'add_to_cart', 'initiate_checkout', 'purchase']
+PURCHASE_ALIASES = ['offsite_conversion.fb_pixel_purchase', 'omni_purchase']
+ENGAGEMENT_ACTIONS = ['post_engagement', 'page_engagement', 'video_view', 'post_reaction', 'comment']
+OTHER_CONVERSIONS = ['complete_registration', 'app_install']
+
+
+def _fmt(value):
+    return f"{value:.2f}"
+
+
+def _ad_row(rnd, campaign, adset, ad, avg_order_value):
+    impressions = rnd.randint(200, 60000)
+    ctr = rnd.uniform(0.2, 3.5)
+    clicks = int(impressions * ctr / 100)
+    spend = impressions / 1000 * rnd.uniform(4, 45)
+    reach = int(impressions / rnd.uniform(1.05, 2.5))
+
+    actions = []
+    counts = {}
+    previous = clicks
+    for action_type in FUNNEL_ACTIONS:
+        count = previous if action_type == 'link_click' else int(previous * rnd.uniform(0.1, 0.7))
+        counts[action_type] = count
+        previous = count
+        if count:
+            actions.append({'action_type': action_type, 'value': str(count)})
+    if counts['purchase']:
+        for alias in PURCHASE_ALIASES:
+            actions.append({'action_type': alias, 'value': str(counts['purchase'])})
+    for action_type in rnd.sample(ENGAGEMENT_ACTIONS, rnd.randint(0, len(ENGAGEMENT_ACTIONS))):
+        actions.append({'action_type': action_type, 'value': str(rnd.randint(1, clicks * 3 + 1))})
+    if rnd.random() < 0.1:
+        actions.append({'action_type': rnd.choice(OTHER_CONVERSIONS), 'value': str(rnd.randint(1, 20))})
+
+    row = {
+        'campaign_id': f"{120200000000000000 + campaign}",
+        'campaign_name': f"Campaign {campaign:03d} | Prospecting",
+        'adset_id': f"{120210000000000000 + campaign * 1000 + adset}",
+        'adset_name': f"Ad Set {campaign:03d}-{adset:03d} | Broad 25-54",
+        'ad_id': f"{120220000000000000 + (campaign * 1000 + adset) * 1000 + ad}",
+        'ad_name': f"Ad {campaign:03d}-{adset:03d}-{ad:03d} | UGC video",
+        'spend': _fmt(spend),
+        'impressions': str(impressions),
+        'clicks': str(clicks),
+        'reach': str(reach),
+        'frequency': f"{impressions / reach:.6f}" if reach else '0',
+        'ctr': f"{ctr:.6f}",
+        'cpm': f"{spend / impressions * 1000:.6f}" if impressions else '0',
+        'date_start': '2025-01-01',
+        'date_stop': '2025-01-30'
+    }
+    # The API leaves out empty arrays entirely
+    if actions:
+        row['actions'] = actions
+        row['cost_per_action_type'] = [
+            {'action_type': action['action_type'], 'value': _fmt(spend / float(action['value']))}
+            for action in actions if float(action['value']) > 0
+        ]
+    if counts['purchase']:
+        revenue = counts['purchase'] * avg_order_value * rnd.uniform(0.6, 1.6)
+        row['action_values'] = [
+            {'action_type': action_type, 'value': _fmt(revenue)}
+            for action_type in ['purchase'] + PURCHASE_ALIASES
+        ]
+    return row
+
+
+# Ad-level rows for campaigns x adsets_per_campaign x ads_per_adset ads
+def generate_insights(campaigns, adsets_per_campaign, ads_per_adset, avg_order_value=50, seed=42):
+    rnd = random.Random(seed)
+    return [
+        _ad_row(rnd, campaign, adset, ad, avg_order_value)
+        for campaign in range(campaigns)
+        for adset in range(adsets_per_campaign)
+        for ad in range(ads_per_adset)
+    ]
+
+
+# The same rows wrapped the way the SDK hands them back from get_insights()
+def as_ads_insights(rows):
+    objects = []
+    for row in rows:
+        insight = AdsInsights()
+        insight._set_data(row)
+        objects.append(insight)
+    return objects
+
+
+# Pick a campaigns x adsets x ads shape for roughly `ads` ads
+def shape_for(ads):
+    campaigns = max(1, round((ads / 100) ** (1 / 3) * 5))
+    adsets = max(1, round((ads / campaigns) ** 0.5))
+    ads_per_adset = max(1, round(ads / (campaigns * adsets)))
+    return campaigns, adsets, ads_per_adset
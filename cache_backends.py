@@ -0,0 +1,511 @@
+# Shared cache backends - the tier behind each process's in-memory LRU
+# With several Streamlit replicas behind a load balancer, pointing them all at the
+# same backend means a query one replica fetched is a cache hit on the others.
+#
+#   DASHBOARD_CACHE_BACKEND=disk     one file per entry (default; one host, one replica)
+#   DASHBOARD_CACHE_BACKEND=sqlite   one SQLite file in WAL mode (replicas on one host)
+#   DASHBOARD_CACHE_BACKEND=redis    any Redis-protocol server (replicas on several hosts)
+#
+# Every backend stores opaque bytes and has the same methods:
+#   get(key) -> bytes or None
+#   set(key, data, expire_seconds)   expire_seconds=None keeps it until pushed out
+#   delete(key), clear()
+#   acquire_lock(key, ttl) -> token or None (someone else holds it)
+#   release_lock(key, token)
+# Locks expire after ttl seconds, so a replica that dies mid-fetch can't block a key.
+#
+# Entries are encoded with encode_entry: a one-line JSON header (expiry, fetch
+# time, codec) followed by the rows as a zstd-compressed Arrow IPC stream, or as
+# zlib-compressed JSON for anything that isn't a list of flat-ish dicts (Klaviyo
+# summaries) or when pyarrow isn't installed.
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from urllib.parse import urlparse, unquote
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+CACHE_BACKEND = os.environ.get("DASHBOARD_CACHE_BACKEND", "disk")
+SQLITE_PATH = os.environ.get(
+    "DASHBOARD_CACHE_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "cache.sqlite")
+)
+REDIS_URL = os.environ.get("DASHBOARD_REDIS_URL", "redis://127.0.0.1:6379/0")
+REDIS_PREFIX = os.environ.get("DASHBOARD_REDIS_PREFIX", "dashboard:")
+
+# How long an expired entry is kept as a stale fallback before the backend drops it
+# (Redis only - the disk and SQLite backends keep entries until the size budget pushes them out)
+STALE_KEEP_SECONDS = int(os.environ.get("DASHBOARD_CACHE_STALE_KEEP_SECONDS", 7 * 24 * 60 * 60))
+
+
+class CacheBackendError(Exception):
+    pass
+
+
+# Errors a backend can raise when it is unreachable or broken - callers treat
+# them as a miss, never as a failed page
+BACKEND_ERRORS = (OSError, sqlite3.Error, CacheBackendError)
+
+
+# ---- entry encoding ----
+
+def _arrow_rows(rows):
+    if pa is None or not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        return None
+    # Nested values (actions, action_values) go in as JSON text, so every row
+    # comes back exactly as it went in whatever action types it has
+    columns = {}
+    json_columns = set()
+    for index, row in enumerate(rows):
+        for column, value in row.items():
+            if value is None:
+                return None  # missing and None would come back the same
+            values = columns.get(column)
+            if values is None:
+                values = columns[column] = [None] * len(rows)
+            if isinstance(value, (list, dict)):
+                json_columns.add(column)
+                value = json.dumps(value)
+            values[index] = value
+    try:
+        table = pa.table(columns)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None  # mixed types in a column
+    table = table.replace_schema_metadata({'json_columns': json.dumps(sorted(json_columns))})
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression='zstd')
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _rows_from_arrow(payload):
+    table = pa.ipc.open_stream(payload).read_all()
+    json_columns = set(json.loads((table.schema.metadata or {}).get(b'json_columns', b'[]')))
+    rows = []
+    for row in table.to_pylist():
+        rows.append({
+            column: json.loads(value) if column in json_columns else value
+            for column, value in row.items() if value is not None
+        })
+    return rows
+
+
+def encode_entry(expires_at, fetched_at, rows):
+    payload = _arrow_rows(rows)
+    codec = 'arrow'
+    if payload is None:
+        payload = zlib.compress(json.dumps(rows).encode('utf-8'))
+        codec = 'json'
+    header = json.dumps({'expires_at': expires_at, 'fetched_at': fetched_at, 'codec': codec})
+    return header.encode('utf-8') + b'\n' + payload
+
+
+# (expires_at, fetched_at, rows), or None if the bytes aren't a readable entry -
+# or, with newer_than, an entry fetched at or before then (the rows aren't decoded)
+def decode_entry(data, newer_than=None):
+    try:
+        header_line, payload = data.split(b'\n', 1)
+        header = json.loads(header_line)
+        if newer_than is not None and (header.get('fetched_at') or 0) <= newer_than:
+            return None
+        if header['codec'] == 'arrow':
+            if pa is None:
+                return None
+            rows = _rows_from_arrow(payload)
+        else:
+            rows = json.loads(zlib.decompress(payload))
+        return header['expires_at'], header.get('fetched_at'), rows
+    except (ValueError, KeyError, zlib.error):
+        return None
+    except Exception as e:
+        if pa is not None and isinstance(e, pa.ArrowException):
+            return None
+        raise
+
+
+def _new_token():
+    return uuid.uuid4().hex
+
+
+# ---- disk: one file per entry ----
+# (.json files are entries written before the backends existed - still counted
+# against the budget and cleared, never read)
+
+class DiskBackend:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key, suffix='.entry'):
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # expire_seconds is ignored - files stay as stale fallbacks until the size budget pushes them out
+    def set(self, key, data, expire_seconds=None):
+        tmp_path = self._path(f"{key}.{_new_token()}", '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        self._prune()
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(('.entry', '.json', '.lock', '.claimed')):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    # The lock is a file created with O_EXCL holding the holder's token; a lock file
+    # older than its ttl is taken to belong to a dead process and is replaced
+    def acquire_lock(self, key, ttl):
+        path = self._path(key, '.lock')
+        token = _new_token()
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._take_over_expired(path, ttl):
+                    return None
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(token)
+            return token
+        return None
+
+    # Clear an expired lock file out of the way (True) so the caller can try the
+    # O_EXCL create again. The file is renamed to a name of our own first - only
+    # one process can do that - and if it turns out another process had already
+    # replaced the expired lock with a fresh one, that lock is put back
+    def _take_over_expired(self, path, ttl):
+        try:
+            # Token and age from the same open file, so they belong to the same lock
+            with open(path, 'r') as f:
+                expired_holder = f.read()
+                expired_at = os.fstat(f.fileno()).st_mtime + ttl
+        except FileNotFoundError:
+            return True
+        if expired_at > time.time():
+            return False
+
+        claimed_path = f"{path}.{_new_token()}.claimed"
+        try:
+            os.rename(path, claimed_path)
+        except FileNotFoundError:
+            return True
+        try:
+            with open(claimed_path, 'r') as f:
+                claimed_holder = f.read()
+            if claimed_holder != expired_holder:
+                try:
+                    os.link(claimed_path, path)
+                except OSError:
+                    pass
+                return False
+        finally:
+            self._remove(claimed_path)
+        return True
+
+    def release_lock(self, key, token):
+        path = self._path(key, '.lock')
+        try:
+            with open(path, 'r') as f:
+                holder = f.read()
+        except FileNotFoundError:
+            return
+        if holder == token:
+            self._remove(path)
+
+    # Drop the least recently written entries until we fit the budget
+    def _prune(self):
+        files = []
+        total_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(('.entry', '.json')):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total_bytes += stat.st_size
+
+        if total_bytes <= self.max_bytes:
+            return
+
+        for mtime, size, path in sorted(files):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# ---- SQLite in WAL mode: every process on the host shares one file ----
+
+class SQLiteBackend:
+    def __init__(self, db_path, namespace, max_bytes):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        # One connection per thread (a sqlite3 connection can't be shared between
+        # threads), kept open for that thread's later calls
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT, key TEXT, value BLOB, size INTEGER, written_at REAL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_locks (
+                    namespace TEXT, key TEXT, token TEXT, expires_at REAL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+
+    # `with self._connect() as conn` is one transaction (committed, or rolled back
+    # on an error); the connection stays open. It is closed when its thread ends.
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            # WAL makes a commit a sequential append; NORMAL skips the fsync per commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, key, data, expire_seconds=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, sqlite3.Binary(data), len(data), time.time())
+            )
+            self._prune(conn)
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+            conn.execute("DELETE FROM cache_locks WHERE namespace = ?", (self.namespace,))
+
+    # Takes the lock if nobody holds it or the holder's lock has expired
+    def acquire_lock(self, key, ttl):
+        token = _new_token()
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                INSERT INTO cache_locks VALUES (?, ?, ?, ?)
+                ON CONFLICT (namespace, key) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at
+                WHERE cache_locks.expires_at <= ?
+            """, (self.namespace, key, token, now + ttl, now))
+        return token if cursor.rowcount == 1 else None
+
+    def release_lock(self, key, token):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM cache_locks WHERE namespace = ? AND key = ? AND token = ?", (self.namespace, key, token)
+            )
+
+    # Drop the least recently written entries until the namespace fits the budget
+    def _prune(self, conn):
+        total_bytes = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        evict = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY written_at", (self.namespace,)
+        ):
+            if total_bytes <= self.max_bytes:
+                break
+            evict.append((self.namespace, key))
+            total_bytes -= size
+        conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", evict)
+
+
+# ---- Redis protocol: replicas on any number of hosts ----
+
+# Minimal RESP2 client - just the handful of commands the cache needs, so any
+# Redis-compatible server works without another dependency
+class RespClient:
+    def __init__(self, url, timeout=5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.strip('/') or 0)
+        self.timeout = timeout
+        # One connection per thread - RESP replies come back in request order
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile('rb'))
+            self._local.conn = conn
+            if self.password:
+                self._send(conn, ('AUTH', self.username, self.password) if self.username else ('AUTH', self.password))
+            if self.db:
+                self._send(conn, ('SELECT', self.db))
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    # Run one command; a dropped connection is reopened and the command retried once
+    def command(self, *args):
+        for attempt in range(2):
+            try:
+                return self._send(self._connection(), args)
+            except (ConnectionError, socket.timeout):
+                self._close()
+                if attempt:
+                    raise
+            except OSError:
+                self._close()
+                raise
+
+    def _send(self, conn, args):
+        sock, reader = conn
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(f"${len(arg)}\r\n".encode() + arg + b"\r\n")
+        sock.sendall(b''.join(parts))
+        return self._read_reply(reader)
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the cache server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode('utf-8')
+        if kind == b'-':
+            raise CacheBackendError(body.decode('utf-8', 'replace'))
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by the cache server")
+            return data[:-2]
+        if kind == b'*':
+            count = int(body)
+            if count < 0:
+                return None
+            return [self._read_reply(reader) for _ in range(count)]
+        raise CacheBackendError(f"Unexpected reply from the cache server: {line[:40]!r}")
+
+
+# The standard compare-and-delete unlock
+RELEASE_LOCK_SCRIPT = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+)
+
+
+class RedisBackend:
+    def __init__(self, url, namespace, client=None):
+        self.client = client or RespClient(url)
+        self.prefix = f"{REDIS_PREFIX}{namespace}:"
+
+    def get(self, key):
+        return self.client.command('GET', self.prefix + key)
+
+    # Entries outlive their TTL by STALE_KEEP_SECONDS so they can still be served
+    # stale; entries that never expire are left to the server's maxmemory policy
+    def set(self, key, data, expire_seconds=None):
+        if expire_seconds is None:
+            self.client.command('SET', self.prefix + key, data)
+        else:
+            keep_ms = int((expire_seconds + STALE_KEEP_SECONDS) * 1000)
+            self.client.command('SET', self.prefix + key, data, 'PX', keep_ms)
+
+    def delete(self, key):
+        self.client.command('DEL', self.prefix + key)
+
+    def clear(self):
+        cursor = '0'
+        while True:
+            cursor, keys = self.client.command('SCAN', cursor, 'MATCH', f"{self.prefix}*", 'COUNT', 500)
+            if keys:
+                self.client.command('DEL', *keys)
+            cursor = cursor.decode('utf-8') if isinstance(cursor, bytes) else str(cursor)
+            if cursor == '0':
+                break
+
+    def acquire_lock(self, key, ttl):
+        token = _new_token()
+        reply = self.client.command('SET', f"{self.prefix}lock:{key}", token, 'NX', 'PX', int(ttl * 1000))
+        return token if reply == 'OK' else None
+
+    # Deleted only if it is still ours (a lock that expired may have been taken
+    # over); the check and the delete run as one script, so nothing slips in between
+    def release_lock(self, key, token):
+        self.client.command('EVAL', RELEASE_LOCK_SCRIPT, 1, f"{self.prefix}lock:{key}", token)
+
+
+# Backend for one named cache ('insights', 'klaviyo'); disk_dir is that cache's
+# directory for the disk backend
+def make_backend(namespace, disk_dir, max_bytes, kind=None):
+    kind = kind or CACHE_BACKEND
+    if kind == 'disk':
+        return DiskBackend(disk_dir, max_bytes) if disk_dir else None
+    if kind == 'sqlite':
+        return SQLiteBackend(SQLITE_PATH, namespace, max_bytes)
+    if kind == 'redis':
+        return RedisBackend(REDIS_URL, namespace)
+    if kind == 'none':
+        return None
+    raise ValueError(f"Unknown DASHBOARD_CACHE_BACKEND {kind!r} (disk, sqlite, redis or none)")
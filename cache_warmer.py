@@ -0,0 +1,155 @@
+# Background cache warmer
+# Walks every client and preset date range on a schedule and fills the insights
+# and Klaviyo caches ahead of time, so switching clients in the sidebar is a
+# cache hit instead of a cold API round trip
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from insights_cache import LIVE_TTL
+
+WARMER_ENABLED = os.environ.get("DASHBOARD_CACHE_WARMER", "1") == "1"
+
+# Minutes between passes
+WARM_INTERVAL_MINUTES = float(os.environ.get("DASHBOARD_WARM_INTERVAL_MINUTES", "10"))
+
+# A pass re-fetches an entry only once it is this close to expiring. Kept well under
+# the shortest TTL (ranges ending today), or every pass would re-fetch every live
+# range whether it was about to expire or had just been filled
+WARM_AHEAD_SECONDS = min(WARM_INTERVAL_MINUTES * 60, LIVE_TTL / 3)
+
+# Jobs run at the same time (each job fetches its levels in parallel on top of this)
+WARM_WORKERS = int(os.environ.get("DASHBOARD_WARM_WORKERS", "2"))
+
+# Skip an ad account for this pass once its Graph API usage (percent) is this high,
+# so the warmer never eats the budget people using the dashboard need
+WARM_MAX_USAGE_PCT = 50
+
+# Klaviyo's reporting endpoints allow a couple of requests a minute and a few
+# hundred a day per account - the warmer keeps to a share of that and leaves the
+# rest to people using the dashboard. After a 429 it stops for WARM_BACKOFF_SECONDS.
+WARM_KLAVIYO_PER_MINUTE = int(os.environ.get("DASHBOARD_WARM_KLAVIYO_PER_MINUTE", "1"))
+WARM_KLAVIYO_PER_DAY = int(os.environ.get("DASHBOARD_WARM_KLAVIYO_PER_DAY", "100"))
+WARM_BACKOFF_SECONDS = 15 * 60
+
+
+# Requests the warmer may spend on one API, per minute and per day (rolling windows)
+class WarmBudget:
+    def __init__(self, per_minute, per_day, clock=time.time):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.clock = clock
+        self._spent = deque()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    # Spend one request if the budget has room for it
+    def take(self):
+        now = self.clock()
+        with self._lock:
+            while self._spent and self._spent[0] <= now - 86400:
+                self._spent.popleft()
+            last_minute = sum(1 for spent_at in self._spent if spent_at > now - 60)
+            if now < self._paused_until or last_minute >= self.per_minute or len(self._spent) >= self.per_day:
+                return False
+            self._spent.append(now)
+            return True
+
+    # The API said slow down (429) - spend nothing more for a while
+    def back_off(self, seconds=WARM_BACKOFF_SECONDS):
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+
+
+class WarmJob:
+    def __init__(self, name, warm_fn, account_id=None, budget=None, is_fresh=None):
+        self.name = name
+        self.warm_fn = warm_fn
+        # Graph API account the job spends budget on (None for Klaviyo jobs)
+        self.account_id = account_id
+        # WarmBudget one run of the job spends a request from (Klaviyo jobs)
+        self.budget = budget
+        # is_fresh() -> True when nothing the job fills is close to expiring, so the
+        # run (and its budget) is skipped
+        self.is_fresh = is_fresh
+
+
+class CacheWarmer:
+    def __init__(self, jobs, interval=WARM_INTERVAL_MINUTES * 60, max_workers=WARM_WORKERS,
+                 usage_fn=None, max_usage_pct=WARM_MAX_USAGE_PCT, clock=time.time):
+        self.jobs = list(jobs)
+        self.interval = interval
+        self.max_workers = max_workers
+        # usage_fn(account_id) -> current usage percent or None
+        self.usage_fn = usage_fn
+        self.max_usage_pct = max_usage_pct
+        self.clock = clock
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._status = {'runs': 0, 'last_run_at': None, 'last_duration': None, 'warmed': 0, 'fresh': 0, 'skipped': 0, 'errors': {}}
+
+    def _over_budget(self, job):
+        if job.account_id is None or self.usage_fn is None:
+            return False
+        usage_pct = self.usage_fn(job.account_id)
+        return usage_pct is not None and usage_pct >= self.max_usage_pct
+
+    def _run_job(self, job):
+        if self._stop.is_set():
+            return 'skipped', None
+        if job.is_fresh is not None and job.is_fresh():
+            return 'fresh', None
+        if self._over_budget(job) or (job.budget is not None and not job.budget.take()):
+            return 'skipped', None
+        try:
+            job.warm_fn()
+        except Exception as e:
+            if job.budget is not None and getattr(e, 'status_code', None) == 429:
+                job.budget.back_off()
+            return 'error', str(e)
+        return 'warmed', None
+
+    # One pass over every job
+    def run_once(self):
+        started = self.clock()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(zip(self.jobs, executor.map(self._run_job, self.jobs)))
+
+        with self._lock:
+            self._status['runs'] += 1
+            self._status['last_run_at'] = datetime.now()
+            self._status['last_duration'] = self.clock() - started
+            self._status['warmed'] = sum(1 for job, (outcome, error) in results if outcome == 'warmed')
+            self._status['fresh'] = sum(1 for job, (outcome, error) in results if outcome == 'fresh')
+            self._status['skipped'] = sum(1 for job, (outcome, error) in results if outcome == 'skipped')
+            self._status['errors'] = {job.name: error for job, (outcome, error) in results if outcome == 'error'}
+        return results
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    # Start warming in a daemon thread (first pass runs right away)
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='cache-warmer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        with self._lock:
+            status = dict(self._status)
+            status['errors'] = dict(self._status['errors'])
+        status['jobs'] = len(self.jobs)
+        status['running'] = self._thread is not None and self._thread.is_alive()
+        return status
@@ -0,0 +1,264 @@
+# Daily insights store - per-day, per-entity insights kept in SQLite
+# A range request only fetches the days we don't have yet (plus the last few
+# days, which are still changing because of attribution lag) and answers the
+# rest locally, so switching from 30 to 60 days only pulls 30 new days
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from insights_cache import SETTLING_DAYS, normalize_date
+
+DAILY_STORE_ENABLED = os.environ.get("DASHBOARD_DAILY_STORE", "1") == "1"
+# Levels kept per day. Campaigns and ad sets are a few rows a day; ads are one row
+# per delivering ad per day - about 18x the rows of a 30-day range pull (3,000 ads:
+# 52k daily rows / 54 MB against 2.9k), for a level that is only fetched on demand
+DAILY_STORE_LEVELS = tuple(os.environ.get("DASHBOARD_DAILY_STORE_LEVELS", "campaign,adset").split(','))
+DAILY_STORE_PATH = os.environ.get(
+    "DASHBOARD_DAILY_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "daily_insights.sqlite")
+)
+# Days older than this are dropped, so the store doesn't grow with every day ever
+# requested. The default covers the longest date preset ("Last 90 Days" is 91 days)
+# plus the settling window; older custom ranges still work, their days are just
+# fetched again. 0 keeps everything.
+DAILY_STORE_RETENTION_DAYS = int(os.environ.get("DASHBOARD_DAILY_STORE_RETENTION_DAYS", 91 + SETTLING_DAYS))
+
+# Which id column identifies a row at each level
+LEVEL_ID_COLUMNS = {
+    'campaign': 'campaign_id',
+    'adset': 'adset_id',
+    'ad': 'ad_id'
+}
+ENTITY_COLUMNS = ['campaign_id', 'campaign_name', 'adset_id', 'adset_name', 'ad_id', 'ad_name']
+
+# Daily numbers that can be summed into a range total
+ADDITIVE_FIELDS = ['spend', 'impressions', 'clicks']
+ACTION_FIELDS = ['actions', 'action_values']
+
+# Unique-people and per-action cost fields can't be summed across days, so they
+# are not returned for ranges answered from the store
+NON_ADDITIVE_FIELDS = ['reach', 'frequency', 'cost_per_action_type', 'purchase_roas']
+
+
+# Turn a list of days into (first, last) spans of consecutive days
+def day_spans(days):
+    spans = []
+    for day in sorted(days):
+        if spans and day == spans[-1][1] + timedelta(days=1):
+            spans[-1] = (spans[-1][0], day)
+        else:
+            spans.append((day, day))
+    return spans
+
+
+def days_in_range(since, until):
+    since_day = _to_day(since)
+    until_day = _to_day(until)
+    return [since_day + timedelta(days=i) for i in range((until_day - since_day).days + 1)]
+
+
+def _to_day(value):
+    return datetime.strptime(normalize_date(value), '%Y-%m-%d').date()
+
+
+# Everything about a query except the dates and level
+def query_signature(fields, params):
+    params = {k: v for k, v in params.items() if k not in ('time_range', 'level', 'time_increment', 'limit')}
+    raw = json.dumps({'fields': sorted(fields), 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+# Sum daily rows into one row per entity, in the same shape the API returns for a range
+def combine_daily_rows(daily_rows, level):
+    id_column = LEVEL_ID_COLUMNS[level]
+    combined = {}
+    action_totals = defaultdict(lambda: defaultdict(float))
+
+    for row in daily_rows:
+        key = row.get(id_column)
+        target = combined.get(key)
+        if target is None:
+            target = {column: row[column] for column in ENTITY_COLUMNS if column in row}
+            for field in ADDITIVE_FIELDS:
+                target[field] = 0.0
+            combined[key] = target
+
+        for field in ADDITIVE_FIELDS:
+            try:
+                target[field] += float(row.get(field, 0))
+            except (TypeError, ValueError):
+                pass
+
+        for field in ACTION_FIELDS:
+            for action in row.get(field) or []:
+                try:
+                    action_totals[(key, field)][action.get('action_type', '')] += float(action.get('value', 0))
+                except (TypeError, ValueError):
+                    pass
+
+    rows = []
+    for key, target in combined.items():
+        impressions = target['impressions']
+        target['impressions'] = int(impressions)
+        target['clicks'] = int(target['clicks'])
+        target['cpm'] = (target['spend'] / impressions * 1000) if impressions > 0 else 0
+        target['ctr'] = (target['clicks'] / impressions * 100) if impressions > 0 else 0
+        for field in ACTION_FIELDS:
+            totals = action_totals.get((key, field))
+            if totals:
+                target[field] = [
+                    {'action_type': action_type, 'value': _format_value(value)}
+                    for action_type, value in totals.items()
+                ]
+        rows.append(target)
+    return rows
+
+
+# Counts come back as whole numbers, money as decimals (like the API's strings)
+def _format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return f"{value:.2f}"
+
+
+class DailyInsightsStore:
+    def __init__(self, db_path=DAILY_STORE_PATH, settling_days=SETTLING_DAYS, retention_days=DAILY_STORE_RETENTION_DAYS):
+        self.db_path = db_path
+        self.settling_days = settling_days
+        self.retention_days = retention_days
+        self._pruned_on = None
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_rows (
+                    account_id TEXT, level TEXT, signature TEXT, day TEXT, row_json TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS daily_rows_partition
+                ON daily_rows (account_id, level, signature, day)
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS daily_rows_day ON daily_rows (day)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fetched_days (
+                    account_id TEXT, level TEXT, signature TEXT, day TEXT, fetched_at TEXT,
+                    PRIMARY KEY (account_id, level, signature, day)
+                )
+            """)
+
+    # One connection per thread, kept open; `with` is a transaction, not a close
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    # Days in the range we have to ask the API for
+    def missing_days(self, account_id, level, signature, since, until, today=None):
+        today = today or date.today()
+        settling_from = today - timedelta(days=self.settling_days)
+        wanted = days_in_range(since, until)
+
+        with self._connect() as conn:
+            stored = {
+                row[0] for row in conn.execute(
+                    "SELECT day FROM fetched_days WHERE account_id = ? AND level = ? AND signature = ? AND day BETWEEN ? AND ?",
+                    (account_id, level, signature, normalize_date(since), normalize_date(until))
+                )
+            }
+        return [day for day in wanted if day.isoformat() not in stored or day >= settling_from]
+
+    # Replace the stored rows for these days (days with no rows are still marked as fetched)
+    def save_days(self, account_id, level, signature, days, daily_rows):
+        rows_by_day = defaultdict(list)
+        for row in daily_rows:
+            rows_by_day[row.get('date_start')].append(row)
+
+        fetched_at = datetime.now().isoformat(timespec='seconds')
+        with self._write_lock, self._connect() as conn:
+            for day in days:
+                day_key = day.isoformat()
+                conn.execute(
+                    "DELETE FROM daily_rows WHERE account_id = ? AND level = ? AND signature = ? AND day = ?",
+                    (account_id, level, signature, day_key)
+                )
+                conn.executemany(
+                    "INSERT INTO daily_rows VALUES (?, ?, ?, ?, ?)",
+                    [(account_id, level, signature, day_key, json.dumps(row)) for row in rows_by_day.get(day_key, [])]
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO fetched_days VALUES (?, ?, ?, ?, ?)",
+                    (account_id, level, signature, day_key, fetched_at)
+                )
+
+    # Drop days older than the retention window - runs at most once a day per
+    # process. Returns how many rows were removed.
+    def prune(self, today=None):
+        today = today or date.today()
+        if not self.retention_days or self._pruned_on == today:
+            return 0
+        cutoff = (today - timedelta(days=self.retention_days - 1)).isoformat()
+        with self._write_lock, self._connect() as conn:
+            removed = conn.execute("DELETE FROM daily_rows WHERE day < ?", (cutoff,)).rowcount
+            conn.execute("DELETE FROM fetched_days WHERE day < ?", (cutoff,))
+        self._pruned_on = today
+        return removed
+
+    def load_rows(self, account_id, level, signature, since, until):
+        with self._connect() as conn:
+            return [
+                json.loads(row[0]) for row in conn.execute(
+                    "SELECT row_json FROM daily_rows WHERE account_id = ? AND level = ? AND signature = ? AND day BETWEEN ? AND ?",
+                    (account_id, level, signature, normalize_date(since), normalize_date(until))
+                )
+            ]
+
+    # Answer a range query, fetching only the missing / still-settling days.
+    # fetch_rows(fields, params) does the actual API call for one span of days.
+    # With daily, the stored per-day rows are returned instead of range totals.
+    def fetch_range(self, account_id, fields, params, fetch_rows, refresh=False, today=None, daily=False):
+        level = params['level']
+        since = params['time_range']['since']
+        until = params['time_range']['until']
+        signature = query_signature(fields, params)
+        self.prune(today)
+
+        if refresh:
+            days_to_fetch = days_in_range(since, until)
+        else:
+            days_to_fetch = self.missing_days(account_id, level, signature, since, until, today=today)
+
+        for span_start, span_end in day_spans(days_to_fetch):
+            span_params = dict(params)
+            span_params['time_range'] = {'since': span_start.isoformat(), 'until': span_end.isoformat()}
+            span_params['time_increment'] = 1
+            span_rows = fetch_rows(fields, span_params)
+            span_days = days_in_range(span_start, span_end)
+            self.save_days(account_id, level, signature, span_days, span_rows)
+
+        rows = self.load_rows(account_id, level, signature, since, until)
+        if daily:
+            return sorted(rows, key=lambda row: row.get('date_start', ''))
+        return combine_daily_rows(rows, level)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# One store per process
+def get_daily_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DailyInsightsStore()
+        return _store
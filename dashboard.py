@@ -3,14 +3,31 @@
 
 import streamlit as st
 import pandas as pd
-from facebook_business.api import FacebookAdsApi
-from facebook_business.adobjects.adaccount import AdAccount
-from facebook_business.adobjects.adsinsights import AdsInsights
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import requests
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+import time
+import functools
+from cache_backends import CACHE_BACKEND
+from insights_cache import get_insights_cache, get_klaviyo_cache
+from klaviyo_client import KlaviyoError
+from rate_limiter import get_scheduler
+from data_table import PAGE_SIZES, DEFAULT_PAGE_SIZE, filter_by_name, page_count, sorted_page
+from instrumentation import RunMetrics, get_metrics
+from pipeline import (
+    CLIENTS, DATE_PRESETS, preset_date_range, calculate_roas,
+    fetch_facebook_data, fetch_klaviyo_data, klaviyo_expires_within, fetch_client_totals, revalidate_dashboard_data,
+    fetch_daily_trends, account_frames, account_totals, SUMMARY_LEVELS
+)
+from insights_frame import process_insights_data
+from frame_store import get_frame_store
+from trends import TREND_METRICS, TREND_TOP_N, TREND_MAX_TOP_N, daily_frame, trend_series
+from recommendations import resolve_thresholds, evaluate_rules
+from single_flight import get_insights_flight, get_klaviyo_flight, get_revalidation_flight
+from cache_warmer import (
+    WARMER_ENABLED, WARM_AHEAD_SECONDS, WARM_KLAVIYO_PER_MINUTE, WARM_KLAVIYO_PER_DAY, WarmJob, WarmBudget, CacheWarmer
+)
 
 # Dashboard config
 st.set_page_config(page_title="Live Facebook Ads Dashboard", page_icon="📊", layout="wide")
@@ -41,229 +58,47 @@ def check_password():
 if not check_password():
     st.stop()
 
-# Your API credentials and client accounts
-ACCESS_TOKEN = st.secrets["facebook_token"]
+# Per-stage timings and API / cache counters for this rerun
+run_metrics = RunMetrics()
 
-# Client database - easily add new clients here
-CLIENTS = {
-    "RAGE Nation Apparel": {
-        "account_id": "act_1761456877511271",
-        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
-        "avg_order_value": 50,
-        "klaviyo_enabled": False
-    },
-    "World POG Federation": {
-        "account_id": "act_224902019311983",
-        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
-        "avg_order_value": 75,
-        "klaviyo_enabled": False
-    },
-    "Supplies Outlet": {
-        "account_id": "act_147523547450881",
-        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
-        "avg_order_value": 45,
-        "klaviyo_enabled": False
-    },
-    "Tote n Carry - Main Account": {
-        "account_id": "act_2524661660981967",
-        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
-        "avg_order_value": 35,
-        "klaviyo_enabled": True
-    },
-    "Tote n Carry - Secondary Account": {
-        "account_id": "act_2003497536588787",
-        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
-        "avg_order_value": 35,
-        "klaviyo_enabled": True
-    }
-}
+# Cache hit / miss totals, read whenever the metrics are exported
+def cache_metrics():
+    values = {}
+    for cache_name, cache in (('insights', get_insights_cache()), ('klaviyo', get_klaviyo_cache())):
+        cache_stats = cache.stats()
+        values[('dashboard_cache_hits_total', (('cache', cache_name),))] = cache_stats['hits']
+        values[('dashboard_cache_misses_total', (('cache', cache_name),))] = cache_stats['misses']
+        values[('dashboard_cache_memory_bytes', (('cache', cache_name),))] = cache_stats['memory_bytes']
+    frame_stats = get_frame_store().stats()
+    values[('dashboard_frame_store_bytes', ())] = frame_stats['bytes']
+    values[('dashboard_frame_store_entries', ())] = frame_stats['entries']
+    values[('dashboard_frame_store_evictions_total', ())] = frame_stats['evictions']
+    return values
+
+get_metrics().add_collector('caches', cache_metrics)
+
+# Your API credentials (client accounts are in pipeline.CLIENTS)
+ACCESS_TOKEN = st.secrets["facebook_token"]
 
 # Initialize Facebook API
-def get_facebook_data(start_date, end_date, account_id):
+def get_facebook_data(start_date, end_date, account_id, refresh=False, timings=None, single_fetch=False, stale_ok=False, levels=None):
     try:
-        FacebookAdsApi.init(access_token=ACCESS_TOKEN)
-        account = AdAccount(account_id)
-        
-        # Get campaign level data
-        campaign_insights = account.get_insights(
-            fields=[
-                'campaign_id',
-                'campaign_name',
-                'spend',
-                'actions',
-                'action_values',
-                'cost_per_action_type',
-                'ctr',
-                'cpm',
-                'impressions',
-                'clicks',
-                'reach',
-                'frequency',
-                'purchase_roas'
-            ],
-            params={
-                'time_range': {
-                    'since': start_date.strftime('%Y-%m-%d'),
-                    'until': end_date.strftime('%Y-%m-%d')
-                },
-                'level': 'campaign',
-                'action_breakdowns': ['action_type'],
-                'action_attribution_windows': ['7d_click', '1d_view']
-            }
-        )
-        
-        # Get ad set level data
-        adset_insights = account.get_insights(
-            fields=[
-                'campaign_id',
-                'campaign_name',
-                'adset_id',
-                'adset_name',
-                'spend',
-                'actions',
-                'cost_per_action_type',
-                'ctr',
-                'cpm',
-                'impressions',
-                'clicks',
-                'reach',
-                'frequency'
-            ],
-            params={
-                'time_range': {
-                    'since': start_date.strftime('%Y-%m-%d'),
-                    'until': end_date.strftime('%Y-%m-%d')
-                },
-                'level': 'adset',
-                'action_breakdowns': ['action_type']
-            }
-        )
-        
-        # Get ad level data
-        ad_insights = account.get_insights(
-            fields=[
-                'campaign_id',
-                'campaign_name',
-                'adset_id',
-                'adset_name',
-                'ad_id',
-                'ad_name',
-                'spend',
-                'actions',
-                'cost_per_action_type',
-                'ctr',
-                'cpm',
-                'impressions',
-                'clicks',
-                'reach',
-                'frequency'
-            ],
-            params={
-                'time_range': {
-                    'since': start_date.strftime('%Y-%m-%d'),
-                    'until': end_date.strftime('%Y-%m-%d')
-                },
-                'level': 'ad',
-                'action_breakdowns': ['action_type']
-            }
-        )
-        
-        return {
-            'campaigns': list(campaign_insights),
-            'adsets': list(adset_insights),
-            'ads': list(ad_insights)
-        }
-        
+        return fetch_facebook_data(ACCESS_TOKEN, start_date, end_date, account_id, refresh=refresh, timings=timings, single_fetch=single_fetch, stale_ok=stale_ok, levels=levels)
     except Exception as e:
         st.error(f"API Error: {e}")
         return None
 
 # Klaviyo API functions
-def get_klaviyo_data(start_date, end_date):
+def get_klaviyo_data(start_date, end_date, refresh=False, stale_ok=False, meta=None):
     try:
-        api_key = st.secrets["klaviyo_api_key"]
-        headers = {
-            'Authorization': f'Klaviyo-API-Key {api_key}',
-            'revision': '2024-10-15',
-            'Content-Type': 'application/json'
-        }
-        
-        # Get campaigns data
-        campaigns_url = 'https://a.klaviyo.com/api/campaigns/'
-        campaigns_params = {
-            'filter': f'greater-than(send_time,{start_date.isoformat()}),less-than(send_time,{end_date.isoformat()})',
-            'fields[campaign]': 'name,status,created_at,send_time,send_strategy'
-        }
-        
-        campaigns_response = requests.get(campaigns_url, headers=headers, params=campaigns_params)
-        
-        if campaigns_response.status_code != 200:
-            st.error(f"Klaviyo API Error: {campaigns_response.status_code} - {campaigns_response.text}")
-            return None
-        
-        campaigns_data = campaigns_response.json()
-        
-        # Process campaigns and get metrics
-        total_revenue = 0
-        total_emails_sent = 0
-        total_opens = 0
-        total_clicks = 0
-        processed_campaigns = []
-        
-        if campaigns_data.get('data'):
-            for campaign in campaigns_data['data']:
-                campaign_id = campaign['id']
-                campaign_name = campaign['attributes']['name']
-                
-                # Get campaign metrics
-                metrics_url = f'https://a.klaviyo.com/api/campaign-recipient-estimations/{campaign_id}/'
-                metrics_response = requests.get(metrics_url, headers=headers)
-                
-                # Default values if metrics not available
-                emails_sent = 0
-                opens = 0
-                clicks = 0
-                revenue = 0
-                
-                if metrics_response.status_code == 200:
-                    metrics = metrics_response.json()
-                    # Extract actual metrics from response
-                    emails_sent = metrics.get('data', {}).get('attributes', {}).get('estimated_recipient_count', 0)
-                
-                # For now, calculate estimated metrics based on industry averages
-                # In production, you'd get these from Klaviyo's campaign stats
-                if emails_sent > 0:
-                    opens = int(emails_sent * 0.25)  # 25% open rate estimate
-                    clicks = int(opens * 0.03)  # 3% click rate estimate
-                    revenue = clicks * 15  # $15 revenue per click estimate
-                
-                total_emails_sent += emails_sent
-                total_opens += opens
-                total_clicks += clicks
-                total_revenue += revenue
-                
-                open_rate = (opens / emails_sent * 100) if emails_sent > 0 else 0
-                click_rate = (clicks / emails_sent * 100) if emails_sent > 0 else 0
-                
-                processed_campaigns.append({
-                    'name': campaign_name,
-                    'emails_sent': emails_sent,
-                    'opens': opens,
-                    'clicks': clicks,
-                    'revenue': revenue,
-                    'open_rate': open_rate,
-                    'click_rate': click_rate,
-                    'status': campaign['attributes']['status']
-                })
-        
-        return {
-            'total_revenue': total_revenue,
-            'total_emails_sent': total_emails_sent,
-            'total_opens': total_opens,
-            'total_clicks': total_clicks,
-            'campaigns': processed_campaigns
-        }
-        
+        return fetch_klaviyo_data(
+            st.secrets["klaviyo_api_key"], start_date, end_date,
+            conversion_metric_id=st.secrets.get("klaviyo_conversion_metric_id"),
+            refresh=refresh, stale_ok=stale_ok, meta=meta
+        )
+    except KlaviyoError as e:
+        st.error(f"Klaviyo API Error: {e.status_code} - {e.text}")
+        return None
     except Exception as e:
         st.error(f"Klaviyo API Error: {e}")
         # Return sample data as fallback
@@ -296,167 +131,310 @@ def get_klaviyo_data(start_date, end_date):
             ]
         }
 
-# Function to calculate ROAS
-def calculate_roas(spend, revenue):
-    if spend > 0:
-        return revenue / spend
-    return 0
+# "All Clients" overview - campaign-level totals for every account
+ALL_CLIENTS_OPTION = "🌐 All Clients"
+
+# Accounts fetched at the same time, and how long the table waits for stragglers
+OVERVIEW_WORKERS = 4
+OVERVIEW_TIMEOUT = 120
+
+def overview_table(results):
+    overview_df = pd.DataFrame([
+        {'client': client_name, 'status': result.get('status', '✅'), **result.get('totals', {})}
+        for client_name, result in results.items()
+    ], columns=['client', 'status', 'spend', 'revenue', 'purchases', 'roas', 'cpa', 'ctr'])
+    return overview_df.sort_values('spend', ascending=False, na_position='last')
 
-# Function to get purchases and revenue from actions
-def get_purchases_and_revenue_from_actions(actions, action_values=None):
-    purchases = 0
-    revenue = 0
+# Comparison table for every client; rows show up as each account comes back,
+# and a slow or failing account only affects its own row
+def render_all_clients_overview(start_date, end_date):
+    st.markdown("### 🌐 All Clients Overview")
+    st.markdown(f"**Showing data from:** {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
     
-    if not actions:
-        return purchases, revenue
+    results = {client_name: {'status': '⏳ Loading'} for client_name in CLIENTS}
+    progress = st.progress(0.0, text=f"Pulling {len(CLIENTS)} accounts...")
+    table = st.empty()
     
-    for action in actions:
-        action_type = action.get('action_type', '')
-        
-        # Count all purchase-related actions
-        if action_type in ['purchase', 'app_install', 'complete_registration']:
-            purchases += int(action.get('value', 0))
-    
-    # Get revenue from action_values if available
-    if action_values:
-        for action_value in action_values:
-            action_type = action_value.get('action_type', '')
-            if action_type == 'purchase':
-                try:
-                    revenue += float(action_value.get('value', 0))
-                except:
-                    pass
-    
-    return purchases, revenue
-
-# Function to process insights data
-def process_insights_data(insights_list, avg_order_value):
-    processed_data = []
-    
-    for item in insights_list:
-        spend = float(item.get('spend', 0))
-        impressions = int(item.get('impressions', 0))
-        clicks = int(item.get('clicks', 0))
-        
-        # Get purchases and actual revenue from actions
-        actions = item.get('actions', [])
-        action_values = item.get('action_values', [])
-        purchases, actual_revenue = get_purchases_and_revenue_from_actions(actions, action_values)
-        
-        # Use actual revenue if available, otherwise calculate from AOV
-        if actual_revenue > 0:
-            revenue = actual_revenue
-        else:
-            revenue = purchases * avg_order_value
-        
-        # Calculate metrics
-        roas = calculate_roas(spend, revenue)
-        cpa = spend / purchases if purchases > 0 else 0
-        ctr = (clicks / impressions * 100) if impressions > 0 else 0
-        cpm = float(item.get('cpm', 0))
-        
-        processed_data.append({
-            'campaign_id': item.get('campaign_id', ''),
-            'campaign_name': item.get('campaign_name', 'Unknown'),
-            'adset_id': item.get('adset_id', ''),
-            'adset_name': item.get('adset_name', ''),
-            'ad_id': item.get('ad_id', ''),
-            'ad_name': item.get('ad_name', ''),
-            'spend': spend,
-            'impressions': impressions,
-            'clicks': clicks,
-            'purchases': purchases,
-            'revenue': revenue,
-            'actual_revenue': actual_revenue,
-            'roas': roas,
-            'cpa': cpa,
-            'ctr': ctr,
-            'cpm': cpm
-        })
-    
-    return processed_data
-
-# Main dashboard
-st.title("📊 Live Facebook Ads Dashboard")
+    executor = ThreadPoolExecutor(max_workers=OVERVIEW_WORKERS)
+    futures = {
+        executor.submit(fetch_client_totals, ACCESS_TOKEN, CLIENTS[client_name], start_date, end_date): client_name
+        for client_name in CLIENTS
+    }
+    done = 0
+    try:
+        for future in as_completed(futures, timeout=OVERVIEW_TIMEOUT):
+            client_name = futures[future]
+            try:
+                results[client_name] = {'totals': future.result()}
+            except Exception as e:
+                results[client_name] = {'status': f"❌ {str(e)[:60]}"}
+            done += 1
+            progress.progress(done / len(futures), text=f"{done}/{len(futures)} accounts loaded")
+            table.dataframe(overview_table(results), width='stretch', hide_index=True)
+    except FuturesTimeoutError:
+        # Stragglers keep running in the background and land in the cache for next time
+        for future, client_name in futures.items():
+            if not future.done():
+                results[client_name] = {'status': '⌛ Timed out'}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    progress.empty()
+    overview_df = overview_table(results)
+    table.dataframe(
+        overview_df,
+        width='stretch',
+        hide_index=True,
+        column_config={
+            'client': st.column_config.TextColumn("Client"),
+            'status': st.column_config.TextColumn("Status"),
+            'spend': st.column_config.NumberColumn("Spend", format="$%.2f"),
+            'revenue': st.column_config.NumberColumn("Revenue", format="$%.2f"),
+            'purchases': st.column_config.NumberColumn("Purchases", format="%d"),
+            'roas': st.column_config.NumberColumn("ROAS", format="%.2fx"),
+            'cpa': st.column_config.NumberColumn("CPA", format="$%.2f"),
+            'ctr': st.column_config.NumberColumn("CTR", format="%.2f%%")
+        }
+    )
+    
+    loaded_df = overview_df.dropna(subset=['spend'])
+    if not loaded_df.empty:
+        agency_spend = float(loaded_df['spend'].sum())
+        agency_revenue = float(loaded_df['revenue'].sum())
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("💰 Agency Spend", f"${agency_spend:,.2f}")
+        with col2:
+            st.metric("💵 Agency Revenue", f"${agency_revenue:,.2f}")
+        with col3:
+            st.metric("📈 Agency ROAS", f"{calculate_roas(agency_spend, agency_revenue):.2f}x")
 
-# Client selector in sidebar
-st.sidebar.header("🏢 Client Selection")
-selected_client = st.sidebar.selectbox(
-    "Choose Client:",
-    list(CLIENTS.keys()),
-    index=0
-)
+# Stale-while-revalidate: how often the page checks for the background refresh,
+# and how long to wait before retrying one that failed
+REVALIDATE_POLL_SECONDS = 2
+REVALIDATE_RETRY_SECONDS = 60
 
-# Get selected client info
-client_info = CLIENTS[selected_client]
-current_account_id = client_info["account_id"]
-current_logo_url = client_info["logo_url"]
-current_aov = client_info["avg_order_value"]
+@st.fragment(run_every=REVALIDATE_POLL_SECONDS)
+def swap_in_revalidated_data(key):
+    if not get_revalidation_flight().in_flight(key):
+        st.rerun()
 
-# Add company logo and branding
-col1, col2 = st.columns([1, 4])
-with col1:
-    st.markdown(f"""
-    <img src="{current_logo_url}" width="75px">
-    """, unsafe_allow_html=True)
-with col2:
-    st.markdown(f"### {selected_client} Performance Dashboard")
+# Refresh stale data in the background (a key that just failed isn't retried on
+# every rerun) and rerun the page once the refresh lands. Called wherever stale
+# data was served - fragments included, so data a fragment pulled on its own
+# (ads, daily trends) is swapped in too.
+def revalidate_in_background(key, refresh):
+    revalidation_started = st.session_state.setdefault("revalidation_started", {})
+    if time.time() - revalidation_started.get(key, 0) > REVALIDATE_RETRY_SECONDS:
+        revalidation_started[key] = time.time()
+        get_revalidation_flight().start(key, refresh)
+    if get_revalidation_flight().in_flight(key):
+        swap_in_revalidated_data(key)
 
-st.markdown("---")
+def format_age(seconds):
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min ago"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} h ago"
+    return f"{seconds / 86400:.0f} days ago"
 
-# Add date range selector
-st.sidebar.header("📅 Date Range")
-date_option = st.sidebar.selectbox(
-    "Select Time Period:",
-    ["Last 7 Days", "Last 14 Days", "Last 30 Days", "Last 60 Days", "Last 90 Days", "Custom Range"]
-)
+# How metric columns are labelled and formatted in the level tables (values stay numeric)
+TABLE_COLUMNS = {
+    'campaign_name': st.column_config.TextColumn("Campaign"),
+    'adset_name': st.column_config.TextColumn("Ad Set"),
+    'ad_name': st.column_config.TextColumn("Ad"),
+    'spend': st.column_config.NumberColumn("Spend", format="dollar"),
+    'revenue': st.column_config.NumberColumn("Revenue", format="dollar"),
+    'impressions': st.column_config.NumberColumn("Impressions", format="localized"),
+    'clicks': st.column_config.NumberColumn("Clicks", format="localized"),
+    'purchases': st.column_config.NumberColumn("Purchases", format="localized"),
+    'roas': st.column_config.NumberColumn("ROAS", format="%.2fx"),
+    'cpa': st.column_config.NumberColumn("CPA", format="dollar"),
+    'ctr': st.column_config.NumberColumn("CTR", format="%.2f%%"),
+    'cpm': st.column_config.NumberColumn("CPM", format="dollar")
+}
 
-# Handle custom date range
-if date_option == "Custom Range":
-    col1, col2 = st.sidebar.columns(2)
+# Filterable, sortable, paginated table - only the visible page is sent to the browser
+def render_data_table(df, key, columns, name_columns, default_sort='roas'):
+    sort_options = [column for column in columns if column not in name_columns]
+    col1, col2, col3, col4, col5 = st.columns([3, 2, 2, 1, 1])
     with col1:
-        start_date = st.sidebar.date_input("Start Date", datetime.now() - timedelta(days=30))
+        query = st.text_input("🔎 Filter by name", key=f"{key}_filter", placeholder="Campaign, ad set or ad name")
     with col2:
-        end_date = st.sidebar.date_input("End Date", datetime.now())
-else:
-    # Calculate date range based on selection
-    end_date = datetime.now()
-    if date_option == "Last 7 Days":
-        start_date = end_date - timedelta(days=7)
-    elif date_option == "Last 14 Days":
-        start_date = end_date - timedelta(days=14)
-    elif date_option == "Last 30 Days":
-        start_date = end_date - timedelta(days=30)
-    elif date_option == "Last 60 Days":
-        start_date = end_date - timedelta(days=60)
-    elif date_option == "Last 90 Days":
-        start_date = end_date - timedelta(days=90)
+        sort_by = st.selectbox("Sort by", sort_options, index=sort_options.index(default_sort),
+                               format_func=lambda column: TABLE_COLUMNS[column].get('label', column), key=f"{key}_sort")
+    with col3:
+        order = st.selectbox("Order", ["High → Low", "Low → High"], key=f"{key}_order")
+    with col4:
+        page_size = st.selectbox("Rows", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=f"{key}_page_size")
+    
+    filtered_df = filter_by_name(df, query, name_columns)
+    total_pages = page_count(len(filtered_df), page_size)
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > total_pages:
+        st.session_state[page_key] = total_pages
+    with col5:
+        page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key=page_key)
+    
+    page_df = sorted_page(filtered_df, sort_by, order == "Low → High", page, page_size)[columns]
+    if 'cpa' in page_df:
+        # No purchases means no CPA - show it blank rather than $0.00
+        page_df = page_df.assign(cpa=page_df['cpa'].where(page_df['cpa'] > 0))
+    
+    st.dataframe(
+        page_df,
+        width='stretch',
+        hide_index=True,
+        column_config={column: TABLE_COLUMNS[column] for column in columns}
+    )
+    
+    if filtered_df.empty:
+        st.caption(f"No rows match \"{query}\"")
+        return
+    first_row = (page - 1) * page_size
+    caption = f"Rows {first_row + 1:,}-{first_row + len(page_df):,} of {len(filtered_df):,}"
+    if len(filtered_df) != len(df):
+        caption += f" (filtered from {len(df):,})"
+    st.caption(caption)
 
-st.markdown(f"**Showing data from:** {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
-st.markdown(f"**Last Updated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+# Top few actions as callouts (Overview column)
+def render_priority_actions(actions, limit=3):
+    for action in actions.head(limit).to_dict('records'):
+        callout = getattr(st, action['kind'])
+        callout(f"{action['icon']} {action['action']}: {action['name'][:25]}...")
 
-# Get live data with selected date range
-with st.spinner(f"🔄 Pulling {selected_client} data from {start_date.strftime('%m/%d')} to {end_date.strftime('%m/%d')}..."):
-    data = get_facebook_data(start_date, end_date, current_account_id)
+# Every action for a level as one table (one element no matter how many rows match)
+def render_recommendations(actions):
+    if actions.empty:
+        st.info("No recommendations for the selected time period.")
+        return
+    counts = actions['action'].value_counts()
+    st.caption(" | ".join(f"{action}: {count}" for action, count in counts.items()))
+    st.dataframe(
+        actions.assign(action=actions['icon'] + " " + actions['action'])[['action', 'name', 'detail']],
+        width='stretch',
+        hide_index=True,
+        column_config={
+            'action': st.column_config.TextColumn("Action"),
+            'name': st.column_config.TextColumn("Name"),
+            'detail': st.column_config.TextColumn("Why", width="large")
+        }
+    )
 
-# Check if client has Klaviyo enabled and get email data
-klaviyo_data = None
-if client_info.get("klaviyo_enabled", False):
-    with st.spinner(f"🔄 Pulling email data for {selected_client}..."):
-        klaviyo_data = get_klaviyo_data(start_date, end_date)
+# Derived data for the page (frames, totals, actions, tables, figures) is built on
+# first use and kept across reruns - full or fragment - until the client, range or
+# fetched data changes. Hidden tabs never build theirs.
+def view_memo(view_key):
+    memo = st.session_state.get("view_memo")
+    if memo is None or memo['key'] != view_key:
+        memo = {'key': view_key, 'values': {}}
+        st.session_state["view_memo"] = memo
+    return memo['values']
 
-if data:
-    # Process all levels of data with client-specific AOV
-    campaigns_data = process_insights_data(data['campaigns'], current_aov)
-    adsets_data = process_insights_data(data['adsets'], current_aov)
-    ads_data = process_insights_data(data['ads'], current_aov)
+def memoized(memo, name, build):
+    if name not in memo:
+        memo[name] = build()
+    return memo[name]
+
+# Ad-level insights are the biggest pull, so they're fetched the first time a view
+# needs them (the Ads tab, ad-level actions) instead of with the rest of the page.
+# Returns the ad frame, or None if the fetch failed.
+def load_ad_frame(view):
+    if 'ad' in view['frames']:
+        return view['frames']['ad']
+    memo = view['memo']
+    cached = memo.get('ads_frame')
+    if cached is not None and not cached['stale']:
+        return cached['frame']
     
-    # Calculate totals from campaign data
-    total_spend = sum(item['spend'] for item in campaigns_data)
-    total_purchases = sum(item['purchases'] for item in campaigns_data)
-    total_revenue = sum(item['revenue'] for item in campaigns_data)
-    total_impressions = sum(item['impressions'] for item in campaigns_data)
-    total_clicks = sum(item['clicks'] for item in campaigns_data)
+    query = view['ads_query']
+    # "Refresh Data" applies to the first ad pull after it, not to every one
+    refresh = query['refresh'] and cached is None
+    timings = {}
+    try:
+        with st.spinner("🔄 Pulling ad-level data..."):
+            data = fetch_facebook_data(ACCESS_TOKEN, query['start_date'], query['end_date'], query['account_id'],
+                                       refresh=refresh, timings=timings, stale_ok=query['stale_ok'], levels=('ads',))
+    except Exception as e:
+        st.error(f"API Error: {e}")
+        return None
+    
+    ads_timing = timings['ads']
+    query['timings']['ads'] = ads_timing
+    run_metrics.record('ads_fetch', ads_timing['seconds'])
+    if ads_timing['stale']:
+        revalidate_in_background(f"{query['revalidation_key']}:ads", lambda: fetch_facebook_data(
+            ACCESS_TOKEN, query['start_date'], query['end_date'], query['account_id'], levels=('ads',)
+        ))
+    
+    # Stale rows are checked again on the next rerun and swapped out once the refresh lands
+    if cached is None or cached['fetched_at'] != ads_timing['fetched_at']:
+        frame_key = ('ads', query['revalidation_key'], query['avg_order_value'], ads_timing['fetched_at'])
+        cached = {
+            'fetched_at': ads_timing['fetched_at'],
+            'key': frame_key,
+            'frame': get_frame_store().get_or_build(
+                frame_key, lambda: process_insights_data(data['ads'], query['avg_order_value'])
+            )
+        }
+        memo.pop('actions:ad', None)
+    cached['stale'] = ads_timing['stale']
+    memo['ads_frame'] = cached
+    return cached['frame']
+
+# Ad-level data is shown once it has been loaded or asked for (always in single-fetch mode)
+def ads_wanted(view):
+    return 'ad' in view['frames'] or 'ads_frame' in view['memo'] or view['memo'].get('ads_requested', False)
+
+def request_ads(memo):
+    memo['ads_requested'] = True
+
+def level_frame(view, level):
+    return load_ad_frame(view) if level == 'ad' else view['frames'][level]
+
+# None when the level's data couldn't be loaded. Action tables are shared through
+# the frame store too, so every session looking at the same data reuses one.
+def level_actions(view, level):
+    df = level_frame(view, level)
+    if df is None:
+        return None
+    if level == 'ad' and 'ad' not in view['frames']:
+        frame_key = view['memo']['ads_frame']['key']
+    else:
+        frame_key = view['frames_key']
+    actions_key = ('actions', frame_key, level, tuple(sorted(view['thresholds'].items())))
+    return memoized(view['memo'], f"actions:{level}", lambda: get_frame_store().get_or_build(
+        actions_key, lambda: evaluate_rules(df, level, view['thresholds'])
+    ))
+
+# Each block below is a fragment: a click inside it (sorting a table, paging,
+# switching tabs) reruns that block only, not the fetch / processing above it.
+# Such a rerun never reaches the page's laps, so it is timed on its own: a fresh
+# RunMetrics (scope 'fragment') charged to the fragment's name, logged and
+# exported like a page rerun. Inside a full rerun the page's RunMetrics is used.
+def timed_fragment(name):
+    def decorate(render):
+        @functools.wraps(render)
+        def run(*args, **kwargs):
+            global run_metrics
+            if not run_metrics.finished:
+                return render(*args, **kwargs)
+            run_metrics = RunMetrics(scope='fragment')
+            try:
+                return render(*args, **kwargs)
+            finally:
+                run_metrics.lap(name)
+                run_metrics.finish(fragment=name, **run_context)
+        return run
+    return decorate
+
+# No widgets in it, so nothing could rerun it on its own - a plain function
+def render_kpi_row(totals, klaviyo_data):
+    total_spend = totals['spend']
+    total_purchases = totals['purchases']
+    total_revenue = totals['revenue']
     
     # Enhanced metrics row with Email data
     if klaviyo_data:
@@ -476,11 +454,9 @@ if data:
         with col4:
             st.metric("🛒 Total Conversions", f"{total_purchases:,}")
         with col5:
-            overall_roas = calculate_roas(total_spend, total_revenue)
-            st.metric("📊 FB ROAS", f"{overall_roas:.2f}x")
+            st.metric("📊 FB ROAS", f"{totals['roas']:.2f}x")
         with col6:
-            overall_ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
-            st.metric("👆 Overall CTR", f"{overall_ctr:.2f}%")
+            st.metric("👆 Overall CTR", f"{totals['ctr']:.2f}%")
     else:
         # Original metrics (Facebook only)
         col1, col2, col3, col4, col5 = st.columns(5)
@@ -490,299 +466,584 @@ if data:
         with col2:
             st.metric("🛒 Total Purchases", f"{total_purchases:,}")
         with col3:
-            overall_roas = calculate_roas(total_spend, total_revenue)
-            st.metric("📈 Overall ROAS", f"{overall_roas:.2f}x")
+            st.metric("📈 Overall ROAS", f"{totals['roas']:.2f}x")
         with col4:
-            avg_cpa = total_spend / total_purchases if total_purchases > 0 else 0
-            st.metric("🎯 Avg CPA", f"${avg_cpa:.2f}")
+            st.metric("🎯 Avg CPA", f"${totals['cpa']:.2f}")
         with col5:
-            overall_ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
-            st.metric("👆 Overall CTR", f"{overall_ctr:.2f}%")
+            st.metric("👆 Overall CTR", f"{totals['ctr']:.2f}%")
+
+@st.fragment
+@timed_fragment('overview_tab')
+def render_overview_tab(view):
+    campaigns_df, adsets_df = view['frames']['campaign'], view['frames']['adset']
+    ads_df = load_ad_frame(view) if ads_wanted(view) else None
     
-    st.markdown("---")
+    # Overview metrics
+    col1, col2 = st.columns([2, 1])
     
-    # Create tabs for different levels
-    if klaviyo_data:
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Overview", "🎯 Campaigns", "🔍 Ad Sets", "📢 Ads", "📧 Email Performance"])
-    else:
-        tab1, tab2, tab3, tab4 = st.tabs(["📊 Overview", "🎯 Campaigns", "🔍 Ad Sets", "📢 Ads"])
+    with col1:
+        st.header("🏆 Top Performers Summary")
+        
+        # Top campaigns
+        if not campaigns_df.empty:
+            top_campaigns = campaigns_df.nlargest(5, 'roas').to_dict('records')
+            st.subheader("🎯 Top 5 Campaigns by ROAS")
+            for camp in top_campaigns:
+                if camp['purchases'] > 0:
+                    st.write(f"**{camp['campaign_name'][:40]}...** - ROAS: {camp['roas']:.2f}x | Purchases: {camp['purchases']}")
+        
+        # Top ad sets
+        if not adsets_df.empty:
+            top_adsets = adsets_df.nlargest(5, 'roas').to_dict('records')
+            st.subheader("🔍 Top 5 Ad Sets by ROAS")
+            for adset in top_adsets:
+                if adset['purchases'] > 0:
+                    st.write(f"**{adset['adset_name'][:40]}...** - ROAS: {adset['roas']:.2f}x | CPA: ${adset['cpa']:.2f}")
+        
+        # Top ads
+        if ads_df is not None and not ads_df.empty:
+            top_ads = ads_df.nlargest(5, 'roas').to_dict('records')
+            st.subheader("📢 Top 5 Ads by ROAS")
+            for ad in top_ads:
+                if ad['purchases'] > 0:
+                    st.write(f"**{ad['ad_name'][:40]}...** - ROAS: {ad['roas']:.2f}x | CTR: {ad['ctr']:.2f}%")
     
-    with tab1:
-        # Overview metrics
-        col1, col2 = st.columns([2, 1])
+    with col2:
+        st.header("⚡ Priority Actions")
         
-        with col1:
-            st.header("🏆 Top Performers Summary")
-            
-            # Top campaigns
-            if campaigns_data:
-                top_campaigns = sorted(campaigns_data, key=lambda x: x['roas'], reverse=True)[:5]
-                st.subheader("🎯 Top 5 Campaigns by ROAS")
-                for camp in top_campaigns:
-                    if camp['purchases'] > 0:
-                        st.write(f"**{camp['campaign_name'][:40]}...** - ROAS: {camp['roas']:.2f}x | Purchases: {camp['purchases']}")
-            
-            # Top ad sets
-            if adsets_data:
-                top_adsets = sorted(adsets_data, key=lambda x: x['roas'], reverse=True)[:5]
-                st.subheader("🔍 Top 5 Ad Sets by ROAS")
-                for adset in top_adsets:
-                    if adset['purchases'] > 0:
-                        st.write(f"**{adset['adset_name'][:40]}...** - ROAS: {adset['roas']:.2f}x | CPA: ${adset['cpa']:.2f}")
-            
-            # Top ads
-            if ads_data:
-                top_ads = sorted(ads_data, key=lambda x: x['roas'], reverse=True)[:5]
-                st.subheader("📢 Top 5 Ads by ROAS")
-                for ad in top_ads:
-                    if ad['purchases'] > 0:
-                        st.write(f"**{ad['ad_name'][:40]}...** - ROAS: {ad['roas']:.2f}x | CTR: {ad['ctr']:.2f}%")
+        # Campaign level actions
+        st.subheader("🎯 Campaign Actions")
+        render_priority_actions(level_actions(view, 'campaign'))
         
-        with col2:
-            st.header("⚡ Priority Actions")
-            
-            # Campaign level actions
-            st.subheader("🎯 Campaign Actions")
-            campaign_actions = 0
-            for camp in sorted(campaigns_data, key=lambda x: x['roas'], reverse=True):
-                if camp['roas'] > 4.0 and camp['purchases'] >= 5:
-                    st.success(f"✅ SCALE: {camp['campaign_name'][:25]}...")
-                    campaign_actions += 1
-                elif camp['roas'] < 2.0 and camp['spend'] > 50:
-                    st.error(f"❌ PAUSE: {camp['campaign_name'][:25]}...")
-                    campaign_actions += 1
-                if campaign_actions >= 3:
-                    break
-            
-            # Ad set level actions
-            st.subheader("🔍 Ad Set Actions")
-            adset_actions = 0
-            for adset in sorted(adsets_data, key=lambda x: x['cpa']):
-                if adset['purchases'] > 0 and adset['cpa'] < 30:
-                    st.success(f"✅ SCALE ADSET: {adset['adset_name'][:20]}...")
-                    adset_actions += 1
-                elif adset['spend'] > 25 and adset['purchases'] == 0:
-                    st.error(f"❌ PAUSE ADSET: {adset['adset_name'][:20]}...")
-                    adset_actions += 1
-                if adset_actions >= 3:
-                    break
-            
-            # Ad level actions
-            st.subheader("📢 Ad Actions")
-            ad_actions = 0
-            for ad in sorted(ads_data, key=lambda x: x['ctr'], reverse=True):
-                if ad['ctr'] > 2.0 and ad['impressions'] > 1000:
-                    st.success(f"✅ SCALE AD: {ad['ad_name'][:20]}...")
-                    ad_actions += 1
-                elif ad['ctr'] < 0.5 and ad['spend'] > 15:
-                    st.warning(f"🔄 REFRESH AD: {ad['ad_name'][:20]}...")
-                    ad_actions += 1
-                if ad_actions >= 3:
-                    break
-    
-    with tab2:
-        st.header("🎯 Campaign Level Analysis")
+        # Ad set level actions
+        st.subheader("🔍 Ad Set Actions")
+        render_priority_actions(level_actions(view, 'adset'))
         
-        if campaigns_data:
-            # Campaign performance table
-            campaign_df = pd.DataFrame(campaigns_data)
-            campaign_df = campaign_df.sort_values('roas', ascending=False)
-            
-            # Format for display
-            display_df = campaign_df.copy()
-            display_df['spend'] = display_df['spend'].apply(lambda x: f"${x:,.2f}")
-            display_df['revenue'] = display_df['revenue'].apply(lambda x: f"${x:,.2f}")
-            display_df['roas'] = display_df['roas'].apply(lambda x: f"{x:.2f}x")
-            display_df['cpa'] = display_df['cpa'].apply(lambda x: f"${x:.2f}" if x > 0 else "N/A")
-            display_df['ctr'] = display_df['ctr'].apply(lambda x: f"{x:.2f}%")
-            display_df['impressions'] = display_df['impressions'].apply(lambda x: f"{x:,}")
-            
-            st.dataframe(display_df[['campaign_name', 'spend', 'impressions', 'clicks', 'purchases', 'roas', 'cpa', 'ctr']], use_container_width=True)
-            
-            # Campaign recommendations
-            st.subheader("🎯 Campaign Recommendations")
-            for _, camp in campaign_df.iterrows():
-                if camp['roas'] > 4.0 and camp['purchases'] >= 5:
-                    st.success(f"**SCALE CAMPAIGN:** {camp['campaign_name']}")
-                    st.write(f"→ Increase budget by 50-100% (Current ROAS: {camp['roas']:.2f}x)")
-                elif camp['roas'] < 2.0 and camp['spend'] > 50:
-                    st.error(f"**PAUSE CAMPAIGN:** {camp['campaign_name']}")
-                    st.write(f"→ Poor performance: {camp['roas']:.2f}x ROAS after ${camp['spend']:.2f} spend")
-    
-    with tab3:
-        st.header("🔍 Ad Set Level Analysis")
+        # Ad level actions
+        st.subheader("📢 Ad Actions")
+        if ads_df is not None:
+            render_priority_actions(level_actions(view, 'ad'))
+        elif not ads_wanted(view):
+            st.button("📢 Load ad-level insights", key="load_ads_overview", on_click=request_ads, args=(view['memo'],),
+                      help="Ad-level data is the biggest pull, so it's only fetched when you ask for it or open the Ads tab")
+
+@st.fragment
+@timed_fragment('campaigns_tab')
+def render_campaigns_tab(view):
+    campaigns_df = view['frames']['campaign']
+    st.header("🎯 Campaign Level Analysis")
+    
+    if not campaigns_df.empty:
+        # Campaign performance table
+        render_data_table(campaigns_df, 'campaigns_table',
+                          ['campaign_name', 'spend', 'impressions', 'clicks', 'purchases', 'roas', 'cpa', 'ctr'],
+                          ['campaign_name'])
         
-        if adsets_data:
-            # Ad set performance table
-            adset_df = pd.DataFrame(adsets_data)
-            adset_df = adset_df.sort_values('roas', ascending=False)
-            
-            # Format for display
-            display_df = adset_df.copy()
-            display_df['spend'] = display_df['spend'].apply(lambda x: f"${x:,.2f}")
-            display_df['revenue'] = display_df['revenue'].apply(lambda x: f"${x:,.2f}")
-            display_df['roas'] = display_df['roas'].apply(lambda x: f"{x:.2f}x")
-            display_df['cpa'] = display_df['cpa'].apply(lambda x: f"${x:.2f}" if x > 0 else "N/A")
-            display_df['ctr'] = display_df['ctr'].apply(lambda x: f"{x:.2f}%")
-            display_df['cpm'] = display_df['cpm'].apply(lambda x: f"${x:.2f}")
-            
-            st.dataframe(display_df[['campaign_name', 'adset_name', 'spend', 'purchases', 'roas', 'cpa', 'ctr', 'cpm']], use_container_width=True)
-            
-            # Ad set recommendations
-            st.subheader("🔍 Ad Set Recommendations")
-            for _, adset in adset_df.iterrows():
-                if adset['purchases'] > 0 and adset['cpa'] < 30:
-                    st.success(f"**SCALE AD SET:** {adset['adset_name']}")
-                    st.write(f"→ Great CPA: ${adset['cpa']:.2f} | Campaign: {adset['campaign_name']}")
-                elif adset['spend'] > 25 and adset['purchases'] == 0:
-                    st.error(f"**PAUSE AD SET:** {adset['adset_name']}")
-                    st.write(f"→ No conversions after ${adset['spend']:.2f} spend | Campaign: {adset['campaign_name']}")
-                elif adset['cpm'] > 50 and adset['ctr'] < 1.0:
-                    st.warning(f"**AUDIENCE ISSUE:** {adset['adset_name']}")
-                    st.write(f"→ High CPM (${adset['cpm']:.2f}) + Low CTR ({adset['ctr']:.2f}%) = Audience fatigue")
-        else:
-            st.info("No ad set data found for the selected time period.")
+        # Campaign recommendations
+        st.subheader("🎯 Campaign Recommendations")
+        render_recommendations(level_actions(view, 'campaign'))
+
+@st.fragment
+@timed_fragment('adsets_tab')
+def render_adsets_tab(view):
+    adsets_df = view['frames']['adset']
+    st.header("🔍 Ad Set Level Analysis")
     
-    with tab4:
-        st.header("📢 Ad Level Analysis")
+    if not adsets_df.empty:
+        # Ad set performance table
+        render_data_table(adsets_df, 'adsets_table',
+                          ['campaign_name', 'adset_name', 'spend', 'purchases', 'roas', 'cpa', 'ctr', 'cpm'],
+                          ['campaign_name', 'adset_name'])
         
-        if ads_data:
-            # Ad performance table
-            ad_df = pd.DataFrame(ads_data)
-            ad_df = ad_df.sort_values('roas', ascending=False)
-            
-            # Format for display
-            display_df = ad_df.copy()
-            display_df['spend'] = display_df['spend'].apply(lambda x: f"${x:,.2f}")
-            display_df['revenue'] = display_df['revenue'].apply(lambda x: f"${x:,.2f}")
-            display_df['roas'] = display_df['roas'].apply(lambda x: f"{x:.2f}x")
-            display_df['cpa'] = display_df['cpa'].apply(lambda x: f"${x:.2f}" if x > 0 else "N/A")
-            display_df['ctr'] = display_df['ctr'].apply(lambda x: f"{x:.2f}%")
-            display_df['cpm'] = display_df['cpm'].apply(lambda x: f"${x:.2f}")
-            
-            st.dataframe(display_df[['campaign_name', 'adset_name', 'ad_name', 'spend', 'purchases', 'roas', 'ctr', 'cpm']], use_container_width=True)
-            
-            # Ad recommendations
-            st.subheader("📢 Ad Creative Recommendations")
-            for _, ad in ad_df.iterrows():
-                if ad['ctr'] > 2.0 and ad['impressions'] > 1000:
-                    st.success(f"**WINNING CREATIVE:** {ad['ad_name']}")
-                    st.write(f"→ High CTR: {ad['ctr']:.2f}% | Use this creative style for new ads")
-                elif ad['ctr'] < 0.5 and ad['spend'] > 15:
-                    st.warning(f"**REFRESH CREATIVE:** {ad['ad_name']}")
-                    st.write(f"→ Low CTR: {ad['ctr']:.2f}% | Creative is worn out, needs refresh")
-                elif ad['ctr'] > 1.5 and ad['purchases'] == 0 and ad['spend'] > 20:
-                    st.warning(f"**LANDING PAGE ISSUE:** {ad['ad_name']}")
-                    st.write(f"→ Good CTR ({ad['ctr']:.2f}%) but no conversions - check landing page")
-        else:
-            st.info("No ad data found for the selected time period.")
+        # Ad set recommendations
+        st.subheader("🔍 Ad Set Recommendations")
+        render_recommendations(level_actions(view, 'adset'))
+    else:
+        st.info("No ad set data found for the selected time period.")
+
+@st.fragment
+@timed_fragment('ads_tab')
+def render_ads_tab(view):
+    st.header("📢 Ad Level Analysis")
+    ads_df = load_ad_frame(view)
+    if ads_df is None:
+        return
     
-    # Email Performance Tab (only shows if Klaviyo is enabled)
-    if klaviyo_data:
-        with tab5:
-            st.header("📧 Email Campaign Performance")
-            
-            # Email summary metrics
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("💸 Total Email Revenue", f"${klaviyo_data['total_revenue']:,.2f}")
-            with col2:
-                overall_open_rate = (klaviyo_data['total_opens'] / klaviyo_data['total_emails_sent'] * 100) if klaviyo_data['total_emails_sent'] > 0 else 0
-                st.metric("📬 Overall Open Rate", f"{overall_open_rate:.1f}%")
-            with col3:
-                overall_click_rate = (klaviyo_data['total_clicks'] / klaviyo_data['total_emails_sent'] * 100) if klaviyo_data['total_emails_sent'] > 0 else 0
-                st.metric("👆 Overall Click Rate", f"{overall_click_rate:.1f}%")
-            
-            # Email campaigns table
-            if klaviyo_data['campaigns']:
-                st.subheader("📧 Email Campaign Breakdown")
-                email_df = pd.DataFrame(klaviyo_data['campaigns'])
-                
-                # Format for display
-                display_email_df = email_df.copy()
-                display_email_df['revenue'] = display_email_df['revenue'].apply(lambda x: f"${x:,.2f}")
-                display_email_df['open_rate'] = display_email_df['open_rate'].apply(lambda x: f"{x:.1f}%")
-                display_email_df['click_rate'] = display_email_df['click_rate'].apply(lambda x: f"{x:.1f}%")
-                display_email_df['emails_sent'] = display_email_df['emails_sent'].apply(lambda x: f"{x:,}")
-                
-                st.dataframe(display_email_df[['name', 'emails_sent', 'open_rate', 'click_rate', 'revenue', 'status']], use_container_width=True)
-                
-                # Email recommendations
-                st.subheader("📧 Email Optimization Recommendations")
-                for _, campaign in email_df.iterrows():
-                    if campaign['open_rate'] > 25.0 and campaign['revenue'] > 1000:
-                        st.success(f"✅ **HIGH PERFORMER:** {campaign['name']}")
-                        st.write(f"→ Great open rate: {campaign['open_rate']:.1f}% | Revenue: ${campaign['revenue']:,.2f}")
-                    elif campaign['open_rate'] < 15.0 and campaign['emails_sent'] > 500:
-                        st.warning(f"🔄 **IMPROVE SUBJECT LINE:** {campaign['name']}")
-                        st.write(f"→ Low open rate: {campaign['open_rate']:.1f}% | Test new subject lines")
-                    elif campaign['click_rate'] < 1.0 and campaign['open_rate'] > 20.0:
-                        st.warning(f"🔄 **IMPROVE CONTENT:** {campaign['name']}")
-                        st.write(f"→ Good opens ({campaign['open_rate']:.1f}%) but low clicks ({campaign['click_rate']:.1f}%)")
-                    elif campaign['revenue'] < 100 and campaign['emails_sent'] > 1000:
-                        st.error(f"❌ **LOW REVENUE:** {campaign['name']}")
-                        st.write(f"→ Poor performance: ${campaign['revenue']:,.2f} from {campaign['emails_sent']:,} emails")
-            
-            # Cross-channel insights
-            if total_revenue > 0 and klaviyo_data['total_revenue'] > 0:
-                st.markdown("---")
-                st.subheader("🔗 Cross-Channel Insights")
-                
-                fb_contribution = (total_revenue / (total_revenue + klaviyo_data['total_revenue'])) * 100
-                email_contribution = (klaviyo_data['total_revenue'] / (total_revenue + klaviyo_data['total_revenue'])) * 100
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("📘 Facebook Contribution", f"{fb_contribution:.1f}%")
-                    st.write(f"${total_revenue:,.2f} revenue from ads")
-                with col2:
-                    st.metric("📧 Email Contribution", f"{email_contribution:.1f}%")
-                    st.write(f"${klaviyo_data['total_revenue']:,.2f} revenue from email")
-                
-                combined_revenue = total_revenue + klaviyo_data['total_revenue']
-                combined_roas = calculate_roas(total_spend, combined_revenue)
-                st.info(f"💡 **Insight:** Your combined marketing generates ${combined_revenue:,.2f} with a {combined_roas:.2f}x ROAS!")
-            else:
-                st.info("No email campaign data found for the selected time period.")
+    if not ads_df.empty:
+        # Ad performance table
+        render_data_table(ads_df, 'ads_table',
+                          ['campaign_name', 'adset_name', 'ad_name', 'spend', 'purchases', 'roas', 'ctr', 'cpm'],
+                          ['campaign_name', 'adset_name', 'ad_name'])
+        
+        # Ad recommendations
+        st.subheader("📢 Ad Creative Recommendations")
+        render_recommendations(level_actions(view, 'ad'))
+    else:
+        st.info("No ad data found for the selected time period.")
+
+# (callout, title, detail) for each email campaign that needs attention
+def email_recommendations(email_df):
+    recommendations = []
+    for campaign in email_df.to_dict('records'):
+        if campaign['open_rate'] > 25.0 and campaign['revenue'] > 1000:
+            recommendations.append(('success', f"✅ **HIGH PERFORMER:** {campaign['name']}",
+                                    f"→ Great open rate: {campaign['open_rate']:.1f}% | Revenue: ${campaign['revenue']:,.2f}"))
+        elif campaign['open_rate'] < 15.0 and campaign['emails_sent'] > 500:
+            recommendations.append(('warning', f"🔄 **IMPROVE SUBJECT LINE:** {campaign['name']}",
+                                    f"→ Low open rate: {campaign['open_rate']:.1f}% | Test new subject lines"))
+        elif campaign['click_rate'] < 1.0 and campaign['open_rate'] > 20.0:
+            recommendations.append(('warning', f"🔄 **IMPROVE CONTENT:** {campaign['name']}",
+                                    f"→ Good opens ({campaign['open_rate']:.1f}%) but low clicks ({campaign['click_rate']:.1f}%)"))
+        elif campaign['revenue'] < 100 and campaign['emails_sent'] > 1000:
+            recommendations.append(('error', f"❌ **LOW REVENUE:** {campaign['name']}",
+                                    f"→ Poor performance: ${campaign['revenue']:,.2f} from {campaign['emails_sent']:,} emails"))
+    return recommendations
+
+@st.fragment
+@timed_fragment('email_tab')
+def render_email_tab(view):
+    klaviyo_data = view['klaviyo']
+    total_revenue = view['totals']['revenue']
+    total_spend = view['totals']['spend']
+    st.header("📧 Email Campaign Performance")
     
-    # Charts section
-    if campaigns_data:
+    # Email summary metrics
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("💸 Total Email Revenue", f"${klaviyo_data['total_revenue']:,.2f}")
+    with col2:
+        overall_open_rate = (klaviyo_data['total_opens'] / klaviyo_data['total_emails_sent'] * 100) if klaviyo_data['total_emails_sent'] > 0 else 0
+        st.metric("📬 Overall Open Rate", f"{overall_open_rate:.1f}%")
+    with col3:
+        overall_click_rate = (klaviyo_data['total_clicks'] / klaviyo_data['total_emails_sent'] * 100) if klaviyo_data['total_emails_sent'] > 0 else 0
+        st.metric("👆 Overall Click Rate", f"{overall_click_rate:.1f}%")
+    
+    # Email campaigns table
+    if klaviyo_data['campaigns']:
+        st.subheader("📧 Email Campaign Breakdown")
+        email_df = memoized(view['memo'], 'email_df', lambda: pd.DataFrame(klaviyo_data['campaigns']))
+        
+        # Numbers stay numeric; the column config formats them in the browser
+        st.dataframe(
+            email_df[['name', 'emails_sent', 'open_rate', 'click_rate', 'revenue', 'status']],
+            width='stretch',
+            column_config={
+                'name': st.column_config.TextColumn("Name"),
+                'emails_sent': st.column_config.NumberColumn("Emails Sent", format="localized"),
+                'open_rate': st.column_config.NumberColumn("Open Rate", format="%.1f%%"),
+                'click_rate': st.column_config.NumberColumn("Click Rate", format="%.1f%%"),
+                'revenue': st.column_config.NumberColumn("Revenue", format="dollar"),
+                'status': st.column_config.TextColumn("Status")
+            }
+        )
+        
+        # Email recommendations
+        st.subheader("📧 Email Optimization Recommendations")
+        for kind, title, detail in memoized(view['memo'], 'email_recommendations', lambda: email_recommendations(email_df)):
+            getattr(st, kind)(title)
+            st.write(detail)
+    
+    # Cross-channel insights
+    if total_revenue > 0 and klaviyo_data['total_revenue'] > 0:
         st.markdown("---")
-        st.header("📈 Performance Visualization")
+        st.subheader("🔗 Cross-Channel Insights")
         
-        chart_col1, chart_col2 = st.columns(2)
+        fb_contribution = (total_revenue / (total_revenue + klaviyo_data['total_revenue'])) * 100
+        email_contribution = (klaviyo_data['total_revenue'] / (total_revenue + klaviyo_data['total_revenue'])) * 100
         
-        with chart_col1:
-            # Campaign ROAS chart
-            campaign_df = pd.DataFrame(campaigns_data).head(10)
-            if not campaign_df.empty:
-                fig_roas = px.bar(
-                    campaign_df, 
-                    x='campaign_name', 
-                    y='roas',
-                    title="Campaign ROAS",
-                    color='roas',
-                    color_continuous_scale='RdYlGn'
-                )
-                fig_roas.update_xaxes(tickangle=45)
-                fig_roas.update_layout(height=400)
-                st.plotly_chart(fig_roas, use_container_width=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("📘 Facebook Contribution", f"{fb_contribution:.1f}%")
+            st.write(f"${total_revenue:,.2f} revenue from ads")
+        with col2:
+            st.metric("📧 Email Contribution", f"{email_contribution:.1f}%")
+            st.write(f"${klaviyo_data['total_revenue']:,.2f} revenue from email")
         
-        with chart_col2:
-            # Ad set performance
-            if adsets_data:
-                adset_df = pd.DataFrame(adsets_data).head(10)
-                fig_adset = px.scatter(
-                    adset_df,
-                    x='spend',
-                    y='roas',
-                    size='purchases',
-                    color='ctr',
-                    title="Ad Set Performance",
-                    hover_data=['adset_name']
-                )
-                fig_adset.update_layout(height=400)
-                st.plotly_chart(fig_adset, use_container_width=True)
+        combined_revenue = total_revenue + klaviyo_data['total_revenue']
+        combined_roas = calculate_roas(total_spend, combined_revenue)
+        st.info(f"💡 **Insight:** Your combined marketing generates ${combined_revenue:,.2f} with a {combined_roas:.2f}x ROAS!")
+    else:
+        st.info("No email campaign data found for the selected time period.")
+
+# Only the open tab runs (switching tabs reruns this fragment, not the page)
+@st.fragment
+@timed_fragment('tabs')
+def render_level_tabs(view):
+    tab_renderers = {
+        "📊 Overview": render_overview_tab,
+        "🎯 Campaigns": render_campaigns_tab,
+        "🔍 Ad Sets": render_adsets_tab,
+        "📢 Ads": render_ads_tab
+    }
+    if view['klaviyo']:
+        tab_renderers["📧 Email Performance"] = render_email_tab
+    
+    tabs = st.tabs(list(tab_renderers), key="dashboard_tab", on_change="rerun")
+    for tab, render_tab in zip(tabs, tab_renderers.values()):
+        with tab:
+            if tab.open:
+                render_tab(view)
+
+# Bars / points in the summary charts - the biggest spenders, not whatever the API returned first
+CHART_TOP_N = 10
+# Above this many points a line chart is drawn with WebGL instead of SVG
+WEBGL_MIN_POINTS = 1000
+
+def campaign_roas_chart(campaigns_df):
+    fig_roas = px.bar(
+        campaigns_df.nlargest(CHART_TOP_N, 'spend'), 
+        x='campaign_name', 
+        y='roas',
+        title="Campaign ROAS",
+        color='roas',
+        color_continuous_scale='RdYlGn'
+    )
+    fig_roas.update_xaxes(tickangle=45)
+    fig_roas.update_layout(height=400)
+    return fig_roas
+
+def adset_scatter_chart(adsets_df):
+    fig_adset = px.scatter(
+        adsets_df.nlargest(CHART_TOP_N, 'spend'),
+        x='spend',
+        y='roas',
+        size='purchases',
+        color='ctr',
+        title="Ad Set Performance",
+        hover_data=['adset_name']
+    )
+    fig_adset.update_layout(height=400)
+    return fig_adset
+
+@st.fragment
+@timed_fragment('charts')
+def render_charts(view):
+    campaigns_df, adsets_df = view['frames']['campaign'], view['frames']['adset']
+    st.markdown("---")
+    st.header("📈 Performance Visualization")
+    
+    chart_col1, chart_col2 = st.columns(2)
+    
+    with chart_col1:
+        # Campaign ROAS chart
+        st.plotly_chart(memoized(view['memo'], 'campaign_roas_chart', lambda: campaign_roas_chart(campaigns_df)),
+                        width='stretch')
+    
+    with chart_col2:
+        # Ad set performance
+        if not adsets_df.empty:
+            st.plotly_chart(memoized(view['memo'], 'adset_scatter_chart', lambda: adset_scatter_chart(adsets_df)),
+                            width='stretch')
+    
+    render_trends(view)
+
+# Daily campaign rows, fetched the first time the trend chart is drawn (the same
+# way as the ad frame). Returns the daily frame, or None if the fetch failed.
+def load_trend_frame(view):
+    memo = view['memo']
+    cached = memo.get('trend_frame')
+    if cached is not None and not cached['stale']:
+        return cached['frame']
+    
+    query = view['ads_query']
+    refresh = query['refresh'] and cached is None
+    timings = {}
+    try:
+        with st.spinner("🔄 Pulling daily campaign data..."):
+            rows = fetch_daily_trends(ACCESS_TOKEN, query['start_date'], query['end_date'], query['account_id'],
+                                      refresh=refresh, stale_ok=query['stale_ok'], timings=timings)
+    except Exception as e:
+        st.error(f"API Error: {e}")
+        return None
+    
+    trend_timing = timings['trends']
+    query['timings']['trends'] = trend_timing
+    run_metrics.record('trends_fetch', trend_timing['seconds'])
+    if trend_timing['stale']:
+        revalidate_in_background(f"{query['revalidation_key']}:trends", lambda: fetch_daily_trends(
+            ACCESS_TOKEN, query['start_date'], query['end_date'], query['account_id']
+        ))
+    
+    if cached is None or cached['fetched_at'] != trend_timing['fetched_at']:
+        frame_key = ('daily', query['revalidation_key'], query['avg_order_value'], trend_timing['fetched_at'])
+        cached = {
+            'fetched_at': trend_timing['fetched_at'],
+            'frame': get_frame_store().get_or_build(frame_key, lambda: daily_frame(rows, query['avg_order_value']))
+        }
+        # Series and figures were built from the old rows
+        for name in [name for name in memo if name.startswith('trend:')]:
+            del memo[name]
+    cached['stale'] = trend_timing['stale']
+    memo['trend_frame'] = cached
+    return cached['frame']
+
+# One line per series - WebGL traces once there are too many points for SVG
+def trend_chart(trend_df, metric, bucket_days):
+    trace = go.Scattergl if len(trend_df) > WEBGL_MIN_POINTS else go.Scatter
+    fig = go.Figure()
+    for series_name, series_df in trend_df.groupby('series', sort=False):
+        fig.add_trace(trace(x=series_df['date'], y=series_df[metric], mode='lines', name=series_name))
+    period = "Daily" if bucket_days == 1 else f"{bucket_days}-day"
+    # A short first bucket holds fewer days' totals - shade it rather than scale it
+    dates = sorted(trend_df['date'].unique())
+    first_days = int(trend_df['days'].iloc[0]) if len(trend_df) else bucket_days
+    if first_days < bucket_days and len(dates) > 1:
+        fig.add_vrect(x0=dates[0], x1=dates[1], fillcolor='gray', opacity=0.1, line_width=0,
+                      annotation_text=f"{first_days} of {bucket_days} days", annotation_position='top left')
+    fig.update_layout(
+        title=f"{period} {TREND_METRICS[metric].split(' (')[0]} by Campaign",
+        yaxis_title=TREND_METRICS[metric],
+        height=450,
+        hovermode='x unified',
+        legend={'orientation': 'h', 'y': -0.2}
+    )
+    return fig
+
+# The trend controls only rerun this fragment; the series for a (ranking, top N)
+# and the figure for a metric are built once and reused
+@st.fragment
+@timed_fragment('trends')
+def render_trends(view):
+    st.subheader("📅 Daily Trends")
+    control_col1, control_col2, control_col3 = st.columns(3)
+    metric_labels = {metric: label.split(' (')[0] for metric, label in TREND_METRICS.items()}
+    with control_col1:
+        metric = st.selectbox("Metric", list(TREND_METRICS), format_func=metric_labels.get, key="trend_metric")
+    with control_col2:
+        rank_by = st.selectbox("Top campaigns by", list(TREND_METRICS), format_func=metric_labels.get, key="trend_rank_by")
+    with control_col3:
+        top_n = st.slider("Campaigns", 1, TREND_MAX_TOP_N, TREND_TOP_N, key="trend_top_n")
+    
+    daily_df = load_trend_frame(view)
+    if daily_df is None:
+        return
+    if daily_df.empty:
+        st.info("No daily campaign data for the selected time period.")
+        return
+    
+    query = view['ads_query']
+    memo = view['memo']
+    trend_df, bucket_days = memoized(memo, f"trend:series:{rank_by}:{top_n}", lambda: trend_series(
+        daily_df, query['start_date'], query['end_date'], rank_by=rank_by, top_n=top_n
+    ))
+    fig = memoized(memo, f"trend:chart:{metric}:{rank_by}:{top_n}", lambda: trend_chart(trend_df, metric, bucket_days))
+    st.plotly_chart(fig, width='stretch')
+    if bucket_days > 1:
+        st.caption(f"Long range: each point sums {bucket_days} days, ending on the last day - a shaded first "
+                   f"point sums the fewer days left over (ratios are worked out from the sums)")
+
+# Warm jobs: every client x preset range - the summary levels the page opens with,
+# the daily trend rows, and Klaviyo for clients that have it. Ad-level data is only
+# pulled when someone asks for it, so it isn't warmed. Entries within
+# WARM_AHEAD_SECONDS of expiring are fetched again. Klaviyo ranges are only warmed
+# when they are about to expire, out of one report budget for the API key.
+# Dates are worked out when the job runs, so a warmer left running overnight
+# fills the same cache keys the sidebar asks for the next morning.
+def build_warm_jobs():
+    # Secrets are read here, on the script thread, not inside the worker
+    klaviyo_api_key = st.secrets.get("klaviyo_api_key")
+    conversion_metric_id = st.secrets.get("klaviyo_conversion_metric_id")
+    klaviyo_budget = WarmBudget(WARM_KLAVIYO_PER_MINUTE, WARM_KLAVIYO_PER_DAY)
+    jobs = []
+    for client_name, info in CLIENTS.items():
+        for date_option in DATE_PRESETS:
+            def warm_facebook(account_id=info["account_id"], date_option=date_option):
+                start_date, end_date = preset_date_range(date_option)
+                fetch_facebook_data(ACCESS_TOKEN, start_date, end_date, account_id,
+                                    levels=SUMMARY_LEVELS, fresh_for=WARM_AHEAD_SECONDS)
+                fetch_daily_trends(ACCESS_TOKEN, start_date, end_date, account_id, fresh_for=WARM_AHEAD_SECONDS)
+            jobs.append(WarmJob(f"{client_name} / {date_option}", warm_facebook, account_id=info["account_id"]))
+            
+            if info.get("klaviyo_enabled", False) and klaviyo_api_key:
+                def warm_klaviyo(date_option=date_option):
+                    fetch_klaviyo_data(klaviyo_api_key, *preset_date_range(date_option), conversion_metric_id=conversion_metric_id,
+                                       fresh_for=WARM_AHEAD_SECONDS)
+                def klaviyo_fresh(date_option=date_option):
+                    return not klaviyo_expires_within(klaviyo_api_key, *preset_date_range(date_option), WARM_AHEAD_SECONDS)
+                jobs.append(WarmJob(f"{client_name} / {date_option} (email)", warm_klaviyo,
+                                    budget=klaviyo_budget, is_fresh=klaviyo_fresh))
+    return jobs
+
+def current_usage_pct(account_id):
+    return get_scheduler().snapshot().get(account_id, {}).get('usage_pct')
+
+# One warmer per process, shared by every session
+@st.cache_resource
+def start_cache_warmer():
+    return CacheWarmer(build_warm_jobs(), usage_fn=current_usage_pct).start()
+
+cache_warmer = start_cache_warmer() if WARMER_ENABLED else None
+
+# Main dashboard
+st.title("📊 Live Facebook Ads Dashboard")
+
+# Client selector in sidebar
+st.sidebar.header("🏢 Client Selection")
+selected_client = st.sidebar.selectbox(
+    "Choose Client:",
+    list(CLIENTS.keys()) + [ALL_CLIENTS_OPTION],
+    index=0
+)
+
+# Add date range selector
+st.sidebar.header("📅 Date Range")
+date_option = st.sidebar.selectbox(
+    "Select Time Period:",
+    list(DATE_PRESETS.keys()) + ["Custom Range"]
+)
+
+# Handle custom date range
+if date_option == "Custom Range":
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        start_date = st.sidebar.date_input("Start Date", datetime.now() - timedelta(days=30))
+    with col2:
+        end_date = st.sidebar.date_input("End Date", datetime.now())
+else:
+    # Calculate date range based on selection
+    start_date, end_date = preset_date_range(date_option)
+
+if selected_client == ALL_CLIENTS_OPTION:
+    render_all_clients_overview(start_date, end_date)
+    run_metrics.lap('all_clients_overview')
+    run_metrics.finish(client=ALL_CLIENTS_OPTION, since=start_date.strftime('%Y-%m-%d'), until=end_date.strftime('%Y-%m-%d'))
+    st.stop()
+
+# Get selected client info
+client_info = CLIENTS[selected_client]
+current_account_id = client_info["account_id"]
+current_logo_url = client_info["logo_url"]
+current_aov = client_info["avg_order_value"]
+
+# Add company logo and branding
+col1, col2 = st.columns([1, 4])
+with col1:
+    st.markdown(f"""
+    <img src="{current_logo_url}" width="75px">
+    """, unsafe_allow_html=True)
+with col2:
+    st.markdown(f"### {selected_client} Performance Dashboard")
+
+st.markdown("---")
+
+single_fetch = st.sidebar.checkbox(
+    "⚡ Single-fetch mode",
+    value=False,
+    help="Pull ad-level data once and build campaign and ad set totals from it (1 API query instead of 3)"
+)
+
+stale_while_revalidate = st.sidebar.checkbox(
+    "🚀 Instant load",
+    value=True,
+    help="Show the last fetched data for this client and range right away and refresh it in the background"
+)
+
+# Logged with every rerun of this page, fragment reruns included
+run_context = {
+    'client': selected_client,
+    'since': start_date.strftime('%Y-%m-%d'),
+    'until': end_date.strftime('%Y-%m-%d'),
+    'single_fetch': single_fetch
+}
+
+st.markdown(f"**Showing data from:** {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
+data_age_line = st.empty()
+
+run_metrics.lap('setup')
+
+# Get live data with selected date range
+with st.spinner(f"🔄 Pulling {selected_client} data from {start_date.strftime('%m/%d')} to {end_date.strftime('%m/%d')}..."):
+    # "Refresh Data" skips the cache for this one run
+    force_refresh = st.session_state.pop("force_refresh", False)
+    fetch_timings = {}
+    # Campaigns and ad sets only - ad-level data is pulled when a view needs it
+    data = get_facebook_data(start_date, end_date, current_account_id, refresh=force_refresh, timings=fetch_timings,
+                             single_fetch=single_fetch, stale_ok=stale_while_revalidate, levels=SUMMARY_LEVELS)
+
+run_metrics.lap('facebook_fetch')
+for level_name, level_timing in fetch_timings.items():
+    get_metrics().inc('dashboard_rows_total', level_timing['rows'], level=level_name)
+
+# Check if client has Klaviyo enabled and get email data
+klaviyo_data = None
+klaviyo_meta = {}
+if client_info.get("klaviyo_enabled", False):
+    with st.spinner(f"🔄 Pulling email data for {selected_client}..."):
+        klaviyo_data = get_klaviyo_data(start_date, end_date, refresh=force_refresh, stale_ok=stale_while_revalidate, meta=klaviyo_meta)
+
+run_metrics.lap('klaviyo_fetch')
+
+# Anything served stale is refreshed in the background; the page reruns once it lands
+revalidation_key = f"{current_account_id}:{start_date.strftime('%Y-%m-%d')}:{end_date.strftime('%Y-%m-%d')}:{single_fetch}"
+served_stale = any(level_timing['stale'] for level_timing in fetch_timings.values()) or klaviyo_meta.get('stale', False)
+if served_stale:
+    # Secrets are read here, on the script thread, not inside the worker
+    klaviyo_api_key = st.secrets["klaviyo_api_key"] if klaviyo_meta.get('stale') else None
+    conversion_metric_id = st.secrets.get("klaviyo_conversion_metric_id")
+    revalidate_in_background(revalidation_key, lambda: revalidate_dashboard_data(
+        ACCESS_TOKEN, start_date, end_date, current_account_id, single_fetch,
+        klaviyo_api_key=klaviyo_api_key, conversion_metric_id=conversion_metric_id, levels=SUMMARY_LEVELS
+    ))
+
+if data:
+    # Everything derived from this data lives in the view memo, so reruns that
+    # don't change client, range or data reuse it instead of rebuilding
+    view_key = (revalidation_key, current_aov,
+                tuple(sorted((level_name, level_timing['fetched_at']) for level_name, level_timing in fetch_timings.items())),
+                klaviyo_meta.get('fetched_at'))
+    memo = view_memo(view_key)
+    
+    # Process all levels of data with client-specific AOV - one compact copy per
+    # client, range and data version, shared by every session showing it
+    frames_key = ('frames',) + view_key[:3]
+    frames = memoized(memo, 'frames', lambda: get_frame_store().get_or_build(
+        frames_key, lambda: account_frames(data, current_aov, single_fetch=single_fetch)
+    ))
+    campaigns_df = frames['campaign']
+    if single_fetch:
+        st.caption("⚡ Single-fetch mode: campaign and ad set totals are summed from ads "
+                   "(reach and frequency count unique people, so they can't be summed and aren't shown)")
+    
+    # Calculate totals from campaign data
+    totals = memoized(memo, 'totals', lambda: account_totals(campaigns_df))
+    total_spend = totals['spend']
+    total_clicks = totals['clicks']
+    
+    run_metrics.lap('process_insights')
+    
+    view = {
+        'memo': memo,
+        'frames': frames,
+        'frames_key': frames_key,
+        'totals': totals,
+        'klaviyo': klaviyo_data,
+        # Recommendations are evaluated per level, the first time a tab needs them
+        'thresholds': resolve_thresholds(client_info.get("thresholds")),
+        'ads_query': {
+            'start_date': start_date,
+            'end_date': end_date,
+            'account_id': current_account_id,
+            'avg_order_value': current_aov,
+            'stale_ok': stale_while_revalidate,
+            'refresh': force_refresh,
+            'revalidation_key': revalidation_key,
+            'timings': fetch_timings
+        }
+    }
+    render_kpi_row(totals, klaviyo_data)
+    
+    st.markdown("---")
+    
+    # Create tabs for different levels
+    render_level_tabs(view)
+    
+    run_metrics.lap('tabs')
+    
+    # Charts section
+    if not campaigns_df.empty:
+        render_charts(view)
+
+    run_metrics.lap('charts')
 
 else:
     st.error("❌ Could not connect to Facebook API")
@@ -793,6 +1054,23 @@ else:
     - You might not have permission to access this ad account: {current_account_id}
     """)
 
+# Data age is the oldest piece on the page, not the time of this rerun. It is
+# written once the view has run, so ad and trend data pulled on demand count too.
+fetched_times = [level_timing['fetched_at'] for level_timing in fetch_timings.values() if level_timing.get('fetched_at')]
+if klaviyo_meta.get('fetched_at'):
+    fetched_times.append(klaviyo_meta['fetched_at'])
+if data:
+    fetched_times += [memo[name]['fetched_at'] for name in ('ads_frame', 'trend_frame') if memo.get(name, {}).get('fetched_at')]
+revalidating = any(get_revalidation_flight().in_flight(key)
+                   for key in (revalidation_key, f"{revalidation_key}:ads", f"{revalidation_key}:trends"))
+if fetched_times:
+    data_fetched_at = min(fetched_times)
+    data_age_text = (f"**Data fetched:** {datetime.fromtimestamp(data_fetched_at).strftime('%Y-%m-%d %H:%M:%S')} "
+                     f"({format_age(time.time() - data_fetched_at)})")
+    if revalidating:
+        data_age_text += " · 🔄 refreshing…"
+    data_age_line.markdown(data_age_text)
+
 # Sidebar
 st.sidebar.header("🔧 Dashboard Settings")
 st.sidebar.markdown(f"""
@@ -808,19 +1086,79 @@ if client_info.get("klaviyo_enabled", False):
 else:
     st.sidebar.markdown("📧 **Email Integration:** Disabled")
 
-if st.sidebar.button("🔄 Refresh Data"):
-    st.rerun()
+# Graph API usage per ad account (shared by every session in this process)
+api_usage = get_scheduler().snapshot()
+current_usage = api_usage.get(current_account_id)
+if current_usage and current_usage['usage_pct'] is not None:
+    st.sidebar.progress(min(current_usage['usage_pct'], 100) / 100, text=f"📶 API usage: {current_usage['usage_pct']:.0f}%")
+if api_usage:
+    account_names = {info["account_id"]: name for name, info in CLIENTS.items()}
+    with st.sidebar.expander("📶 API usage by account"):
+        for account_id, usage in api_usage.items():
+            usage_text = f"{usage['usage_pct']:.0f}%" if usage['usage_pct'] is not None else "n/a"
+            line = f"**{account_names.get(account_id, account_id)}:** {usage_text} | {usage['calls']} calls"
+            if usage['throttled']:
+                line += f" | {usage['throttled']} throttled"
+            if usage['regain_in']:
+                line += f" | recovers in {usage['regain_in'] / 60:.0f} min"
+            st.write(line)
+
+def request_refresh():
+    st.session_state["force_refresh"] = True
+
+st.sidebar.button("🔄 Refresh Data", on_click=request_refresh)
+
+cache_stats = get_insights_cache().stats()
+st.sidebar.caption(f"Insights cache ({CACHE_BACKEND}): {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_ratio'] * 100:.0f}% hit rate)")
+frame_stats = get_frame_store().stats()
+if frame_stats['entries']:
+    st.sidebar.caption(f"Shared frames: {frame_stats['entries']} ({frame_stats['bytes'] / 1024 ** 2:.1f} of {frame_stats['budget_bytes'] / 1024 ** 2:.0f} MB)")
+coalesced_fetches = get_insights_flight().stats()['coalesced'] + get_klaviyo_flight().stats()['coalesced']
+if coalesced_fetches:
+    st.sidebar.caption(f"Shared in-flight fetches: {coalesced_fetches} duplicate API fetches saved")
+for level_name, level_timing in fetch_timings.items():
+    st.sidebar.caption(f"{level_name.title()} fetch: {level_timing['seconds']:.2f}s ({level_timing['rows']:,} rows)")
+if cache_warmer:
+    warmer_status = cache_warmer.status()
+    if warmer_status['last_run_at']:
+        warmer_text = f"Cache warmer: {warmer_status['warmed']}/{warmer_status['jobs']} warmed at {warmer_status['last_run_at'].strftime('%H:%M')} ({warmer_status['last_duration']:.0f}s)"
+        if warmer_status['fresh']:
+            warmer_text += f", {warmer_status['fresh']} still fresh"
+        if warmer_status['skipped']:
+            warmer_text += f", {warmer_status['skipped']} skipped (API budget)"
+        if warmer_status['errors']:
+            warmer_text += f", {len(warmer_status['errors'])} failed"
+        st.sidebar.caption(warmer_text)
+    else:
+        st.sidebar.caption("Cache warmer: first pass running...")
 
 st.sidebar.markdown("---")
 st.sidebar.header("📊 Quick Stats")
 if 'total_spend' in locals():
-    st.sidebar.metric("Total Campaigns", len(campaigns_data))
+    st.sidebar.metric("Total Campaigns", len(campaigns_df))
     st.sidebar.metric("Active Spend", f"${total_spend:,.2f}")
     st.sidebar.metric("Total Clicks", f"{total_clicks:,}")
     
     if klaviyo_data:
         st.sidebar.metric("Email Revenue", f"${klaviyo_data['total_revenue']:,.2f}")
 
+# Performance debug - where this rerun spent its time (also logged as JSON and
+# exported to the Prometheus metrics file)
+run_metrics.lap('sidebar')
+run_summary = run_metrics.finish(**run_context)
+with st.sidebar.expander("🐞 Performance debug"):
+    st.metric("Rerun time", f"{run_summary['total_seconds']:.2f}s")
+    st.dataframe(
+        pd.DataFrame(list(run_summary['stages'].items()), columns=['stage', 'seconds']),
+        hide_index=True,
+        column_config={'seconds': st.column_config.NumberColumn("Seconds", format="%.3f")}
+    )
+    if run_summary['counters']:
+        st.dataframe(
+            pd.DataFrame(list(run_summary['counters'].items()), columns=['counter', 'this rerun']),
+            hide_index=True
+        )
+
 # Footer
 st.markdown("---")
 if klaviyo_data:
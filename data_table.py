@@ -0,0 +1,51 @@
+# Table paging - filter, sort and slice a metrics frame on the server so only
+# the visible page goes to the browser (numbers stay numbers until display)
+
+import math
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = [25, 50, 100, 250]
+DEFAULT_PAGE_SIZE = 50
+
+
+# Rows where any of the name columns contains the query (case-insensitive)
+def filter_by_name(df, query, name_columns):
+    query = (query or '').strip()
+    if not query or df.empty:
+        return df
+
+    mask = np.zeros(len(df), dtype=bool)
+    for column in name_columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Match the (few) categories once instead of every row
+            categories = values.cat.categories
+            hits = categories[categories.astype(str).str.contains(query, case=False, regex=False)]
+            mask |= values.isin(hits).to_numpy()
+        else:
+            mask |= values.astype(str).str.contains(query, case=False, regex=False).to_numpy()
+    return df[mask]
+
+
+def page_count(total_rows, page_size):
+    return max(1, math.ceil(total_rows / page_size))
+
+
+# One page of the frame in sort order (pages are 1-based)
+def sorted_page(df, sort_by, ascending, page, page_size):
+    start = (page - 1) * page_size
+    end = start + page_size
+    if df.empty or not sort_by:
+        return df.iloc[start:end]
+
+    if pd.api.types.is_numeric_dtype(df[sort_by]):
+        # Only the rows up to the end of this page need ordering
+        if ascending:
+            ordered = df.nsmallest(end, sort_by, keep='first')
+        else:
+            ordered = df.nlargest(end, sort_by, keep='first')
+    else:
+        ordered = df.sort_values(sort_by, ascending=ascending, kind='stable')
+    return ordered.iloc[start:end]
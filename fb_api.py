@@ -0,0 +1,49 @@
+# Process-wide Graph API client
+# One FacebookAdsApi (and one pooled HTTP session) shared by every Streamlit
+# session and every ad account in CLIENTS, rebuilt only when the token changes
+
+import os
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from rate_limiter import ScheduledFacebookAdsApi
+
+# Point at a different Graph API host (e.g. the local fake API used for load tests)
+GRAPH_URL = os.environ.get('FACEBOOK_GRAPH_URL', 'https://graph.facebook.com').rstrip('/')
+
+# Keep-alive pool to graph.facebook.com - sized for several sessions fetching
+# three levels at once (the scheduler caps calls per account on top of this)
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 32
+
+# Only retry failed connects here; throttling / API errors are handled by the scheduler
+CONNECT_RETRIES = 2
+
+_api = None
+_api_token = None
+_api_lock = threading.Lock()
+
+
+def _pooled_adapter():
+    return HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=Retry(total=CONNECT_RETRIES, connect=CONNECT_RETRIES, read=0, status=0, backoff_factor=0.3)
+    )
+
+
+# Shared API object for this token (thread-safe)
+def get_facebook_api(access_token):
+    global _api, _api_token
+    with _api_lock:
+        if _api is None or access_token != _api_token:
+            api = ScheduledFacebookAdsApi.init(access_token=access_token)
+            api._session.GRAPH = GRAPH_URL
+            adapter = _pooled_adapter()
+            api._session.requests.mount('https://', adapter)
+            api._session.requests.mount('http://', adapter)
+            _api = api
+            _api_token = access_token
+        return _api
@@ -0,0 +1,148 @@
+# Process-wide store of processed insights frames, shared read-only by every
+# session. One compact copy per (account, range, data version) instead of one per
+# viewer: names and repeated ids as categoricals, counts as int32, ratios as
+# float32, and a memory budget with least-recently-used eviction.
+# Money columns stay float64 so totals add up to the cent.
+#
+# The raw rows the frames are built from are not kept here; they live in the
+# insights cache's memory tier, which has its own size cap (DASHBOARD_CACHE_MEMORY_MB).
+#
+# Entries are never modified after they are stored (pandas copy-on-write means a
+# session "changing" a shared frame only changes its own copy). A frame that is
+# evicted while a session is still showing it lives on until that session moves
+# on, so the budget bounds what is kept around for sessions that aren't.
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from single_flight import SingleFlight
+
+FRAME_STORE_BUDGET_MB = int(os.environ.get("DASHBOARD_FRAME_STORE_MB", 512))
+
+# Kept as float64 - summed into the KPI totals
+MONEY_COLUMNS = ['spend', 'revenue', 'actual_revenue']
+
+# Ids repeated across rows (ad ids are unique per row, so a categorical wouldn't save anything)
+CATEGORICAL_ID_COLUMNS = ['campaign_id', 'adset_id']
+
+INT32_MIN = np.iinfo(np.int32).min
+INT32_MAX = np.iinfo(np.int32).max
+
+
+# Smallest dtypes that keep the numbers the dashboard shows
+def compact_frame(df):
+    dtypes = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+        if column in CATEGORICAL_ID_COLUMNS:
+            dtypes[column] = 'category'
+        elif pd.api.types.is_integer_dtype(values.dtype):
+            # Sums of int32 columns still come back as int64
+            if values.empty or (values.min() >= INT32_MIN and values.max() <= INT32_MAX):
+                dtypes[column] = 'int32'
+        elif pd.api.types.is_float_dtype(values.dtype) and column not in MONEY_COLUMNS:
+            dtypes[column] = 'float32'
+    return df.astype(dtypes) if dtypes else df
+
+
+def _compact(value):
+    if isinstance(value, pd.DataFrame):
+        return compact_frame(value)
+    if isinstance(value, dict):
+        return {key: _compact(item) for key, item in value.items()}
+    return value
+
+
+# Memory held by a frame, or by a dict of frames
+def value_bytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sum(value_bytes(item) for item in value.values())
+    return 0
+
+
+class FrameStore:
+    def __init__(self, budget_bytes=FRAME_STORE_BUDGET_MB * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Sessions building the same entry at the same time share one build
+        self._builds = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, count=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[1]
+
+    # Store a frame (or dict of frames) in compact form and return the stored value
+    def put(self, key, value):
+        value = _compact(value)
+        size = value_bytes(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+            self._entries[key] = (size, value)
+            self._bytes += size
+            # The newest entry stays even if it alone is over budget
+            while self._bytes > self.budget_bytes and len(self._entries) > 1:
+                evicted_key, (evicted_size, evicted_value) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    # build() -> frame or dict of frames; called only when the key isn't stored
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        def build_and_store():
+            # Someone else may have stored it between the miss and getting here
+            value = self.get(key, count=False)
+            if value is None:
+                value = self.put(key, build())
+            return value
+
+        return self._builds.do(key, build_and_store)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_frame_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FrameStore()
+        return _store
@@ -0,0 +1,313 @@
+# Insights cache - keeps Graph API results between Streamlit reruns
+# Two tiers: a small in-memory LRU and a shared tier that survives restarts and,
+# with the SQLite or Redis backend, is shared between replicas (cache_backends.py)
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from cache_backends import BACKEND_ERRORS, decode_entry, encode_entry, make_backend
+
+# Cache settings - override with environment variables if needed
+CACHE_DIR = os.environ.get(
+    "DASHBOARD_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "insights")
+)
+KLAVIYO_CACHE_DIR = os.environ.get(
+    "DASHBOARD_KLAVIYO_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "klaviyo")
+)
+MEMORY_MAX_ENTRIES = int(os.environ.get("DASHBOARD_CACHE_MEMORY_ENTRIES", 256))
+# The memory tier holds raw row dicts, which take several times the memory of the
+# processed frames (frame_store.py) - so it is capped by size too, not just entry count
+MEMORY_MAX_BYTES = int(os.environ.get("DASHBOARD_CACHE_MEMORY_MB", 128)) * 1024 * 1024
+DISK_MAX_BYTES = int(os.environ.get("DASHBOARD_CACHE_DISK_BYTES", 500 * 1024 * 1024))
+
+# Cross-process fill lock: how long one replica may hold a key while it fetches
+# (async report jobs can take minutes), and how often the others check back
+LOCK_SECONDS = int(os.environ.get("DASHBOARD_CACHE_LOCK_SECONDS", 600))
+LOCK_POLL_SECONDS = 0.25
+
+# TTLs (seconds) - ranges that include today change constantly, closed ranges don't
+LIVE_TTL = 15 * 60
+SETTLING_TTL = 6 * 60 * 60
+# Attribution keeps moving numbers for a few days after the fact
+SETTLING_DAYS = int(os.environ.get("DASHBOARD_SETTLING_DAYS", 3))
+HISTORICAL_TTL = None  # never expires
+
+
+# Turn a date, datetime or string into 'YYYY-MM-DD'
+def normalize_date(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+
+# Build a stable cache key for one insights query
+def make_cache_key(account_id, level, since, until, fields, params=None):
+    params = dict(params or {})
+    params.pop('time_range', None)
+    params.pop('level', None)
+    # Page size doesn't change the result
+    params.pop('limit', None)
+    attribution_windows = sorted(params.pop('action_attribution_windows', None) or [])
+    payload = {
+        'account_id': account_id,
+        'level': level,
+        'since': normalize_date(since),
+        'until': normalize_date(until),
+        'fields': sorted(fields),
+        'attribution_windows': attribution_windows,
+        'params': params
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# Pick a TTL from how "closed" the date range is
+def ttl_for_range(until, today=None):
+    today = today or date.today()
+    until_day = datetime.strptime(normalize_date(until), '%Y-%m-%d').date()
+    if until_day >= today:
+        return LIVE_TTL
+    if until_day >= today - timedelta(days=SETTLING_DAYS):
+        return SETTLING_TTL
+    return HISTORICAL_TTL
+
+
+def _deep_size(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(key) + _deep_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_size(item) for item in value)
+    return size
+
+
+# Rough memory held by cached rows (a list of row dicts, or one dict), from a sample
+# of up to sample_size rows - errs high, since keys shared between rows are counted per row
+def rows_bytes(rows, sample_size=50):
+    if not isinstance(rows, list):
+        return _deep_size(rows)
+    if not rows:
+        return sys.getsizeof(rows)
+    sample = rows[::max(1, len(rows) // sample_size)][:sample_size]
+    return int(sum(_deep_size(row) for row in sample) / len(sample) * len(rows))
+
+
+# True if a get_entry result expires within the next `seconds` (entries that never expire don't)
+def expires_within(entry, seconds):
+    return entry['expires_at'] is not None and entry['expires_at'] - time.time() <= seconds
+
+
+class InsightsCache:
+    def __init__(self, backend=None, max_entries=MEMORY_MAX_ENTRIES, max_bytes=MEMORY_MAX_BYTES):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lock_waits = 0
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry['rows'] if entry is not None else None
+
+    # Rows plus when they were fetched. With allow_stale, an expired entry is
+    # still returned (marked stale) so the caller can show it while it refreshes.
+    def get_entry(self, key, allow_stale=False):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, fetched_at, rows = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return {'rows': rows, 'fetched_at': fetched_at, 'stale': False, 'expires_at': expires_at}
+
+        # Another replica may have refreshed what this process only has stale
+        shared = self._read_shared(key, newer_than=(entry[1] or 0) if entry is not None else None)
+        if shared is not None:
+            entry = shared
+            with self._lock:
+                self._remember(key, *entry)
+
+        if entry is not None:
+            expires_at, fetched_at, rows = entry
+            stale = expires_at is not None and expires_at <= now
+            if not stale or allow_stale:
+                with self._lock:
+                    if key in self._memory:
+                        self._memory.move_to_end(key)
+                    self.hits += 1
+                return {'rows': rows, 'fetched_at': fetched_at, 'stale': stale, 'expires_at': expires_at}
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    # Returns the fetched_at stamp stored with the entry
+    def set(self, key, rows, ttl):
+        fetched_at = time.time()
+        expires_at = fetched_at + ttl if ttl is not None else None
+        with self._lock:
+            self._remember(key, expires_at, fetched_at, rows)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, encode_entry(expires_at, fetched_at, rows), ttl)
+            except BACKEND_ERRORS:
+                pass
+        return fetched_at
+
+    # Run load() and cache its rows, unless another process is already doing it
+    # for this key - then wait for that process's entry instead of fetching twice.
+    # Returns {'rows', 'fetched_at', 'stale'} like get_entry.
+    def fill(self, key, load, ttl):
+        waiting_since = time.time()
+        deadline = waiting_since + LOCK_SECONDS
+        token = self._acquire(key)
+        if token is None:
+            with self._lock:
+                self.lock_waits += 1
+        while token is None:
+            time.sleep(LOCK_POLL_SECONDS)
+            shared = self._filled_since(key, waiting_since)
+            if shared is not None:
+                return shared
+            if time.time() >= deadline:
+                break  # the holder is stuck - fetch it ourselves
+            token = self._acquire(key)
+        # The lock can be free because its holder has just written the entry
+        # (between the last read and our acquire) - use that, don't fetch again
+        if token:
+            shared = self._filled_since(key, waiting_since)
+            if shared is not None:
+                self._release(key, token)
+                return shared
+        try:
+            rows = load()
+            fetched_at = self.set(key, rows, ttl)
+            return {'rows': rows, 'fetched_at': fetched_at, 'stale': False}
+        finally:
+            if token:
+                self._release(key, token)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._forget(key)
+        if self.backend is not None:
+            try:
+                self.backend.delete(key)
+            except BACKEND_ERRORS:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._sizes.clear()
+            self._bytes = 0
+        if self.backend is not None:
+            try:
+                self.backend.clear()
+            except BACKEND_ERRORS:
+                pass
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / total) if total > 0 else 0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._bytes,
+                'lock_waits': self.lock_waits
+            }
+
+    # Memory tier (caller holds the lock)
+    def _remember(self, key, expires_at, fetched_at, rows):
+        self._forget(key)
+        size = rows_bytes(rows)
+        # Bigger than the whole tier: served from the shared tier instead
+        if size > self.max_bytes:
+            return
+        self._memory[key] = (expires_at, fetched_at, rows)
+        self._sizes[key] = size
+        self._bytes += size
+        while len(self._memory) > self.max_entries or self._bytes > self.max_bytes:
+            evicted_key, _ = self._memory.popitem(last=False)
+            self._bytes -= self._sizes.pop(evicted_key)
+
+    def _forget(self, key):
+        if self._memory.pop(key, None) is not None:
+            self._bytes -= self._sizes.pop(key)
+
+    # Shared tier - (expires_at, fetched_at, rows) or None; an unreachable backend is a miss
+    def _read_shared(self, key, newer_than=None):
+        if self.backend is None:
+            return None
+        try:
+            data = self.backend.get(key)
+        except BACKEND_ERRORS:
+            return None
+        return decode_entry(data, newer_than=newer_than) if data is not None else None
+
+    # Lock token, None if another process holds the lock, or '' when there is
+    # nothing to lock against (no backend, or it is unreachable) and we just go ahead
+    def _acquire(self, key):
+        if self.backend is None:
+            return ''
+        try:
+            return self.backend.acquire_lock(key, LOCK_SECONDS)
+        except BACKEND_ERRORS:
+            return ''
+
+    # A shared entry written after `since`, remembered in memory, as fill returns it
+    def _filled_since(self, key, since):
+        shared = self._read_shared(key, newer_than=since)
+        if shared is None:
+            return None
+        with self._lock:
+            self._remember(key, *shared)
+        return {'rows': shared[2], 'fetched_at': shared[1], 'stale': False}
+
+    def _release(self, key, token):
+        try:
+            self.backend.release_lock(key, token)
+        except BACKEND_ERRORS:
+            pass
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(name, cache_dir):
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = InsightsCache(backend=make_backend(name, cache_dir, DISK_MAX_BYTES))
+            _caches[name] = cache
+        return cache
+
+
+# One cache per process, shared by every Streamlit session
+def get_insights_cache():
+    return _get_cache('insights', CACHE_DIR)
+
+
+# Klaviyo results get their own cache (same TTL rules)
+def get_klaviyo_cache():
+    return _get_cache('klaviyo', KLAVIYO_CACHE_DIR)
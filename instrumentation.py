@@ -0,0 +1,209 @@
+# Performance instrumentation - per-stage timings, API call / page / byte counts,
+# row counts and cache hit ratios for every rerun.
+# Counters live in one process-wide registry (exported in Prometheus text format);
+# each rerun diffs the registry to get its own numbers and logs them as JSON.
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_FILE = os.environ.get(
+    "DASHBOARD_METRICS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "metrics.prom")
+)
+METRICS_LOG_ENABLED = os.environ.get("DASHBOARD_METRICS_LOG", "1") == "1"
+
+logger = logging.getLogger("dashboard.metrics")
+if METRICS_LOG_ENABLED and not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+METRIC_HELP = {
+    'dashboard_reruns_total': ('counter', 'Dashboard reruns (page or fragment)'),
+    'dashboard_rerun_seconds': ('summary', 'Wall time of a dashboard rerun (page or fragment)'),
+    'dashboard_stage_seconds': ('summary', 'Time spent in each stage of a rerun'),
+    'dashboard_api_calls_total': ('counter', 'API calls made'),
+    'dashboard_api_errors_total': ('counter', 'API calls that failed'),
+    'dashboard_api_seconds': ('summary', 'API call latency'),
+    'dashboard_api_response_bytes_total': ('counter', 'API response payload bytes'),
+    'dashboard_rows_total': ('counter', 'Insights rows handed to the dashboard'),
+    'dashboard_cache_hits_total': ('counter', 'Cache hits'),
+    'dashboard_cache_misses_total': ('counter', 'Cache misses'),
+    'dashboard_cache_memory_bytes': ('gauge', 'Raw rows held in each cache memory tier'),
+    'dashboard_frame_store_bytes': ('gauge', 'Memory held by the shared frame store'),
+    'dashboard_frame_store_entries': ('gauge', 'Frames in the shared frame store'),
+    'dashboard_frame_store_evictions_total': ('counter', 'Frames evicted from the shared frame store')
+}
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+# Summary samples are exported as <name>_count / <name>_sum
+def _base_name(name):
+    for suffix in ('_count', '_sum'):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRIC_HELP:
+            return name[:-len(suffix)]
+    return name
+
+
+# Label values are quoted, so backslashes, quotes and newlines (a client name can
+# hold any of them) are escaped as the text format requires
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._values = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    # Summary: count and sum of observations
+    def observe(self, name, value, **labels):
+        labels_key = _labels_key(labels)
+        with self._lock:
+            count_key = (f"{name}_count", labels_key)
+            sum_key = (f"{name}_sum", labels_key)
+            self._values[count_key] = self._values.get(count_key, 0) + 1
+            self._values[sum_key] = self._values.get(sum_key, 0) + value
+
+    # collector() -> {(name, labels dict): value}, read at snapshot time (e.g. cache stats).
+    # Registering the same name again replaces the old collector.
+    def add_collector(self, name, collector):
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self._values)
+            collectors = list(self._collectors.values())
+        for collector in collectors:
+            for (name, labels), value in collector().items():
+                values[(name, _labels_key(dict(labels)))] = value
+        return values
+
+    def to_prometheus(self):
+        lines = []
+        seen = set()
+        for (name, labels), value in sorted(self.snapshot().items()):
+            base = _base_name(name)
+            if base not in seen and base in METRIC_HELP:
+                metric_type, help_text = METRIC_HELP[base]
+                lines.append(f"# HELP {base} {help_text}")
+                lines.append(f"# TYPE {base} {metric_type}")
+                seen.add(base)
+            label_text = ",".join(f'{key}="{_label_value(value_text)}"' for key, value_text in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Write the Prometheus text file (for node_exporter's textfile collector or a scrape sidecar)
+    def export(self, path=METRICS_FILE):
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    return _registry
+
+
+# Time one API call and count it (service is 'graph' or 'klaviyo')
+@contextmanager
+def track_api_call(service, endpoint):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        _registry.inc('dashboard_api_errors_total', service=service, endpoint=endpoint)
+        raise
+    finally:
+        _registry.inc('dashboard_api_calls_total', service=service, endpoint=endpoint)
+        _registry.observe('dashboard_api_seconds', time.perf_counter() - started, service=service)
+
+
+def record_response_bytes(service, size):
+    _registry.inc('dashboard_api_response_bytes_total', size or 0, service=service)
+
+
+# Timings and counter deltas for one rerun - the whole page, or one fragment rerun
+# on its own (scope='fragment'). Counters are process-wide, so with several
+# sessions loading at once a rerun's deltas include their calls too.
+class RunMetrics:
+    def __init__(self, registry=None, clock=time.perf_counter, scope='page'):
+        self.registry = registry or _registry
+        self.clock = clock
+        self.scope = scope
+        self.started = clock()
+        self._lap_started = self.started
+        self.stages = {}
+        self.baseline = self.registry.snapshot()
+        self.finished = False
+
+    # Close the current stage: everything since the previous lap is charged to `name`
+    # (a script runs top to bottom, so laps mark stage boundaries without re-indenting it)
+    def lap(self, name):
+        now = self.clock()
+        elapsed = now - self._lap_started
+        self._lap_started = now
+        self.stages[name] = self.stages.get(name, 0) + elapsed
+        self.registry.observe('dashboard_stage_seconds', elapsed, stage=name)
+
+    # A stage timed by the caller (e.g. a fetch made partway through another stage).
+    # The lap boundary doesn't move, so the enclosing stage still includes it.
+    def record(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0) + seconds
+        self.registry.observe('dashboard_stage_seconds', seconds, stage=name)
+
+    # Wrap up the rerun: record it, log it as one JSON line, refresh the metrics file
+    def finish(self, **context):
+        self.finished = True
+        total_seconds = self.clock() - self.started
+        self.registry.inc('dashboard_reruns_total', scope=self.scope)
+        self.registry.observe('dashboard_rerun_seconds', total_seconds, scope=self.scope)
+
+        counters = {}
+        for (name, labels), value in self.registry.snapshot().items():
+            if name.startswith(('dashboard_stage_seconds', 'dashboard_rerun', 'dashboard_reruns')):
+                continue
+            delta = value - self.baseline.get((name, labels), 0)
+            if delta:
+                label_text = ",".join(f"{key}={value_text}" for key, value_text in labels)
+                counters[f"{name}{{{label_text}}}" if label_text else name] = delta
+
+        summary = {
+            'event': 'rerun',
+            'scope': self.scope,
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            **context,
+            'total_seconds': round(total_seconds, 4),
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'counters': counters
+        }
+        if METRICS_LOG_ENABLED:
+            logger.info(json.dumps(summary, default=str))
+        self.registry.export()
+        return summary
@@ -0,0 +1,189 @@
+# Klaviyo API client
+# One pooled requests.Session per API key (keep-alive), cursor pagination via
+# links.next, retries that honor 429 Retry-After, and campaign stats from the
+# bulk campaign values report (one request for every campaign in the range)
+
+import email.utils
+import hashlib
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import track_api_call, record_response_bytes
+
+KLAVIYO_BASE_URL = os.environ.get('KLAVIYO_BASE_URL', 'https://a.klaviyo.com/api')
+KLAVIYO_REVISION = '2024-10-15'
+
+# Connections kept open per client
+POOL_SIZE = 8
+REQUEST_TIMEOUT = 30
+
+# Campaign values report - what we ask for and which metric counts as a conversion
+CAMPAIGN_REPORT_STATISTICS = ['recipients', 'delivered', 'opens_unique', 'clicks_unique', 'conversions', 'conversion_value']
+CONVERSION_METRIC_NAME = 'Placed Order'
+
+# Retries for 429 / 5xx
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class KlaviyoError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+# Seconds to wait from a Retry-After header (either seconds or an HTTP date)
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+# Report timeframes want full timestamps; dates cover the whole day
+def format_timeframe_bound(value, end=False):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%S')
+    return f"{value.isoformat()}T{'23:59:59' if end else '00:00:00'}"
+
+
+class KlaviyoClient:
+    def __init__(self, api_key, base_url=KLAVIYO_BASE_URL, pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT, sleep=time.sleep):
+        # Safe to put in cache keys / logs, unlike the key itself
+        self.account_key = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+        self._conversion_metric_id = None
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.sleep = sleep
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Klaviyo-API-Key {api_key}',
+            'revision': KLAVIYO_REVISION,
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        })
+
+    def _url(self, path_or_url):
+        if path_or_url.startswith('http://') or path_or_url.startswith('https://'):
+            return path_or_url
+        return f"{self.base_url}/{path_or_url.lstrip('/')}"
+
+    # Make one request, retrying on 429 (after Retry-After) and 5xx (with jittered backoff)
+    def request(self, method, path_or_url, params=None, json_body=None):
+        url = self._url(path_or_url)
+        endpoint = urlparse(url).path.rstrip('/').split('/')[-1]
+        for attempt in range(MAX_RETRIES + 1):
+            with track_api_call('klaviyo', endpoint):
+                response = self.session.request(method, url, params=params, json=json_body, timeout=self.timeout)
+            record_response_bytes('klaviyo', len(response.content))
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == MAX_RETRIES:
+                    break
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX) * random.uniform(0.5, 1.0)
+                self.sleep(delay)
+                continue
+            break
+
+        if response.status_code >= 400:
+            raise KlaviyoError(response.status_code, response.text)
+        return response.json()
+
+    def get(self, path_or_url, params=None):
+        return self.request('GET', path_or_url, params=params)
+
+    def post(self, path_or_url, json_body):
+        return self.request('POST', path_or_url, json_body=json_body)
+
+    # Yield every item in 'data' across pages, following links.next
+    def paginate(self, path, params=None):
+        url = path
+        while url:
+            page = self.get(url, params=params)
+            for item in page.get('data') or []:
+                yield item
+            url = (page.get('links') or {}).get('next')
+            params = None  # the next link already carries the query string
+
+    # Sent campaigns in a date range
+    def get_campaigns(self, start_date, end_date):
+        params = {
+            'filter': f'greater-than(send_time,{start_date.isoformat()}),less-than(send_time,{end_date.isoformat()})',
+            'fields[campaign]': 'name,status,created_at,send_time,send_strategy'
+        }
+        return list(self.paginate('campaigns/', params=params))
+
+    # Id of the "Placed Order" metric, looked up once per client
+    def get_conversion_metric_id(self):
+        if self._conversion_metric_id is None:
+            for metric in self.paginate('metrics/', params={'fields[metric]': 'name'}):
+                if metric.get('attributes', {}).get('name') == CONVERSION_METRIC_NAME:
+                    self._conversion_metric_id = metric['id']
+                    break
+            else:
+                raise KlaviyoError(404, f'No "{CONVERSION_METRIC_NAME}" metric found for this account')
+        return self._conversion_metric_id
+
+    # Real sends, opens, clicks and conversion value for every campaign in the range,
+    # summed per campaign (multi-message campaigns come back as several rows)
+    def get_campaign_values(self, start_date, end_date, conversion_metric_id=None):
+        body = {
+            'data': {
+                'type': 'campaign-values-report',
+                'attributes': {
+                    'statistics': CAMPAIGN_REPORT_STATISTICS,
+                    'timeframe': {
+                        'value': {
+                            'start': format_timeframe_bound(start_date),
+                            'end': format_timeframe_bound(end_date, end=True)
+                        }
+                    },
+                    'conversion_metric_id': conversion_metric_id or self.get_conversion_metric_id(),
+                    'filter': "equals(send_channel,'email')"
+                }
+            }
+        }
+        response = self.post('campaign-values-reports/', body)
+
+        values = {}
+        for result in response.get('data', {}).get('attributes', {}).get('results', []):
+            campaign_id = result.get('groupings', {}).get('campaign_id')
+            totals = values.setdefault(campaign_id, {statistic: 0 for statistic in CAMPAIGN_REPORT_STATISTICS})
+            for statistic in CAMPAIGN_REPORT_STATISTICS:
+                totals[statistic] += result.get('statistics', {}).get(statistic) or 0
+        return values
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+# One client (and connection pool) per API key, shared by every session
+def get_klaviyo_client(api_key):
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = KlaviyoClient(api_key)
+            _clients[api_key] = client
+        return client
@@ -0,0 +1,454 @@
+# Headless fetch / process / aggregate core - the dashboard, the cache warmer and
+# the snapshot CLI all go through here. Nothing in this module touches Streamlit:
+# credentials are passed in explicitly (the dashboard reads them from st.secrets,
+# batch jobs from the environment), and errors are raised, not rendered.
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from facebook_business.adobjects.adaccount import AdAccount
+
+from async_reports import should_use_async, expected_row_count, remember_row_count, iter_insights_async
+from daily_store import DAILY_STORE_ENABLED, DAILY_STORE_LEVELS, get_daily_store
+from fb_api import get_facebook_api
+from insights_cache import get_insights_cache, get_klaviyo_cache, make_cache_key, ttl_for_range, expires_within
+from insights_frame import compact_actions, process_insights_data
+from klaviyo_client import get_klaviyo_client, CAMPAIGN_REPORT_STATISTICS
+from recommendations import resolve_thresholds, evaluate_rules
+from rollups import rollup_insights
+from single_flight import get_insights_flight, get_klaviyo_flight
+
+# Client database - easily add new clients here
+# (an optional "thresholds" dict overrides recommendations.DEFAULT_THRESHOLDS for that client)
+CLIENTS = {
+    "RAGE Nation Apparel": {
+        "account_id": "act_1761456877511271",
+        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
+        "avg_order_value": 50,
+        "klaviyo_enabled": False
+    },
+    "World POG Federation": {
+        "account_id": "act_224902019311983",
+        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
+        "avg_order_value": 75,
+        "klaviyo_enabled": False
+    },
+    "Supplies Outlet": {
+        "account_id": "act_147523547450881",
+        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
+        "avg_order_value": 45,
+        "klaviyo_enabled": False
+    },
+    "Tote n Carry - Main Account": {
+        "account_id": "act_2524661660981967",
+        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
+        "avg_order_value": 35,
+        "klaviyo_enabled": True
+    },
+    "Tote n Carry - Secondary Account": {
+        "account_id": "act_2003497536588787",
+        "logo_url": "https://i.ibb.co/Wjpyhwn/ZB166-RTM-Logos-11.png",
+        "avg_order_value": 35,
+        "klaviyo_enabled": True
+    }
+}
+
+# Run one insights query against the API
+def fetch_insights_rows(account, account_id, fields, params):
+    level = params['level']
+    time_range = params['time_range']
+    daily = 'time_increment' in params
+    
+    # Long ranges / big accounts go through an async report job instead of the normal call.
+    # Its pages are compacted as they arrive, so the full raw result is never held at once.
+    expected_rows = expected_row_count(account_id, level, time_range['since'], time_range['until'], daily=daily)
+    if should_use_async(level, time_range['since'], time_range['until'], expected_rows):
+        rows = []
+        for page in iter_insights_async(account, fields, params):
+            rows.extend(compact_actions(page))
+    else:
+        # Store plain dicts (not SDK objects) so they can go to disk
+        rows = [item.export_all_data() for item in account.get_insights(fields=fields, params=params)]
+    remember_row_count(account_id, level, time_range['since'], time_range['until'], len(rows), daily=daily)
+    return rows
+
+# Fetch one insights level, answering from the cache when the same query was run recently.
+# Returns {'rows', 'fetched_at', 'stale'}; with stale_ok an expired cache entry is
+# returned as-is (stale=True) instead of waiting on the API. With fresh_for, an entry
+# that expires within that many seconds is fetched again (the cache warmer uses this).
+def fetch_insights_level(account, account_id, fields, params, refresh=False, stale_ok=False, fresh_for=None):
+    cache = get_insights_cache()
+    time_range = params['time_range']
+    cache_key = make_cache_key(account_id, params['level'], time_range['since'], time_range['until'], fields, params)
+    
+    if not refresh:
+        entry = cache.get_entry(cache_key, allow_stale=stale_ok)
+        if entry is not None and not (fresh_for and expires_within(entry, fresh_for)):
+            return entry
+    
+    def load_rows():
+        if DAILY_STORE_ENABLED and params['level'] in DAILY_STORE_LEVELS:
+            # Only the days we don't have yet (and the still-settling last few) go to the API
+            return get_daily_store().fetch_range(
+                account_id, fields, params,
+                lambda span_fields, span_params: fetch_insights_rows(account, account_id, span_fields, span_params),
+                refresh=refresh, daily='time_increment' in params
+            )
+        return fetch_insights_rows(account, account_id, fields, params)
+    
+    # Sessions asking for the same query at the same time share one API fetch, and
+    # with a shared cache backend so do replicas (the others wait for its entry)
+    return get_insights_flight().do(
+        cache_key, lambda: cache.fill(cache_key, load_rows, ttl_for_range(time_range['until']))
+    )
+
+# Fields each view reads from the raw rows, per level. The fetcher asks the API for
+# the union, so fields no view uses (reach, frequency, cost_per_action_type, ...)
+# are never computed server-side. Ratios (ROAS, CPA, CTR) are worked out locally
+# from spend / clicks / impressions / actions. Ad sets and ads take revenue from
+# purchases x AOV, so only campaigns ask for action_values.
+VIEW_FIELDS = {
+    'kpis': {
+        'campaign': ['spend', 'impressions', 'clicks', 'actions', 'action_values']
+    },
+    'campaigns_tab': {
+        'campaign': ['campaign_id', 'campaign_name', 'spend', 'impressions', 'clicks', 'actions', 'action_values', 'cpm']
+    },
+    'adsets_tab': {
+        'adset': ['campaign_id', 'campaign_name', 'adset_id', 'adset_name', 'spend', 'impressions', 'clicks', 'actions', 'cpm']
+    },
+    'ads_tab': {
+        'ad': ['campaign_id', 'campaign_name', 'adset_id', 'adset_name', 'ad_id', 'ad_name',
+               'spend', 'impressions', 'clicks', 'actions', 'cpm']
+    },
+    'charts': {
+        'campaign': ['campaign_name', 'spend', 'actions', 'action_values'],
+        'adset': ['adset_name', 'spend', 'impressions', 'clicks', 'actions']
+    },
+    'all_clients': {
+        'campaign': ['campaign_id', 'spend', 'impressions', 'clicks', 'actions', 'action_values']
+    },
+    'trends': {
+        'campaign': ['campaign_id', 'campaign_name', 'spend', 'impressions', 'clicks', 'actions', 'action_values']
+    }
+}
+
+# Union of the fields the given views (default: all of them) need at one level, in first-seen order
+def projected_fields(level, views=None):
+    fields = []
+    for view, level_fields in VIEW_FIELDS.items():
+        if views is not None and view not in views:
+            continue
+        for field in level_fields.get(level, []):
+            if field not in fields:
+                fields.append(field)
+    return fields
+
+# Rows per page for ad-level pulls (the Graph API default is 25, so a big account
+# takes hundreds of round trips); other levels are small enough for the default
+AD_PAGE_LIMIT = int(os.environ.get("DASHBOARD_AD_PAGE_LIMIT", 500))
+
+# Insights queries for each level of the dashboard
+INSIGHTS_LEVELS = {
+    'campaigns': {
+        'level': 'campaign',
+        'fields': projected_fields('campaign'),
+        'params': {
+            'action_breakdowns': ['action_type'],
+            'action_attribution_windows': ['7d_click', '1d_view']
+        }
+    },
+    'adsets': {
+        'level': 'adset',
+        'fields': projected_fields('adset'),
+        'params': {
+            'action_breakdowns': ['action_type']
+        }
+    },
+    'ads': {
+        'level': 'ad',
+        'fields': projected_fields('ad'),
+        'params': {
+            'action_breakdowns': ['action_type'],
+            'limit': AD_PAGE_LIMIT
+        }
+    }
+}
+
+# Levels the dashboard pulls up front - ads are only fetched when a view needs them
+SUMMARY_LEVELS = ('campaigns', 'adsets')
+
+# Daily campaign rows for the trend charts: the campaigns query split by day. With
+# the daily store on, these are the same stored days the campaign totals are summed
+# from, so the trends cost no extra API calls.
+TREND_QUERY = {
+    'level': 'campaign',
+    'fields': INSIGHTS_LEVELS['campaigns']['fields'],
+    'params': {**INSIGHTS_LEVELS['campaigns']['params'], 'time_increment': 1}
+}
+
+# Single-fetch mode: one ad-level pull with everything the rollups need
+# (action_values and the campaign attribution windows, so totals match the campaign query)
+SINGLE_FETCH_LEVELS = {
+    'ads': {
+        'level': 'ad',
+        'fields': INSIGHTS_LEVELS['ads']['fields'] + ['action_values'],
+        'params': {
+            'action_breakdowns': ['action_type'],
+            'action_attribution_windows': ['7d_click', '1d_view'],
+            'limit': AD_PAGE_LIMIT
+        }
+    }
+}
+
+# Max number of levels pulled at the same time
+FETCH_WORKERS = 3
+
+# Fetch one level and time it (runs in a worker thread, so no st.* calls here)
+def fetch_timed_level(account, account_id, level_query, time_range, refresh, stale_ok=False, fresh_for=None):
+    started = time.perf_counter()
+    params = dict(level_query['params'])
+    params['time_range'] = time_range
+    params['level'] = level_query['level']
+    entry = fetch_insights_level(account, account_id, level_query['fields'], params,
+                                 refresh=refresh, stale_ok=stale_ok, fresh_for=fresh_for)
+    return entry['rows'], {
+        'seconds': time.perf_counter() - started,
+        'rows': len(entry['rows']),
+        'fetched_at': entry['fetched_at'],
+        'stale': entry['stale']
+    }
+
+# Pull insights levels for an account (raises on API errors); levels limits it to
+# some of the INSIGHTS_LEVELS keys (e.g. SUMMARY_LEVELS), default all of them
+def fetch_facebook_data(access_token, start_date, end_date, account_id, refresh=False, timings=None, single_fetch=False, stale_ok=False, levels=None, fresh_for=None):
+    # Shared API object (pooled connections, rate-limit scheduler) - built once per process
+    account = AdAccount(account_id, api=get_facebook_api(access_token))
+    time_range = {
+        'since': start_date.strftime('%Y-%m-%d'),
+        'until': end_date.strftime('%Y-%m-%d')
+    }
+    
+    # Single-fetch mode only pulls ads - campaigns and ad sets are rolled up locally
+    if single_fetch:
+        level_queries = SINGLE_FETCH_LEVELS
+    else:
+        level_queries = {key: query for key, query in INSIGHTS_LEVELS.items() if levels is None or key in levels}
+    
+    # Pull campaign, ad set and ad levels at the same time - each worker drains
+    # its own cursor, so the slow ad-level pagination doesn't hold up the others
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        futures = {
+            key: executor.submit(fetch_timed_level, account, account_id, level_query, time_range, refresh, stale_ok, fresh_for)
+            for key, level_query in level_queries.items()
+        }
+        results = {key: future.result() for key, future in futures.items()}
+    
+    if timings is not None:
+        for key, (rows, level_timing) in results.items():
+            timings[key] = level_timing
+    
+    return {key: rows for key, (rows, level_timing) in results.items()}
+
+# Daily campaign rows for the trend charts (raises on API errors); timings gets a 'trends' entry
+def fetch_daily_trends(access_token, start_date, end_date, account_id, refresh=False, stale_ok=False, timings=None, fresh_for=None):
+    account = AdAccount(account_id, api=get_facebook_api(access_token))
+    time_range = {
+        'since': start_date.strftime('%Y-%m-%d'),
+        'until': end_date.strftime('%Y-%m-%d')
+    }
+    rows, level_timing = fetch_timed_level(account, account_id, TREND_QUERY, time_range, refresh, stale_ok, fresh_for)
+    if timings is not None:
+        timings['trends'] = level_timing
+    return rows
+
+# Campaign list plus stats, summed into the dashboard's email numbers
+def load_klaviyo_data(client, start_date, end_date, conversion_metric_id=None):
+    # Campaign names/status (all pages) plus real stats for every campaign in one report
+    campaigns = client.get_campaigns(start_date, end_date)
+    campaign_values = client.get_campaign_values(start_date, end_date, conversion_metric_id=conversion_metric_id)
+    
+    # Process campaigns and get metrics
+    total_revenue = 0
+    total_emails_sent = 0
+    total_opens = 0
+    total_clicks = 0
+    processed_campaigns = []
+    
+    for campaign in campaigns:
+        stats = campaign_values.get(campaign['id'], {})
+        emails_sent = int(stats.get('recipients', 0))
+        delivered = stats.get('delivered', 0)
+        opens = int(stats.get('opens_unique', 0))
+        clicks = int(stats.get('clicks_unique', 0))
+        revenue = float(stats.get('conversion_value', 0))
+        
+        total_emails_sent += emails_sent
+        total_opens += opens
+        total_clicks += clicks
+        total_revenue += revenue
+        
+        # Rates are on delivered emails, same as Klaviyo's own reporting
+        open_rate = (opens / delivered * 100) if delivered > 0 else 0
+        click_rate = (clicks / delivered * 100) if delivered > 0 else 0
+        
+        processed_campaigns.append({
+            'name': campaign['attributes']['name'],
+            'emails_sent': emails_sent,
+            'opens': opens,
+            'clicks': clicks,
+            'revenue': revenue,
+            'open_rate': open_rate,
+            'click_rate': click_rate,
+            'status': campaign['attributes']['status']
+        })
+    
+    return {
+        'total_revenue': total_revenue,
+        'total_emails_sent': total_emails_sent,
+        'total_opens': total_opens,
+        'total_clicks': total_clicks,
+        'campaigns': processed_campaigns
+    }
+
+def klaviyo_cache_key(client, start_date, end_date):
+    return make_cache_key(f"klaviyo:{client.account_key}", 'campaign', start_date, end_date, CAMPAIGN_REPORT_STATISTICS)
+
+# Whether a Klaviyo range has nothing fresh cached or expires within that many seconds -
+# the cache warmer checks before spending report budget on it
+def klaviyo_expires_within(api_key, start_date, end_date, seconds):
+    entry = get_klaviyo_cache().get_entry(klaviyo_cache_key(get_klaviyo_client(api_key), start_date, end_date))
+    return entry is None or expires_within(entry, seconds)
+
+# Klaviyo campaign performance for a date range (raises KlaviyoError on API errors)
+# meta (optional dict) gets when the data was fetched and whether it is stale
+def fetch_klaviyo_data(api_key, start_date, end_date, conversion_metric_id=None, refresh=False, stale_ok=False, meta=None, fresh_for=None):
+    client = get_klaviyo_client(api_key)
+    
+    # Results are cached per (Klaviyo account, date range) - the reporting endpoint is heavily rate limited
+    cache = get_klaviyo_cache()
+    cache_key = klaviyo_cache_key(client, start_date, end_date)
+    entry = None
+    if not refresh:
+        entry = cache.get_entry(cache_key, allow_stale=stale_ok)
+        if entry is not None and fresh_for and expires_within(entry, fresh_for):
+            entry = None
+    
+    if entry is None:
+        def load():
+            return load_klaviyo_data(client, start_date, end_date, conversion_metric_id=conversion_metric_id)
+        
+        # Sessions (and replicas) asking for the same range at the same time share one set of API calls
+        entry = get_klaviyo_flight().do(cache_key, lambda: cache.fill(cache_key, load, ttl_for_range(end_date)))
+    
+    if meta is not None:
+        meta['fetched_at'] = entry['fetched_at']
+        meta['stale'] = entry['stale']
+    return entry['rows']
+
+# Function to calculate ROAS
+def calculate_roas(spend, revenue):
+    if spend > 0:
+        return revenue / spend
+    return 0
+
+# Campaign, ad set and ad frames from fetched rows (single-fetch data only has ads,
+# so campaign and ad set totals are summed from them and every level reconciles);
+# there is no ad frame when the ads weren't fetched
+def account_frames(data, avg_order_value, single_fetch=False):
+    if single_fetch:
+        ads_df = process_insights_data(data['ads'], avg_order_value)
+        return {
+            'campaign': rollup_insights(ads_df, 'campaign'),
+            'adset': rollup_insights(ads_df, 'adset'),
+            'ad': ads_df
+        }
+    frames = {
+        'campaign': process_insights_data(data['campaigns'], avg_order_value),
+        'adset': process_insights_data(data['adsets'], avg_order_value)
+    }
+    if 'ads' in data:
+        frames['ad'] = process_insights_data(data['ads'], avg_order_value)
+    return frames
+
+# One ranked action table per level (threshold overrides as in CLIENTS[...]["thresholds"])
+def account_actions(frames, threshold_overrides=None):
+    thresholds = resolve_thresholds(threshold_overrides)
+    return {level: evaluate_rules(df, level, thresholds) for level, df in frames.items()}
+
+# Account totals from the campaign frame
+def account_totals(campaigns_df):
+    spend = float(campaigns_df['spend'].sum())
+    revenue = float(campaigns_df['revenue'].sum())
+    purchases = int(campaigns_df['purchases'].sum())
+    clicks = int(campaigns_df['clicks'].sum())
+    impressions = int(campaigns_df['impressions'].sum())
+    return {
+        'spend': spend,
+        'revenue': revenue,
+        'purchases': purchases,
+        'impressions': impressions,
+        'clicks': clicks,
+        'roas': calculate_roas(spend, revenue),
+        'cpa': spend / purchases if purchases > 0 else 0,
+        'ctr': (clicks / impressions * 100) if impressions > 0 else 0
+    }
+
+# Everything the dashboard shows for one client and range: frames, actions, totals
+# and Klaviyo data (when the client has it and a key is given). Raises on API errors.
+def build_client_report(access_token, info, start_date, end_date, klaviyo_api_key=None,
+                        conversion_metric_id=None, single_fetch=False, refresh=False):
+    timings = {}
+    data = fetch_facebook_data(access_token, start_date, end_date, info["account_id"],
+                               refresh=refresh, timings=timings, single_fetch=single_fetch)
+    frames = account_frames(data, info["avg_order_value"], single_fetch=single_fetch)
+    
+    klaviyo_data = None
+    if info.get("klaviyo_enabled", False) and klaviyo_api_key:
+        klaviyo_data = fetch_klaviyo_data(klaviyo_api_key, start_date, end_date,
+                                          conversion_metric_id=conversion_metric_id, refresh=refresh)
+    
+    return {
+        'frames': frames,
+        'actions': account_actions(frames, info.get("thresholds")),
+        'totals': account_totals(frames['campaign']),
+        'klaviyo': klaviyo_data,
+        'timings': timings
+    }
+
+# Campaign-level totals for one client (runs in a worker thread, so no st.* calls here)
+def fetch_client_totals(access_token, info, start_date, end_date):
+    account = AdAccount(info["account_id"], api=get_facebook_api(access_token))
+    time_range = {
+        'since': start_date.strftime('%Y-%m-%d'),
+        'until': end_date.strftime('%Y-%m-%d')
+    }
+    rows, level_timing = fetch_timed_level(account, info["account_id"], INSIGHTS_LEVELS['campaigns'], time_range, False)
+    campaigns_df = process_insights_data(rows, info["avg_order_value"])
+    return {
+        **account_totals(campaigns_df),
+        'campaigns': len(campaigns_df),
+        'seconds': level_timing['seconds']
+    }
+
+# Re-fetch everything the dashboard shows for a client and range (runs in a background thread)
+def revalidate_dashboard_data(access_token, start_date, end_date, account_id, single_fetch, klaviyo_api_key=None, conversion_metric_id=None, levels=None):
+    fetch_facebook_data(access_token, start_date, end_date, account_id, single_fetch=single_fetch, levels=levels)
+    if klaviyo_api_key:
+        fetch_klaviyo_data(klaviyo_api_key, start_date, end_date, conversion_metric_id=conversion_metric_id)
+
+# Preset date ranges (days back from today) - the cache warmer uses the same ones
+DATE_PRESETS = {
+    "Last 7 Days": 7,
+    "Last 14 Days": 14,
+    "Last 30 Days": 30,
+    "Last 60 Days": 60,
+    "Last 90 Days": 90
+}
+
+def preset_date_range(date_option, now=None):
+    end_date = now or datetime.now()
+    return end_date - timedelta(days=DATE_PRESETS[date_option]), end_date
+
@@ -0,0 +1,226 @@
+# Graph API rate limiting shared by every Streamlit session in the process
+# Reads the usage headers Facebook sends back on every call, keeps the latest
+# usage per ad account, and spaces out / holds back calls before the account
+# gets throttled. Throttle errors are retried with jittered backoff.
+
+import json
+import random
+import re
+import threading
+import time
+
+from facebook_business.api import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+
+from instrumentation import track_api_call, record_response_bytes
+
+# Usage (percent of the account's budget) where we start spacing calls out,
+# and where we stop and wait for the budget to recover
+USAGE_SOFT_LIMIT = 75
+USAGE_HARD_LIMIT = 95
+MAX_SPREAD_DELAY = 10.0
+HARD_LIMIT_WAIT = 60.0
+MAX_WAIT = 300.0
+
+# Calls in flight at once per ad account
+MAX_CONCURRENT_PER_ACCOUNT = 4
+
+# Throttling error codes (app, user, account and business use case limits)
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, 80000, 80001, 80002, 80003, 80004, 80005, 80006, 80008, 80009, 80014}
+MAX_RETRIES = 5
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+
+# Calls that aren't on an ad account (report runs, batch) share this bucket
+OTHER_BUCKET = 'other'
+
+ACCOUNT_IN_PATH = re.compile(r'(act_\d+)')
+
+
+# Which ad account a Graph API path belongs to
+def account_for_path(path):
+    if isinstance(path, str):
+        match = ACCOUNT_IN_PATH.search(path)
+        return match.group(1) if match else OTHER_BUCKET
+    for part in path:
+        if str(part).startswith('act_'):
+            return str(part)
+    return OTHER_BUCKET
+
+
+# Which edge a call hits ('insights', 'adsets', ...) - object reads are just 'object'
+def endpoint_for_path(path):
+    if isinstance(path, str):
+        path = path.split('?')[0].rstrip('/').split('/')
+    last = str(path[-1]) if path else ''
+    if not last or last.isdigit() or last.startswith('act_') or last.startswith('http') or '.' in last:
+        return 'object'
+    return last
+
+
+def _load_header(headers, name):
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            try:
+                return json.loads(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+# Pull usage percent and time-until-recovered (seconds) out of the response headers
+def parse_usage_headers(headers):
+    usage_pct = []
+    regain_seconds = 0
+
+    ad_account_usage = _load_header(headers, 'x-ad-account-usage')
+    if isinstance(ad_account_usage, dict):
+        usage_pct.append(float(ad_account_usage.get('acc_id_util_pct') or 0))
+        regain_seconds = max(regain_seconds, float(ad_account_usage.get('reset_time_duration') or 0))
+
+    insights_throttle = _load_header(headers, 'x-fb-ads-insights-throttle')
+    if isinstance(insights_throttle, dict):
+        usage_pct.append(float(insights_throttle.get('acc_id_util_pct') or 0))
+        usage_pct.append(float(insights_throttle.get('app_id_util_pct') or 0))
+
+    business_usage = _load_header(headers, 'x-business-use-case-usage')
+    if isinstance(business_usage, dict):
+        for entries in business_usage.values():
+            for entry in entries or []:
+                usage_pct.append(max(
+                    float(entry.get('call_count') or 0),
+                    float(entry.get('total_cputime') or 0),
+                    float(entry.get('total_time') or 0)
+                ))
+                # Facebook reports this one in minutes
+                regain_seconds = max(regain_seconds, float(entry.get('estimated_time_to_regain_access') or 0) * 60)
+
+    if not usage_pct and not regain_seconds:
+        return None
+    return {'usage_pct': max(usage_pct) if usage_pct else 0.0, 'regain_seconds': regain_seconds}
+
+
+def is_throttle_error(error):
+    return isinstance(error, FacebookRequestError) and error.api_error_code() in THROTTLE_ERROR_CODES
+
+
+class RateLimitScheduler:
+    def __init__(self, max_concurrent=MAX_CONCURRENT_PER_ACCOUNT, sleep=time.sleep, clock=time.time):
+        self.max_concurrent = max_concurrent
+        self.sleep = sleep
+        self.clock = clock
+        self._usage = {}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, account_id):
+        with self._lock:
+            semaphore = self._semaphores.get(account_id)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_concurrent)
+                self._semaphores[account_id] = semaphore
+            return semaphore
+
+    # Store the latest usage reading for an account
+    def record(self, account_id, headers):
+        usage = parse_usage_headers(headers)
+        if usage is None:
+            return
+        now = self.clock()
+        with self._lock:
+            entry = self._usage.setdefault(account_id, {'calls': 0, 'throttled': 0})
+            entry['usage_pct'] = usage['usage_pct']
+            entry['regain_at'] = now + usage['regain_seconds'] if usage['regain_seconds'] else None
+            entry['updated_at'] = now
+
+    def _count(self, account_id, key):
+        with self._lock:
+            entry = self._usage.setdefault(account_id, {'calls': 0, 'throttled': 0})
+            entry[key] += 1
+
+    # How long to hold the next call for this account
+    def delay_for(self, account_id):
+        now = self.clock()
+        with self._lock:
+            entry = self._usage.get(account_id)
+            if not entry or 'usage_pct' not in entry:
+                return 0.0
+            usage_pct = entry['usage_pct']
+            regain_at = entry.get('regain_at')
+
+        if regain_at and regain_at > now and usage_pct >= USAGE_HARD_LIMIT:
+            return min(regain_at - now, MAX_WAIT)
+        if usage_pct >= USAGE_HARD_LIMIT:
+            return HARD_LIMIT_WAIT
+        if usage_pct >= USAGE_SOFT_LIMIT:
+            # Spread calls out more the closer we get to the limit (with jitter so sessions don't line up)
+            share = (usage_pct - USAGE_SOFT_LIMIT) / (USAGE_HARD_LIMIT - USAGE_SOFT_LIMIT)
+            return share * MAX_SPREAD_DELAY * random.uniform(0.5, 1.0)
+        return 0.0
+
+    # Run call_fn() for an account: wait for budget, record usage, retry throttles
+    def run(self, account_id, call_fn):
+        with self._semaphore(account_id):
+            for attempt in range(MAX_RETRIES + 1):
+                delay = self.delay_for(account_id)
+                if delay > 0:
+                    self.sleep(delay)
+
+                self._count(account_id, 'calls')
+                try:
+                    response = call_fn()
+                except FacebookRequestError as e:
+                    self.record(account_id, e.http_headers())
+                    if not is_throttle_error(e) or attempt == MAX_RETRIES:
+                        raise
+                    self._count(account_id, 'throttled')
+                    backoff = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+                    self.sleep(random.uniform(backoff / 2, backoff))
+                    continue
+
+                self.record(account_id, response.headers())
+                return response
+
+    # Current usage per account, for display
+    def snapshot(self):
+        now = self.clock()
+        with self._lock:
+            return {
+                account_id: {
+                    'usage_pct': entry.get('usage_pct'),
+                    'regain_in': max(entry['regain_at'] - now, 0) if entry.get('regain_at') else 0,
+                    'calls': entry['calls'],
+                    'throttled': entry['throttled']
+                }
+                for account_id, entry in self._usage.items()
+            }
+
+
+_scheduler = RateLimitScheduler()
+
+
+def get_scheduler():
+    return _scheduler
+
+
+# FacebookAdsApi that sends every call through the shared scheduler
+class ScheduledFacebookAdsApi(FacebookAdsApi):
+    # init() on a subclass only sets the subclass default, but AdAccount & co.
+    # (and the SDK crash reporter) look up FacebookAdsApi's default, so set that one too
+    @classmethod
+    def init(cls, *args, crash_log=True, **kwargs):
+        api = super().init(*args, crash_log=False, **kwargs)
+        FacebookAdsApi.set_default_api(api)
+        if crash_log:
+            from facebook_business.crashreporter import CrashReporter
+            CrashReporter.enable()
+        return api
+
+    def call(self, method, path, params=None, headers=None, files=None, url_override=None, api_version=None):
+        def timed_call():
+            with track_api_call('graph', endpoint_for_path(path)):
+                response = FacebookAdsApi.call(self, method, path, params, headers, files, url_override, api_version)
+            record_response_bytes('graph', len(response.body() or ''))
+            return response
+
+        return get_scheduler().run(account_for_path(path), timed_call)
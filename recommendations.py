@@ -0,0 +1,136 @@
+# Recommendation rules - SCALE / PAUSE / REFRESH calls for campaigns, ad sets and ads
+# Every rule for a level is checked in one vectorized pass over the metrics frame;
+# the first rule that matches a row wins (same as the old if/elif chains)
+
+import numpy as np
+import pandas as pd
+
+# Thresholds used when a client doesn't override them (CTR and CPM as shown on the dashboard)
+DEFAULT_THRESHOLDS = {
+    # Campaigns
+    'campaign_scale_min_roas': 4.0,
+    'campaign_scale_min_purchases': 5,
+    'campaign_pause_max_roas': 2.0,
+    'campaign_pause_min_spend': 50,
+    # Ad sets
+    'adset_scale_max_cpa': 30,
+    'adset_pause_min_spend': 25,
+    'adset_audience_min_cpm': 50,
+    'adset_audience_max_ctr': 1.0,
+    # Ads
+    'ad_winning_min_ctr': 2.0,
+    'ad_winning_min_impressions': 1000,
+    'ad_refresh_max_ctr': 0.5,
+    'ad_refresh_min_spend': 15,
+    'ad_landing_min_ctr': 1.5,
+    'ad_landing_min_spend': 20
+}
+
+METRIC_COLUMNS = ['spend', 'impressions', 'purchases', 'roas', 'cpa', 'ctr', 'cpm']
+
+# Column with the display name at each level
+LEVEL_NAMES = {
+    'campaign': 'campaign_name',
+    'adset': 'adset_name',
+    'ad': 'ad_name'
+}
+
+# How actions are ranked at each level (column, ascending)
+LEVEL_PRIORITY = {
+    'campaign': ('roas', False),
+    'adset': ('cpa', True),
+    'ad': ('ctr', False)
+}
+
+ACTION_COLUMNS = ['level', 'name', 'campaign_name', 'action', 'kind', 'icon', 'detail'] + METRIC_COLUMNS
+
+
+class Rule:
+    # condition(metrics, thresholds) -> boolean array; detail is formatted with the row's columns
+    def __init__(self, action, kind, icon, condition, detail):
+        self.action = action
+        self.kind = kind
+        self.icon = icon
+        self.condition = condition
+        self.detail = detail
+
+
+# Checked in order - a row gets the first rule it matches
+RULES = {
+    'campaign': [
+        Rule('SCALE CAMPAIGN', 'success', '✅',
+             lambda m, t: (m['roas'] > t['campaign_scale_min_roas']) & (m['purchases'] >= t['campaign_scale_min_purchases']),
+             "Increase budget by 50-100% (Current ROAS: {roas:.2f}x)"),
+        Rule('PAUSE CAMPAIGN', 'error', '❌',
+             lambda m, t: (m['roas'] < t['campaign_pause_max_roas']) & (m['spend'] > t['campaign_pause_min_spend']),
+             "Poor performance: {roas:.2f}x ROAS after ${spend:.2f} spend")
+    ],
+    'adset': [
+        Rule('SCALE AD SET', 'success', '✅',
+             lambda m, t: (m['purchases'] > 0) & (m['cpa'] < t['adset_scale_max_cpa']),
+             "Great CPA: ${cpa:.2f} | Campaign: {campaign_name}"),
+        Rule('PAUSE AD SET', 'error', '❌',
+             lambda m, t: (m['spend'] > t['adset_pause_min_spend']) & (m['purchases'] == 0),
+             "No conversions after ${spend:.2f} spend | Campaign: {campaign_name}"),
+        Rule('AUDIENCE ISSUE', 'warning', '⚠️',
+             lambda m, t: (m['cpm'] > t['adset_audience_min_cpm']) & (m['ctr'] < t['adset_audience_max_ctr']),
+             "High CPM (${cpm:.2f}) + Low CTR ({ctr:.2f}%) = Audience fatigue")
+    ],
+    'ad': [
+        Rule('WINNING CREATIVE', 'success', '✅',
+             lambda m, t: (m['ctr'] > t['ad_winning_min_ctr']) & (m['impressions'] > t['ad_winning_min_impressions']),
+             "High CTR: {ctr:.2f}% | Use this creative style for new ads"),
+        Rule('REFRESH CREATIVE', 'warning', '🔄',
+             lambda m, t: (m['ctr'] < t['ad_refresh_max_ctr']) & (m['spend'] > t['ad_refresh_min_spend']),
+             "Low CTR: {ctr:.2f}% | Creative is worn out, needs refresh"),
+        Rule('LANDING PAGE ISSUE', 'warning', '⚠️',
+             lambda m, t: (m['ctr'] > t['ad_landing_min_ctr']) & (m['purchases'] == 0) & (m['spend'] > t['ad_landing_min_spend']),
+             "Good CTR ({ctr:.2f}%) but no conversions - check landing page")
+    ]
+}
+
+
+# Defaults plus a client's overrides (unknown names are a typo, so they fail loudly)
+def resolve_thresholds(overrides=None):
+    overrides = overrides or {}
+    unknown = set(overrides) - set(DEFAULT_THRESHOLDS)
+    if unknown:
+        raise ValueError(f"Unknown recommendation thresholds: {', '.join(sorted(unknown))}")
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    thresholds.update(overrides)
+    return thresholds
+
+
+# Ranked action table for one level of the processed insights frame
+def evaluate_rules(df, level, thresholds=None):
+    if df.empty:
+        return pd.DataFrame(columns=ACTION_COLUMNS)
+
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    rules = RULES[level]
+    metrics = {column: df[column].to_numpy(dtype='float64') for column in METRIC_COLUMNS}
+
+    conditions = [np.asarray(rule.condition(metrics, thresholds), dtype=bool) for rule in rules]
+    rule_index = np.select(conditions, np.arange(len(rules)), default=-1)
+    matched = rule_index >= 0
+    if not matched.any():
+        return pd.DataFrame(columns=ACTION_COLUMNS)
+
+    actions = df.loc[matched, ['campaign_name'] + METRIC_COLUMNS].copy()
+    actions.insert(0, 'name', df.loc[matched, LEVEL_NAMES[level]].astype(str).to_numpy())
+    actions.insert(0, 'level', level)
+    actions['campaign_name'] = actions['campaign_name'].astype(str)
+    actions['rule'] = rule_index[matched]
+    actions['action'] = np.array([rule.action for rule in rules], dtype=object)[actions['rule']]
+    actions['kind'] = np.array([rule.kind for rule in rules], dtype=object)[actions['rule']]
+    actions['icon'] = np.array([rule.icon for rule in rules], dtype=object)[actions['rule']]
+
+    sort_column, ascending = LEVEL_PRIORITY[level]
+    actions = actions.sort_values(sort_column, ascending=ascending, kind='stable')
+
+    # Only matched rows get a text explanation
+    actions['detail'] = [
+        rules[row['rule']].detail.format(**row)
+        for row in actions.to_dict('records')
+    ]
+    return actions[ACTION_COLUMNS].reset_index(drop=True)
@@ -0,0 +1,50 @@
+# Campaign / ad set rollups built locally from ad-level rows
+# Used by single-fetch mode: one ad-level pull instead of three API queries
+
+import numpy as np
+
+from insights_frame import empty_insights_frame, enforce_dtypes
+
+# Metrics that can be summed from ads up to ad sets and campaigns. Only these are
+# carried over - reach and frequency count unique people, so the same person seen
+# by two ads would be counted twice, and the ratios are recomputed from the sums
+ADDITIVE_METRICS = ['spend', 'impressions', 'clicks', 'purchases', 'revenue', 'actual_revenue']
+
+# Columns that identify a row at each level
+LEVEL_KEYS = {
+    'campaign': ['campaign_id', 'campaign_name'],
+    'adset': ['campaign_id', 'campaign_name', 'adset_id', 'adset_name']
+}
+
+
+# Recompute ratio metrics from summed totals (never average the ratios)
+def add_ratio_metrics(df):
+    spend = df['spend'].to_numpy(dtype='float64')
+    revenue = df['revenue'].to_numpy(dtype='float64')
+    purchases = df['purchases'].to_numpy(dtype='float64')
+    impressions = df['impressions'].to_numpy(dtype='float64')
+    clicks = df['clicks'].to_numpy(dtype='float64')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['roas'] = np.where(spend > 0, revenue / spend, 0.0)
+        df['cpa'] = np.where(purchases > 0, spend / purchases, 0.0)
+        df['ctr'] = np.where(impressions > 0, clicks / impressions * 100, 0.0)
+        df['cpm'] = np.where(impressions > 0, spend / impressions * 1000, 0.0)
+    return df
+
+
+# Roll the processed ad frame up to 'campaign' or 'adset' level
+def rollup_insights(ads_df, level):
+    if ads_df.empty:
+        return empty_insights_frame()
+
+    keys = LEVEL_KEYS[level]
+    rollup_df = (
+        ads_df.groupby(keys, sort=False, dropna=False, observed=True)[ADDITIVE_METRICS]
+        .sum()
+        .reset_index()
+    )
+    add_ratio_metrics(rollup_df)
+
+    # Keep the same shape as the API-backed frames so the tabs don't care where they came from
+    return enforce_dtypes(rollup_df)
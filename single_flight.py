@@ -0,0 +1,122 @@
+# Single-flight request coalescing
+# When several sessions ask for the same query at the same time, only the first
+# one calls the API; the rest wait for its result. Errors are handed to every
+# waiter but never remembered, so the next request tries again.
+
+import threading
+
+# Longest a session waits on someone else's fetch (seconds) - async report jobs can take minutes
+COALESCE_TIMEOUT = 600
+
+
+class CoalescedTimeout(Exception):
+    pass
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, timeout=COALESCE_TIMEOUT):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._leaders = 0
+        self._coalesced = 0
+
+    # Run fn() for this key, or wait for the call already running for it
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self._leaders += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(self.timeout if timeout is None else timeout):
+                raise CoalescedTimeout(f"Timed out waiting for an in-flight fetch of {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        return self._run(key, call, fn)
+
+    # Start fn() for this key in a background thread unless it's already running
+    def start(self, key, fn):
+        with self._lock:
+            if key in self._calls:
+                return
+            call = _Call()
+            self._calls[key] = call
+            self._leaders += 1
+
+        def run():
+            try:
+                self._run(key, call, fn)
+            except Exception:
+                pass  # errors are only shared with waiting callers, never kept
+
+        threading.Thread(target=run, name='single-flight', daemon=True).start()
+
+    # Leader side: run fn(), hand the outcome to every waiter, then forget the key
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def stats(self):
+        with self._lock:
+            return {
+                'leaders': self._leaders,
+                'coalesced': self._coalesced,
+                'in_flight': len(self._calls)
+            }
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _get_flight(name):
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = SingleFlight()
+            _flights[name] = flight
+        return flight
+
+
+# Shared by every session in the process
+def get_insights_flight():
+    return _get_flight('insights')
+
+
+def get_klaviyo_flight():
+    return _get_flight('klaviyo')
+
+
+# Background stale-while-revalidate refreshes, one per client and range
+def get_revalidation_flight():
+    return _get_flight('revalidate')
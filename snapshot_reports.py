@@ -0,0 +1,196 @@
+# Snapshot reports for every client - the dashboard's numbers without Streamlit
+#
+#   python snapshot_reports.py                                  # all clients, all presets, Parquet
+#   python snapshot_reports.py --presets "Last 7 Days" --format csv json
+#   python snapshot_reports.py --since 2025-01-01 --until 2025-01-31 --clients "Supplies Outlet"
+#
+# Each client runs in its own worker process. Reports land in
+# <output>/<run date>/<client>/<range>/ as one file per level (campaigns, ad sets,
+# ads), one per level's ranked actions, plus summary.json with totals, Klaviyo
+# numbers and fetch timings; <output>/<run date>/index.json lists every client.
+#
+# Fetches go through the same insights cache, daily store and Klaviyo cache as
+# the dashboard (DASHBOARD_CACHE_DIR / DASHBOARD_DAILY_STORE_PATH), so a nightly
+# run also leaves the dashboard's disk cache warm for the morning.
+#
+# Credentials come from FACEBOOK_TOKEN / KLAVIYO_API_KEY / KLAVIYO_CONVERSION_METRIC_ID,
+# or from the dashboard's .streamlit/secrets.toml (same key names, lower case).
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+import tomllib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from pipeline import CLIENTS, DATE_PRESETS, preset_date_range, build_client_report
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports')
+DEFAULT_SECRETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.streamlit', 'secrets.toml')
+FORMATS = ['parquet', 'csv', 'json']
+
+# Report file names for each level's frame / action table
+LEVEL_FILES = {'campaign': 'campaigns', 'adset': 'adsets', 'ad': 'ads'}
+
+
+def slugify(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+# Environment first, then secrets.toml - returns the same keys as st.secrets
+def load_credentials(secrets_path=DEFAULT_SECRETS):
+    secrets = {}
+    if secrets_path and os.path.exists(secrets_path):
+        with open(secrets_path, 'rb') as f:
+            secrets = tomllib.load(f)
+    credentials = {}
+    for key in ('facebook_token', 'klaviyo_api_key', 'klaviyo_conversion_metric_id'):
+        credentials[key] = os.environ.get(key.upper()) or secrets.get(key)
+    return credentials
+
+
+def write_frame(df, path_base, formats):
+    paths = []
+    for output_format in formats:
+        path = f"{path_base}.{output_format}"
+        if output_format == 'parquet':
+            df.to_parquet(path, index=False)
+        elif output_format == 'csv':
+            df.to_csv(path, index=False)
+        else:
+            df.to_json(path, orient='records', indent=2)
+        paths.append(path)
+    return paths
+
+
+def write_report(report, report_dir, formats, meta):
+    os.makedirs(report_dir, exist_ok=True)
+    files = []
+    for level, name in LEVEL_FILES.items():
+        files += write_frame(report['frames'][level], os.path.join(report_dir, name), formats)
+        files += write_frame(report['actions'][level], os.path.join(report_dir, f"{name}_actions"), formats)
+
+    summary = {
+        **meta,
+        'totals': report['totals'],
+        'klaviyo': report['klaviyo'],
+        'rows': {level: len(df) for level, df in report['frames'].items()},
+        'actions': {level: len(df) for level, df in report['actions'].items()},
+        'timings': report['timings'],
+        'files': [os.path.basename(path) for path in files]
+    }
+    with open(os.path.join(report_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+
+# One client, every requested range (runs in a worker process). A failing range
+# is recorded in the result instead of stopping the client's other ranges.
+def snapshot_client(client_name, ranges, credentials, run_dir, formats, single_fetch=False, refresh=False):
+    info = CLIENTS[client_name]
+    results = []
+    for label, start_date, end_date in ranges:
+        meta = {
+            'client': client_name,
+            'account_id': info['account_id'],
+            'range': label,
+            'since': start_date.strftime('%Y-%m-%d'),
+            'until': end_date.strftime('%Y-%m-%d'),
+            'single_fetch': single_fetch,
+            'generated_at': datetime.now().isoformat(timespec='seconds')
+        }
+        started = time.perf_counter()
+        try:
+            report = build_client_report(
+                credentials['facebook_token'], info, start_date, end_date,
+                klaviyo_api_key=credentials.get('klaviyo_api_key'),
+                conversion_metric_id=credentials.get('klaviyo_conversion_metric_id'),
+                single_fetch=single_fetch, refresh=refresh
+            )
+            report_dir = os.path.join(run_dir, slugify(client_name), slugify(label))
+            summary = write_report(report, report_dir, formats, meta)
+            results.append({**meta, 'status': 'ok', 'totals': summary['totals'],
+                            'path': os.path.relpath(report_dir, run_dir),
+                            'seconds': round(time.perf_counter() - started, 3)})
+        except Exception as e:
+            results.append({**meta, 'status': 'error', 'error': f"{type(e).__name__}: {e}",
+                            'seconds': round(time.perf_counter() - started, 3)})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write snapshot reports for every client")
+    parser.add_argument('--clients', nargs='+', choices=list(CLIENTS), help="clients to report on (default: all)")
+    parser.add_argument('--presets', nargs='+', choices=list(DATE_PRESETS), help="date presets (default: all)")
+    parser.add_argument('--since', help="custom range start (YYYY-MM-DD), instead of presets")
+    parser.add_argument('--until', help="custom range end (YYYY-MM-DD, default today)")
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=['parquet'], dest='formats')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="reports directory")
+    parser.add_argument('--workers', type=int, default=min(len(CLIENTS), os.cpu_count() or 1),
+                        help="worker processes (one client at a time each)")
+    parser.add_argument('--secrets', default=DEFAULT_SECRETS, help="secrets.toml to read credentials from")
+    parser.add_argument('--single-fetch', action='store_true', help="pull ads once and roll campaigns / ad sets up from them")
+    parser.add_argument('--refresh', action='store_true', help="skip the caches and fetch everything again")
+    args = parser.parse_args(argv)
+
+    if 'parquet' in args.formats and not any(importlib.util.find_spec(module) for module in ('pyarrow', 'fastparquet')):
+        parser.error("Parquet output needs pyarrow (pip install pyarrow) - or use --format csv / json")
+
+    credentials = load_credentials(args.secrets)
+    if not credentials['facebook_token']:
+        parser.error(f"No Facebook token - set FACEBOOK_TOKEN or add facebook_token to {args.secrets}")
+
+    if args.since:
+        start_date = datetime.strptime(args.since, '%Y-%m-%d')
+        end_date = datetime.strptime(args.until, '%Y-%m-%d') if args.until else datetime.now()
+        ranges = [(f"{start_date:%Y-%m-%d}_{end_date:%Y-%m-%d}", start_date, end_date)]
+    else:
+        ranges = [(preset, *preset_date_range(preset)) for preset in (args.presets or list(DATE_PRESETS))]
+
+    clients = args.clients or list(CLIENTS)
+    run_dir = os.path.join(args.output, datetime.now().strftime('%Y-%m-%d'))
+    os.makedirs(run_dir, exist_ok=True)
+    print(f"{len(clients)} clients x {len(ranges)} ranges -> {run_dir} ({args.workers} workers)")
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+        futures = {
+            executor.submit(snapshot_client, client_name, ranges, credentials, run_dir, args.formats,
+                            single_fetch=args.single_fetch, refresh=args.refresh): client_name
+            for client_name in clients
+        }
+        for future in as_completed(futures):
+            client_name = futures[future]
+            try:
+                client_results = future.result()
+            except Exception as e:
+                client_results = [{'client': client_name, 'status': 'error', 'error': f"{type(e).__name__}: {e}"}]
+            for result in client_results:
+                if result['status'] == 'ok':
+                    totals = result['totals']
+                    print(f"  ✓ {client_name} / {result['range']}: ${totals['spend']:,.2f} spend, "
+                          f"{totals['roas']:.2f}x ROAS ({result['seconds']:.1f}s)")
+                else:
+                    print(f"  ✗ {client_name} / {result.get('range', '-')}: {result['error']}")
+            results += client_results
+
+    with open(os.path.join(run_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - started, 3),
+            'formats': args.formats,
+            'reports': results
+        }, f, indent=2, default=str)
+
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f"done in {time.perf_counter() - started:.1f}s, {len(results) - len(failed)} reports written, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
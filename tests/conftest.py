@@ -0,0 +1,40 @@
+# Test setup: the dashboard modules read their settings from the environment when
+# they are imported, so caches, the daily store and the metrics file are pointed
+# at a scratch directory here, before any test module imports them.
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_scratch = tempfile.mkdtemp(prefix='dashboard-tests-')
+os.environ.update({
+    'DASHBOARD_CACHE_BACKEND': 'disk',
+    'DASHBOARD_CACHE_DIR': os.path.join(_scratch, 'insights'),
+    'DASHBOARD_KLAVIYO_CACHE_DIR': os.path.join(_scratch, 'klaviyo'),
+    'DASHBOARD_DAILY_STORE_PATH': os.path.join(_scratch, 'daily.sqlite'),
+    'DASHBOARD_METRICS_FILE': '',
+    'DASHBOARD_METRICS_LOG': '0',
+    'DASHBOARD_CACHE_WARMER': '0'
+})
+
+
+# Local fake Graph / Klaviyo API (benchmarks/fake_api.py), no latency, quick report jobs
+@pytest.fixture
+def fake_api():
+    from benchmarks.fake_api import FakeApiConfig, start_server
+    server = start_server(FakeApiConfig(latency_ms=0, jitter_ms=0, ads_per_account=40, report_seconds=0.3))
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def fake_redis():
+    from benchmarks.fake_redis import start_server
+    server = start_server()
+    yield server
+    server.shutdown()
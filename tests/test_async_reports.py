@@ -0,0 +1,118 @@
+import math
+from datetime import date, timedelta
+
+import pytest
+
+import async_reports
+import fb_api
+from async_reports import (
+    AsyncReportError, JOB_COMPLETED, iter_insights_async, should_use_async, wait_for_report
+)
+
+
+# Report run stand-in: each api_get() moves to the next scripted status
+class ScriptedReportRun:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.data = {'id': 'report-1'}
+        self.polls = 0
+
+    def api_get(self, fields=None):
+        self.polls += 1
+        self.data['async_status'] = self.statuses.pop(0)
+        self.data['async_percent_completion'] = 50
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def __call__(self):
+        return self.now
+
+
+def test_poll_backs_off_until_the_job_completes():
+    clock = FakeClock()
+    report_run = ScriptedReportRun(['Job Running'] * 4 + [JOB_COMPLETED])
+
+    assert wait_for_report(report_run, sleep=clock.sleep, clock=clock) is report_run
+    assert report_run.polls == 5
+    assert clock.sleeps == pytest.approx([1.0, 1.5, 2.25, 3.375])
+
+
+def test_poll_delay_is_capped():
+    clock = FakeClock()
+    report_run = ScriptedReportRun(['Job Running'] * 20 + [JOB_COMPLETED])
+
+    wait_for_report(report_run, timeout=3600, sleep=clock.sleep, clock=clock)
+    assert max(clock.sleeps) == async_reports.POLL_MAX_DELAY
+    assert clock.sleeps == sorted(clock.sleeps)
+
+
+@pytest.mark.parametrize('status', async_reports.JOB_FAILED_STATUSES)
+def test_failed_job_raises(status):
+    clock = FakeClock()
+    report_run = ScriptedReportRun(['Job Running', status])
+
+    with pytest.raises(AsyncReportError, match=status):
+        wait_for_report(report_run, sleep=clock.sleep, clock=clock)
+
+
+# Gives up before a sleep would carry it past the deadline, not after
+def test_job_that_never_finishes_times_out():
+    clock = FakeClock()
+    report_run = ScriptedReportRun(['Job Running'] * 100)
+
+    with pytest.raises(AsyncReportError, match='still running'):
+        wait_for_report(report_run, timeout=10, sleep=clock.sleep, clock=clock)
+    assert clock.now <= 10
+
+
+def test_switches_to_async_for_long_ranges_and_big_pulls():
+    assert not should_use_async('campaign', '2025-01-01', '2025-06-30')
+    assert not should_use_async('ad', '2025-01-01', '2025-01-07')
+    assert should_use_async('ad', '2025-01-01', '2025-02-14')
+    assert should_use_async('adset', '2025-01-01', '2025-01-07', expected_rows=async_reports.ASYNC_MIN_ROWS)
+    assert not should_use_async('adset', '2025-01-01', '2025-01-07', expected_rows=async_reports.ASYNC_MIN_ROWS - 1)
+
+
+# The whole path through the SDK against the fake report-run endpoints: submit,
+# poll until the job is done, then read the result pages one at a time - and get
+# the same rows the synchronous call returns
+def test_async_report_against_fake_endpoints(fake_api, monkeypatch):
+    monkeypatch.setattr(async_reports, 'POLL_INITIAL_DELAY', 0.05)
+    monkeypatch.setattr(fb_api, 'GRAPH_URL', f"http://127.0.0.1:{fake_api.server_port}")
+    monkeypatch.setattr(fb_api, '_api', None)
+    from facebook_business.adobjects.adaccount import AdAccount
+
+    account = AdAccount('act_1001', api=fb_api.get_facebook_api('test-token'))
+    until = date.today()
+    fields = ['ad_id', 'ad_name', 'spend', 'impressions', 'clicks', 'actions']
+    params = {
+        'level': 'ad',
+        'time_range': {'since': (until - timedelta(days=59)).isoformat(), 'until': until.isoformat()},
+        'limit': 7
+    }
+
+    pages = iter_insights_async(account, fields, params)
+    first_page = next(pages)
+    # The next page isn't read until the caller is done with this one
+    assert fake_api.state.stats()['calls']['graph_insights_page'] == 1
+    assert len(first_page) == 7
+    rows = first_page + [row for page in pages for row in page]
+
+    calls = fake_api.state.stats()['calls']
+    assert calls['graph_report_submit'] == 1
+    assert calls['graph_report_status'] >= 2
+    assert calls['graph_insights_page'] == math.ceil(len(rows) / 7)
+
+    sync_rows = [item.export_all_data() for item in account.get_insights(fields=fields, params=params)]
+    assert rows and rows == sync_rows
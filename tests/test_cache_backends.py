@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+
+import pytest
+
+import cache_backends
+from cache_backends import CacheBackendError, DiskBackend, RedisBackend, RespClient, decode_entry, encode_entry
+
+
+@pytest.fixture
+def client(fake_redis):
+    return RespClient(f"redis://127.0.0.1:{fake_redis.server_port}/0")
+
+
+def test_resp_reply_types(client):
+    assert client.command('PING') == 'PONG'
+    assert client.command('GET', 'missing') is None
+    assert client.command('SET', 'key', b'\x00binary\r\nvalue') == 'OK'
+    assert client.command('GET', 'key') == b'\x00binary\r\nvalue'
+    assert client.command('EXISTS', 'key', 'missing') == 1
+    assert client.command('SET', 'key', 'other', 'NX') is None
+    assert client.command('SCAN', 0, 'MATCH', 'k*') == [b'0', [b'key']]
+
+
+def test_error_reply_raises(client):
+    with pytest.raises(CacheBackendError, match='unknown command'):
+        client.command('NOSUCHCOMMAND')
+    # The connection is still usable afterwards
+    assert client.command('PING') == 'PONG'
+
+
+def test_selects_the_database_in_the_url(fake_redis):
+    RespClient(f"redis://127.0.0.1:{fake_redis.server_port}/3").command('SET', 'key', 'in db 3')
+    other = RespClient(f"redis://127.0.0.1:{fake_redis.server_port}/0")
+    assert other.command('GET', 'key') is None
+    assert fake_redis.state.databases[3][b'key'][0] == b'in db 3'
+
+
+# A connection the server dropped is reopened and the command retried once
+def test_reconnects_after_the_connection_drops(client):
+    assert client.command('SET', 'key', 'value') == 'OK'
+    sock, reader = client._local.conn
+    sock.close()
+    assert client.command('GET', 'key') == b'value'
+
+
+def test_unreachable_server_is_an_os_error():
+    with pytest.raises(OSError):
+        RespClient("redis://127.0.0.1:1/0", timeout=0.5).command('PING')
+
+
+def test_redis_lock_is_only_released_by_its_holder(fake_redis):
+    backend = RedisBackend(f"redis://127.0.0.1:{fake_redis.server_port}/0", 'insights')
+    token = backend.acquire_lock('key', 60)
+    assert token
+    assert backend.acquire_lock('key', 60) is None
+
+    backend.release_lock('key', 'someone-elses-token')
+    assert backend.acquire_lock('key', 60) is None
+
+    backend.release_lock('key', token)
+    assert backend.acquire_lock('key', 60)
+    # Check and delete are one EVAL on the server, not a GET and a DEL
+    calls = fake_redis.state.stats()['calls']
+    assert calls['EVAL'] == 2 and 'DEL' not in calls
+
+
+# A lock file left by a dead process (older than its ttl)
+def expired_lock(tmp_path):
+    assert DiskBackend(str(tmp_path), 1024).acquire_lock('key', 60)
+    lock_path = str(tmp_path / 'key.lock')
+    os.utime(lock_path, (time.time() - 120, time.time() - 120))
+    return lock_path
+
+
+def test_disk_expired_lock_is_taken_over_by_one_process(tmp_path):
+    expired_lock(tmp_path)
+    backends = [DiskBackend(str(tmp_path), 1024) for _ in range(8)]
+    barrier = threading.Barrier(len(backends))
+    tokens = [None] * len(backends)
+
+    def acquire(i):
+        barrier.wait()
+        tokens[i] = backends[i].acquire_lock('key', 60)
+
+    threads = [threading.Thread(target=acquire, args=(i,)) for i in range(len(backends))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len([token for token in tokens if token]) == 1
+    assert sorted(os.listdir(tmp_path)) == ['key.lock']
+
+
+# Another process replaces the expired lock between this one's check and its
+# takeover - the fresh lock must survive, and this process must not get one too
+def test_disk_takeover_leaves_a_fresh_lock_alone(tmp_path, monkeypatch):
+    expired_lock(tmp_path)
+    other = DiskBackend(str(tmp_path), 1024)
+    real_rename = os.rename
+    other_token = []
+
+    def rename(src, dst):
+        monkeypatch.setattr(cache_backends.os, 'rename', real_rename)
+        other_token.append(other.acquire_lock('key', 60))
+        return real_rename(src, dst)
+
+    monkeypatch.setattr(cache_backends.os, 'rename', rename)
+    assert DiskBackend(str(tmp_path), 1024).acquire_lock('key', 60) is None
+
+    assert other_token[0]
+    with open(tmp_path / 'key.lock') as f:
+        assert f.read() == other_token[0]
+    assert sorted(os.listdir(tmp_path)) == ['key.lock']
+
+
+def test_redis_entries_outlive_their_ttl_as_stale_fallbacks(fake_redis):
+    backend = RedisBackend(f"redis://127.0.0.1:{fake_redis.server_port}/0", 'insights')
+    backend.set('key', b'data', 60)
+    pttl = backend.client.command('PTTL', backend.prefix + 'key')
+    assert pttl > (60 + cache_backends.STALE_KEEP_SECONDS - 5) * 1000
+
+    backend.clear()
+    assert backend.get('key') is None
+
+
+ACTION_ROWS = [
+    {'ad_id': '1', 'spend': '12.50', 'actions': [{'action_type': 'purchase', 'value': '2'}]},
+    {'ad_id': '2', 'spend': '0', 'actions': None},
+    {'ad_id': '3', 'spend': '4.00'}
+]
+
+
+@pytest.mark.parametrize('rows', [ACTION_ROWS, [], {'total_revenue': 10.0, 'campaigns': []}])
+def test_entry_round_trip(rows):
+    assert decode_entry(encode_entry(1000.0, 900.0, rows)) == (1000.0, 900.0, rows)
+
+
+def test_rows_are_stored_as_arrow_when_available():
+    if cache_backends.pa is None:
+        pytest.skip("pyarrow not installed")
+    # Rows may leave fields out (they come back without them); a None forces JSON
+    rows = [row for row in ACTION_ROWS if row.get('actions', []) is not None]
+    data = encode_entry(None, 900.0, rows)
+    assert b'"codec": "arrow"' in data.split(b'\n', 1)[0]
+    assert decode_entry(data)[2] == rows
+    assert b'"codec": "json"' in encode_entry(None, 900.0, ACTION_ROWS).split(b'\n', 1)[0]
+
+
+def test_decode_skips_entries_fetched_before_newer_than():
+    data = encode_entry(None, 900.0, ACTION_ROWS)
+    assert decode_entry(data, newer_than=900.0) is None
+    assert decode_entry(data, newer_than=899.0)[2] == ACTION_ROWS
+
+
+def test_unreadable_entry_is_a_miss():
+    assert decode_entry(b'not an entry') is None
+    assert decode_entry(b'{"codec": "json", "expires_at": null}\ngarbage') is None
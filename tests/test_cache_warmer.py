@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+
+import pytest
+
+import pipeline
+from cache_warmer import WARM_AHEAD_SECONDS, CacheWarmer, WarmBudget, WarmJob
+from insights_cache import LIVE_TTL, get_insights_cache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_look_ahead_is_shorter_than_the_live_ttl():
+    assert WARM_AHEAD_SECONDS < LIVE_TTL
+
+
+# A range ending today that was just filled is left alone; once it is about to
+# expire the warmer fetches it again
+@pytest.mark.parametrize('ttl, fetched', [(LIVE_TTL, False), (WARM_AHEAD_SECONDS - 1, True)])
+def test_warm_pass_only_refetches_entries_about_to_expire(monkeypatch, ttl, fetched):
+    calls = []
+    monkeypatch.setattr(pipeline, 'fetch_insights_rows', lambda *args: calls.append(1) or [{'ad_id': '1'}])
+    today = date.today()
+    params = {'level': 'ad', 'time_range': {'since': (today - timedelta(days=7)).isoformat(), 'until': today.isoformat()}}
+    key = make_cache_key(f"act_warm_{ttl}", 'ad', params['time_range']['since'], params['time_range']['until'], ['spend'], params)
+    get_insights_cache().set(key, [{'ad_id': 'cached'}], ttl)
+
+    entry = pipeline.fetch_insights_level(None, f"act_warm_{ttl}", ['spend'], params, fresh_for=WARM_AHEAD_SECONDS)
+
+    assert bool(calls) == fetched
+    assert entry['rows'] == ([{'ad_id': '1'}] if fetched else [{'ad_id': 'cached'}])
+
+
+def test_budget_caps_requests_per_minute_and_per_day():
+    clock = FakeClock()
+    budget = WarmBudget(per_minute=2, per_day=3, clock=clock)
+    assert [budget.take() for _ in range(3)] == [True, True, False]
+
+    clock.now += 61
+    assert [budget.take() for _ in range(2)] == [True, False]  # the day's third request
+
+    clock.now += 86400
+    assert budget.take()
+
+
+def test_budget_spends_nothing_while_backing_off():
+    clock = FakeClock()
+    budget = WarmBudget(per_minute=10, per_day=100, clock=clock)
+    budget.back_off(300)
+    assert not budget.take()
+    clock.now += 301
+    assert budget.take()
+
+
+def test_fresh_jobs_are_not_run_and_spend_no_budget():
+    budget = WarmBudget(per_minute=1, per_day=10, clock=FakeClock())
+    runs = []
+    jobs = [
+        WarmJob('fresh', lambda: runs.append('fresh'), budget=budget, is_fresh=lambda: True),
+        WarmJob('expiring', lambda: runs.append('expiring'), budget=budget, is_fresh=lambda: False),
+        WarmJob('over budget', lambda: runs.append('over budget'), budget=budget, is_fresh=lambda: False)
+    ]
+    warmer = CacheWarmer(jobs, max_workers=1)
+
+    outcomes = [outcome for job, (outcome, error) in warmer.run_once()]
+
+    assert outcomes == ['fresh', 'warmed', 'skipped']
+    assert runs == ['expiring']
+    status = warmer.status()
+    assert (status['warmed'], status['fresh'], status['skipped']) == (1, 1, 1)
+
+
+def test_rate_limited_job_backs_its_budget_off():
+    clock = FakeClock()
+    budget = WarmBudget(per_minute=10, per_day=100, clock=clock)
+
+    def rate_limited():
+        raise RateLimited('429 - throttled')
+
+    warmer = CacheWarmer([WarmJob('email', rate_limited, budget=budget)], max_workers=1)
+    assert warmer.run_once()[0][1][0] == 'error'
+    assert not budget.take()
@@ -0,0 +1,120 @@
+from datetime import date
+
+import pytest
+
+from daily_store import DailyInsightsStore, combine_daily_rows, day_spans, days_in_range, query_signature
+
+
+def day_row(day, campaign_id, spend, impressions, clicks, purchases=None, **extra):
+    row = {
+        'campaign_id': campaign_id, 'campaign_name': f"Campaign {campaign_id}",
+        'date_start': day, 'date_stop': day,
+        'spend': spend, 'impressions': impressions, 'clicks': clicks, **extra
+    }
+    if purchases is not None:
+        row['actions'] = [{'action_type': 'purchase', 'value': str(purchases)}, {'action_type': 'link_click', 'value': '3'}]
+        row['action_values'] = [{'action_type': 'purchase', 'value': f"{purchases * 25.5:.2f}"}]
+    return row
+
+
+def test_combine_sums_days_per_entity():
+    rows = combine_daily_rows([
+        day_row('2025-03-01', '1', '10.25', '1000', '20', purchases=1, reach='900'),
+        day_row('2025-03-02', '1', '5.50', '1000', '30', purchases=2, reach='950'),
+        day_row('2025-03-01', '2', '3', '0', '0')
+    ], 'campaign')
+
+    first, second = rows
+    assert first['campaign_id'] == '1' and first['campaign_name'] == 'Campaign 1'
+    assert first['spend'] == pytest.approx(15.75)
+    assert (first['impressions'], first['clicks']) == (2000, 50)
+    assert first['cpm'] == pytest.approx(15.75 / 2000 * 1000)
+    assert first['ctr'] == pytest.approx(2.5)
+    assert first['actions'] == [{'action_type': 'purchase', 'value': '3'}, {'action_type': 'link_click', 'value': '6'}]
+    assert first['action_values'] == [{'action_type': 'purchase', 'value': '76.50'}]
+    # Unique-people numbers can't be summed across days, so they aren't carried over
+    assert 'reach' not in first and 'date_start' not in first
+
+    assert second['spend'] == 3 and second['cpm'] == 0 and second['ctr'] == 0
+    assert 'actions' not in second
+
+
+def test_combine_skips_unreadable_numbers():
+    rows = combine_daily_rows([
+        day_row('2025-03-01', '1', 'n/a', '100', None),
+        day_row('2025-03-02', '1', '2', '100', '4')
+    ], 'campaign')
+    assert (rows[0]['spend'], rows[0]['impressions'], rows[0]['clicks']) == (2.0, 200, 4)
+
+
+def test_day_spans_group_consecutive_days():
+    days = [date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 5), date(2025, 3, 3), date(2025, 3, 9)]
+    assert day_spans(days) == [(date(2025, 3, 1), date(2025, 3, 3)), (date(2025, 3, 5), date(2025, 3, 5)),
+                               (date(2025, 3, 9), date(2025, 3, 9))]
+
+
+# A longer range only fetches the days the store doesn't have, plus the settling days
+def test_fetch_range_only_fetches_missing_and_settling_days(tmp_path):
+    store = DailyInsightsStore(db_path=str(tmp_path / 'daily.sqlite'), settling_days=3)
+    today = date(2025, 3, 31)
+    spans = []
+
+    def fetch_rows(fields, params):
+        spans.append((params['time_range']['since'], params['time_range']['until']))
+        assert params['time_increment'] == 1
+        return [day_row(day.isoformat(), '1', '1', '100', '1') for day in
+                [date.fromisoformat(params['time_range']['since'])]]
+
+    params = {'level': 'campaign', 'time_range': {'since': '2025-03-17', 'until': '2025-03-31'}}
+    store.fetch_range('act_1', ['spend'], params, fetch_rows, today=today)
+    assert spans == [('2025-03-17', '2025-03-31')]
+
+    spans.clear()
+    params = {'level': 'campaign', 'time_range': {'since': '2025-03-01', 'until': '2025-03-31'}}
+    rows = store.fetch_range('act_1', ['spend'], params, fetch_rows, today=today)
+    assert spans == [('2025-03-01', '2025-03-16'), ('2025-03-28', '2025-03-31')]
+    assert len(rows) == 1 and rows[0]['spend'] == 3.0  # the first day of each of the three fetches
+
+    daily = store.fetch_range('act_1', ['spend'], params, fetch_rows, today=today, daily=True)
+    assert [row['date_start'] for row in daily] == ['2025-03-01', '2025-03-17', '2025-03-28']
+
+
+def test_refresh_fetches_the_whole_range(tmp_path):
+    store = DailyInsightsStore(db_path=str(tmp_path / 'daily.sqlite'), settling_days=0)
+    spans = []
+
+    def fetch_rows(fields, params):
+        spans.append((params['time_range']['since'], params['time_range']['until']))
+        return []
+
+    params = {'level': 'campaign', 'time_range': {'since': '2025-01-01', 'until': '2025-01-10'}}
+    store.fetch_range('act_1', ['spend'], params, fetch_rows, today=date(2025, 3, 1))
+    store.fetch_range('act_1', ['spend'], params, fetch_rows, today=date(2025, 3, 1))
+    store.fetch_range('act_1', ['spend'], params, fetch_rows, refresh=True, today=date(2025, 3, 1))
+    assert spans == [('2025-01-01', '2025-01-10')] * 2
+
+
+# Days past the retention window are dropped (and fetched again if asked for)
+def test_days_past_the_retention_window_are_pruned(tmp_path):
+    store = DailyInsightsStore(db_path=str(tmp_path / 'daily.sqlite'), settling_days=0, retention_days=10)
+    spans = []
+
+    def fetch_rows(fields, params):
+        spans.append((params['time_range']['since'], params['time_range']['until']))
+        return [day_row(day.isoformat(), '1', '1', '100', '1')
+                for day in days_in_range(params['time_range']['since'], params['time_range']['until'])]
+
+    params = {'level': 'campaign', 'time_range': {'since': '2025-03-01', 'until': '2025-03-10'}}
+    store.fetch_range('act_1', ['spend'], params, fetch_rows, today=date(2025, 3, 10))
+    assert store.prune(today=date(2025, 3, 10)) == 0  # already pruned today
+
+    # Five days later the first five days are past the window
+    assert store.prune(today=date(2025, 3, 15)) == 5
+    signature = query_signature(['spend'], params)
+    assert store.load_rows('act_1', 'campaign', signature, '2025-03-01', '2025-03-05') == []
+    assert len(store.load_rows('act_1', 'campaign', signature, '2025-03-06', '2025-03-10')) == 5
+
+    spans.clear()
+    store.fetch_range('act_1', ['spend'], params, fetch_rows, today=date(2025, 3, 15))
+    assert spans == [('2025-03-01', '2025-03-05')]
+
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from data_table import filter_by_name, page_count, sorted_page
+
+
+@pytest.fixture
+def table():
+    return pd.DataFrame({
+        'campaign_name': pd.Categorical(['Spring Sale', 'Brand', 'spring retargeting', 'Brand', 'Prospecting'] * 3),
+        'ad_name': [f"Ad {i}" for i in range(15)],
+        # Plenty of ties, so the tie order shows
+        'spend': [5.0, 1.0, 5.0, 3.0, 1.0] * 3,
+        'roas': [2.0, 1.5, 3.0, 0.5, 4.0, 1.0, 2.5, 3.5, 0.0, 4.5, 1.2, 2.2, 3.3, 0.2, 4.4]
+    })
+
+
+def test_filter_matches_categorical_names_case_insensitively(table):
+    filtered = filter_by_name(table, '  SPRING ', ['campaign_name'])
+    assert set(filtered['campaign_name']) == {'Spring Sale', 'spring retargeting'}
+    assert len(filtered) == 6
+
+
+def test_filter_checks_every_name_column(table):
+    filtered = filter_by_name(table, 'ad 1', ['campaign_name', 'ad_name'])
+    assert list(filtered['ad_name']) == ['Ad 1', 'Ad 10', 'Ad 11', 'Ad 12', 'Ad 13', 'Ad 14']
+    # Regex characters are matched literally
+    assert filter_by_name(table, 'Ad (1', ['ad_name']).empty
+
+
+def test_empty_query_keeps_every_row(table):
+    assert filter_by_name(table, '', ['campaign_name']) is table
+    assert filter_by_name(table, None, ['campaign_name']) is table
+
+
+def test_page_count():
+    assert page_count(0, 50) == 1
+    assert page_count(50, 50) == 1
+    assert page_count(101, 50) == 3
+
+
+def test_last_page_is_partial(table):
+    page = sorted_page(table, 'roas', False, page=4, page_size=4)
+    assert len(page) == 3
+    assert list(page['roas']) == [0.5, 0.2, 0.0]
+    assert sorted_page(table, 'roas', False, page=5, page_size=4).empty
+
+
+# Paging through a numeric column with ties gives the same rows, in the same
+# order, as one stable sort of the whole table
+@pytest.mark.parametrize('ascending', [True, False])
+@pytest.mark.parametrize('sort_by', ['spend', 'campaign_name'])
+def test_pages_follow_a_stable_sort(table, sort_by, ascending):
+    expected = table.sort_values(sort_by, ascending=ascending, kind='stable')
+    pages = [sorted_page(table, sort_by, ascending, page, 4) for page in range(1, page_count(len(table), 4) + 1)]
+    assert list(pd.concat(pages).index) == list(expected.index)
+
+
+def test_no_sort_column_keeps_the_frame_order(table):
+    assert list(sorted_page(table, None, True, page=2, page_size=5).index) == [5, 6, 7, 8, 9]
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+
+import pytest
+
+import insights_cache
+from cache_backends import DiskBackend, RedisBackend, SQLiteBackend
+from insights_cache import InsightsCache, rows_bytes
+
+ROWS = [{'campaign_id': str(i), 'spend': f"{i * 1.5:.2f}", 'actions': [{'action_type': 'purchase', 'value': '1'}]}
+        for i in range(20)]
+
+
+@pytest.fixture(autouse=True)
+def quick_polls(monkeypatch):
+    monkeypatch.setattr(insights_cache, 'LOCK_POLL_SECONDS', 0.02)
+
+
+# make_backend() -> a new backend object on the same shared store, as another replica would open it
+@pytest.fixture(params=['disk', 'sqlite', 'redis'])
+def make_backend(request, tmp_path):
+    if request.param == 'disk':
+        return lambda: DiskBackend(str(tmp_path / 'insights'), 10 * 1024 * 1024)
+    if request.param == 'sqlite':
+        return lambda: SQLiteBackend(str(tmp_path / 'cache.sqlite'), 'insights', 10 * 1024 * 1024)
+    redis_server = request.getfixturevalue('fake_redis')
+    return lambda: RedisBackend(f"redis://127.0.0.1:{redis_server.server_port}/0", 'insights')
+
+
+# Two replicas miss the same key at once: one fetches, the other waits for its entry
+def test_fill_fetches_once_across_replicas(make_backend):
+    replicas = [InsightsCache(backend=make_backend()), InsightsCache(backend=make_backend())]
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.3)
+        return ROWS
+
+    barrier = threading.Barrier(2)
+    results = [None, None]
+
+    def fill(i):
+        barrier.wait()
+        results[i] = replicas[i].fill('key', load, ttl=60)
+
+    threads = [threading.Thread(target=fill, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert [result['rows'] for result in results] == [ROWS, ROWS]
+    assert results[0]['fetched_at'] == results[1]['fetched_at']
+    assert sorted(replica.stats()['lock_waits'] for replica in replicas) == [0, 1]
+    # The waiter keeps the entry in its own memory tier
+    assert all(replica.get('key') == ROWS for replica in replicas)
+
+
+# The holder writes its entry and releases the lock between the waiter's last
+# read and its next acquire - the waiter must use that entry, not fetch again
+def test_fill_rechecks_after_taking_the_lock(make_backend):
+    holder = InsightsCache(backend=make_backend())
+    backend = make_backend()
+    real_acquire = backend.acquire_lock
+    attempts = []
+
+    def acquire_lock(key, ttl):
+        attempts.append(1)
+        if len(attempts) == 1:
+            return None
+        holder.set(key, ROWS, 60)
+        return real_acquire(key, ttl)
+
+    backend.acquire_lock = acquire_lock
+    waiter = InsightsCache(backend=backend)
+
+    result = waiter.fill('key', lambda: pytest.fail("fetched an entry another replica had just written"), ttl=60)
+
+    assert result['rows'] == ROWS
+    assert len(attempts) == 2
+    # ... and the lock it took is released again
+    token = make_backend().acquire_lock('key', 60)
+    assert token
+
+
+def test_fill_fetches_itself_when_the_holder_is_stuck(make_backend, monkeypatch):
+    monkeypatch.setattr(insights_cache, 'LOCK_SECONDS', 0.2)
+    assert make_backend().acquire_lock('key', 60)  # a replica that took the lock and died
+    cache = InsightsCache(backend=make_backend())
+
+    started = time.monotonic()
+    result = cache.fill('key', lambda: ROWS, ttl=60)
+
+    assert result['rows'] == ROWS
+    assert time.monotonic() - started >= 0.2
+
+
+def test_failed_load_releases_the_lock(make_backend):
+    cache = InsightsCache(backend=make_backend())
+
+    def failing():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        cache.fill('key', failing, ttl=60)
+    assert make_backend().acquire_lock('key', 60)
+
+
+def test_no_backend_just_loads():
+    cache = InsightsCache(backend=None)
+    assert cache.fill('key', lambda: ROWS, ttl=60)['rows'] == ROWS
+    assert cache.get('key') == ROWS
+
+
+# The memory tier is capped by the estimated size of the rows it holds
+def test_memory_tier_evicts_by_bytes():
+    entry_bytes = rows_bytes(ROWS)
+    cache = InsightsCache(backend=None, max_entries=100, max_bytes=int(entry_bytes * 2.5))
+    for key in ('a', 'b', 'c'):
+        cache.set(key, ROWS, 60)
+
+    assert cache.get('a') is None
+    assert cache.get('b') == ROWS and cache.get('c') == ROWS
+    assert cache.stats()['memory_bytes'] <= entry_bytes * 2.5
+
+
+def test_entry_bigger_than_the_memory_cap_goes_to_the_shared_tier_only(tmp_path):
+    cache = InsightsCache(backend=DiskBackend(str(tmp_path), 10 * 1024 * 1024), max_bytes=10)
+    cache.set('key', ROWS, 60)
+
+    assert cache.stats()['memory_bytes'] == 0
+    assert cache.get('key') == ROWS
+    assert os.listdir(tmp_path)
@@ -0,0 +1,148 @@
+import copy
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from insights_frame import COLUMNS, compact_actions, process_insights_data
+
+AVG_ORDER_VALUE = 40.0
+
+
+# The per-row loop process_insights_data replaced, kept here as the reference it must match
+def loop_purchases_and_revenue(actions, action_values=None):
+    purchases = 0
+    revenue = 0
+    if not actions:
+        return purchases, revenue
+    for action in actions:
+        if action.get('action_type', '') in ['purchase', 'app_install', 'complete_registration']:
+            purchases += int(action.get('value', 0))
+    if action_values:
+        for action_value in action_values:
+            if action_value.get('action_type', '') == 'purchase':
+                revenue += float(action_value.get('value', 0))
+    return purchases, revenue
+
+
+def loop_process(insights_list, avg_order_value):
+    processed_data = []
+    for item in insights_list:
+        spend = float(item.get('spend', 0))
+        impressions = int(item.get('impressions', 0))
+        clicks = int(item.get('clicks', 0))
+        purchases, actual_revenue = loop_purchases_and_revenue(item.get('actions', []), item.get('action_values', []))
+        revenue = actual_revenue if actual_revenue > 0 else purchases * avg_order_value
+        processed_data.append({
+            'campaign_id': item.get('campaign_id', ''),
+            'campaign_name': item.get('campaign_name', 'Unknown'),
+            'adset_id': item.get('adset_id', ''),
+            'adset_name': item.get('adset_name', ''),
+            'ad_id': item.get('ad_id', ''),
+            'ad_name': item.get('ad_name', ''),
+            'spend': spend,
+            'impressions': impressions,
+            'clicks': clicks,
+            'purchases': purchases,
+            'revenue': revenue,
+            'actual_revenue': actual_revenue,
+            'roas': revenue / spend if spend > 0 else 0,
+            'cpa': spend / purchases if purchases > 0 else 0,
+            'ctr': (clicks / impressions * 100) if impressions > 0 else 0,
+            'cpm': float(item.get('cpm', 0))
+        })
+    return processed_data
+
+
+def assert_matches_loop(rows):
+    frame = process_insights_data(rows, AVG_ORDER_VALUE)
+    expected = pd.DataFrame(loop_process(rows, AVG_ORDER_VALUE), columns=COLUMNS)
+
+    assert list(frame.columns) == COLUMNS
+    assert len(frame) == len(expected)
+    for column in COLUMNS:
+        if frame[column].dtype.kind in 'if':
+            np.testing.assert_allclose(frame[column].to_numpy(dtype='float64'),
+                                       expected[column].to_numpy(dtype='float64'), err_msg=column)
+        else:
+            assert list(frame[column].astype(str)) == list(expected[column].astype(str)), column
+
+
+def synthetic_rows(count, seed=7):
+    rng = random.Random(seed)
+    action_types = ['purchase', 'app_install', 'complete_registration', 'link_click', 'add_to_cart']
+    rows = []
+    for i in range(count):
+        impressions = rng.choice([0, rng.randint(1, 50000)])
+        row = {
+            'campaign_id': str(i % 7), 'campaign_name': f"Campaign {i % 7}",
+            'adset_id': str(i % 19), 'adset_name': f"Ad set {i % 19}",
+            'ad_id': str(i), 'ad_name': f"Ad {i}",
+            'spend': f"{rng.uniform(0, 500):.2f}" if rng.random() > 0.1 else '0',
+            'impressions': str(impressions),
+            'clicks': str(rng.randint(0, impressions // 10) if impressions else 0),
+            'cpm': f"{rng.uniform(1, 30):.4f}"
+        }
+        if rng.random() > 0.2:
+            row['actions'] = [{'action_type': rng.choice(action_types), 'value': str(rng.randint(1, 9))}
+                              for _ in range(rng.randint(0, 5))]
+        if rng.random() > 0.3:
+            row['action_values'] = [{'action_type': rng.choice(['purchase', 'add_to_cart']), 'value': f"{rng.uniform(1, 300):.2f}"}
+                                    for _ in range(rng.randint(0, 3))]
+        rows.append(row)
+    return rows
+
+
+def test_matches_the_row_loop_on_synthetic_rows():
+    assert_matches_loop(synthetic_rows(2000))
+
+
+@pytest.mark.parametrize('rows', [
+    # No actions or action values at all
+    [{'campaign_id': '1', 'spend': '10', 'impressions': '100', 'clicks': '5'}],
+    # Action values but no actions: no attributed revenue, like the loop
+    [{'campaign_id': '1', 'spend': '10', 'impressions': '100', 'clicks': '5',
+      'action_values': [{'action_type': 'purchase', 'value': '99.5'}]}],
+    # Explicit None / empty lists
+    [{'campaign_id': '1', 'spend': '10', 'impressions': '100', 'clicks': '5', 'actions': None, 'action_values': None},
+     {'campaign_id': '2', 'spend': '10', 'impressions': '100', 'clicks': '5', 'actions': [], 'action_values': []}],
+    # Zero impressions and zero spend
+    [{'campaign_id': '1', 'spend': '0', 'impressions': '0', 'clicks': '0',
+      'actions': [{'action_type': 'purchase', 'value': '2'}]}],
+    # The same purchase type several times, plus other conversion types
+    [{'campaign_id': '1', 'spend': '30', 'impressions': '1000', 'clicks': '20',
+      'actions': [{'action_type': 'purchase', 'value': '2'}, {'action_type': 'purchase', 'value': '3'},
+                  {'action_type': 'app_install', 'value': '1'}, {'action_type': 'link_click', 'value': '50'}],
+      'action_values': [{'action_type': 'purchase', 'value': '20.25'}, {'action_type': 'purchase', 'value': '10'}]}],
+    # Purchases but no purchase value: revenue estimated from the average order value
+    [{'campaign_id': '1', 'spend': '30', 'impressions': '1000', 'clicks': '20',
+      'actions': [{'action_type': 'complete_registration', 'value': '4'}],
+      'action_values': [{'action_type': 'add_to_cart', 'value': '80'}]}],
+    # Missing names and ids
+    [{'spend': '1', 'impressions': '1', 'clicks': '1'}]
+])
+def test_matches_the_row_loop_on_edge_cases(rows):
+    assert_matches_loop(rows)
+
+
+def test_no_rows_is_an_empty_frame():
+    frame = process_insights_data([], AVG_ORDER_VALUE)
+    assert frame.empty and list(frame.columns) == COLUMNS
+
+
+# Async report pages are compacted as they arrive - that must not change the frame
+def test_compacted_rows_process_the_same():
+    rows = synthetic_rows(500, seed=11) + [
+        {'campaign_id': '1', 'spend': '5', 'impressions': '10', 'clicks': '1',
+         'actions': [{'action_type': 'link_click', 'value': '4'}],
+         'action_values': [{'action_type': 'purchase', 'value': '30'}]}
+    ]
+    compacted = compact_actions(copy.deepcopy(rows))
+
+    pd.testing.assert_frame_equal(process_insights_data(compacted, AVG_ORDER_VALUE), process_insights_data(rows, AVG_ORDER_VALUE))
+    # Only purchase types are left, or the one entry that marks a row as having actions
+    for row in compacted:
+        action_types = {entry['action_type'] for entry in row.get('actions') or []}
+        assert action_types <= {'purchase', 'app_install', 'complete_registration'} or len(row['actions']) == 1
+    assert compacted[-1]['actions'] == [{'action_type': 'link_click', 'value': '4'}]
@@ -0,0 +1,17 @@
+from instrumentation import MetricsRegistry
+
+
+def test_prometheus_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.inc('dashboard_reruns_total', client='Tote "n" Carry\\EU\nnew')
+    assert r'dashboard_reruns_total{client="Tote \"n\" Carry\\EU\nnew"} 1' in registry.to_prometheus().splitlines()
+
+
+def test_prometheus_help_is_written_once_per_summary():
+    registry = MetricsRegistry()
+    registry.observe('dashboard_rerun_seconds', 0.5, scope='page')
+    registry.observe('dashboard_rerun_seconds', 0.25, scope='fragment')
+    text = registry.to_prometheus()
+    assert text.count('# TYPE dashboard_rerun_seconds summary') == 1
+    assert 'dashboard_rerun_seconds_sum{scope="page"} 0.5' in text
+    assert 'dashboard_rerun_seconds_count{scope="fragment"} 1' in text
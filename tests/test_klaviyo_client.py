@@ -0,0 +1,135 @@
+from datetime import date
+
+import pytest
+
+import klaviyo_client
+from klaviyo_client import KlaviyoClient, KlaviyoError, parse_retry_after
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+        self.content = b'{}'
+        self.text = str(payload)
+
+    def json(self):
+        return self._payload
+
+
+# Stands in for the client's requests.Session: records every request and answers from a script
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, params=None, json=None, timeout=None):
+        self.requests.append({'method': method, 'url': url, 'params': params, 'json': json})
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def sleeps():
+    return []
+
+
+def make_client(responses, sleeps):
+    client = KlaviyoClient('pk_test', base_url='https://klaviyo.test/api', sleep=sleeps.append)
+    client.session = FakeSession(responses)
+    return client
+
+
+def report(*results):
+    return FakeResponse(200, {'data': {'type': 'campaign-values-report', 'attributes': {'results': list(results)}}})
+
+
+def test_campaign_values_post_body(sleeps):
+    client = make_client([report()], sleeps)
+    client.get_campaign_values(date(2025, 3, 1), date(2025, 3, 7), conversion_metric_id='PLACEDORDER')
+
+    request = client.session.requests[0]
+    assert request['method'] == 'POST' and request['url'] == 'https://klaviyo.test/api/campaign-values-reports/'
+    attributes = request['json']['data']['attributes']
+    assert request['json']['data']['type'] == 'campaign-values-report'
+    assert attributes['timeframe'] == {'value': {'start': '2025-03-01T00:00:00', 'end': '2025-03-07T23:59:59'}}
+    assert attributes['statistics'] == klaviyo_client.CAMPAIGN_REPORT_STATISTICS
+    assert attributes['conversion_metric_id'] == 'PLACEDORDER'
+    assert attributes['filter'] == "equals(send_channel,'email')"
+
+
+# A campaign with several messages comes back as several rows, summed here;
+# without a metric id the "Placed Order" metric is looked up first
+def test_campaign_values_are_summed_per_campaign(sleeps):
+    metrics = FakeResponse(200, {'data': [{'id': 'OPENED', 'attributes': {'name': 'Opened Email'}},
+                                          {'id': 'PLACED', 'attributes': {'name': 'Placed Order'}}],
+                                 'links': {'next': None}})
+    client = make_client([metrics, report(
+        {'groupings': {'campaign_id': 'C1'}, 'statistics': {'recipients': 100, 'delivered': 98, 'conversion_value': 12.5}},
+        {'groupings': {'campaign_id': 'C1'}, 'statistics': {'recipients': 50, 'delivered': 49, 'conversion_value': None}},
+        {'groupings': {'campaign_id': 'C2'}, 'statistics': {'recipients': 10}}
+    )], sleeps)
+
+    values = client.get_campaign_values(date(2025, 3, 1), date(2025, 3, 7))
+
+    assert client.session.requests[1]['json']['data']['attributes']['conversion_metric_id'] == 'PLACED'
+    assert (values['C1']['recipients'], values['C1']['delivered'], values['C1']['conversion_value']) == (150, 147, 12.5)
+    assert values['C2']['recipients'] == 10 and values['C2']['opens_unique'] == 0
+
+
+def test_429_waits_for_retry_after(sleeps):
+    client = make_client([
+        FakeResponse(429, {'errors': []}, {'Retry-After': '2'}),
+        FakeResponse(429, {'errors': []}, {'Retry-After': '0.5'}),
+        report()
+    ], sleeps)
+    assert client.get_campaign_values(date(2025, 3, 1), date(2025, 3, 7), conversion_metric_id='M') == {}
+    assert sleeps == [2.0, 0.5]
+    assert len(client.session.requests) == 3
+
+
+def test_gives_up_after_max_retries(sleeps):
+    throttled = [FakeResponse(429, {'errors': []}, {'Retry-After': '1'}) for _ in range(klaviyo_client.MAX_RETRIES + 1)]
+    client = make_client(throttled, sleeps)
+    with pytest.raises(KlaviyoError) as error:
+        client.get_campaign_values(date(2025, 3, 1), date(2025, 3, 7), conversion_metric_id='M')
+    assert error.value.status_code == 429
+    assert len(sleeps) == klaviyo_client.MAX_RETRIES
+
+
+def test_retry_after_formats():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0  # in the past
+
+
+# The query string goes on the first request only - links.next already carries it
+def test_pagination_follows_links_next(sleeps):
+    client = make_client([
+        FakeResponse(200, {'data': [{'id': '1'}, {'id': '2'}], 'links': {'next': 'https://klaviyo.test/api/campaigns/?page[cursor]=b'}}),
+        FakeResponse(200, {'data': [{'id': '3'}], 'links': {'next': 'https://klaviyo.test/api/campaigns/?page[cursor]=c'}}),
+        FakeResponse(200, {'data': [], 'links': {'next': None}})
+    ], sleeps)
+
+    campaigns = client.get_campaigns(date(2025, 3, 1), date(2025, 3, 7))
+
+    assert [campaign['id'] for campaign in campaigns] == ['1', '2', '3']
+    requests = client.session.requests
+    assert [request['url'] for request in requests] == [
+        'https://klaviyo.test/api/campaigns/',
+        'https://klaviyo.test/api/campaigns/?page[cursor]=b',
+        'https://klaviyo.test/api/campaigns/?page[cursor]=c'
+    ]
+    assert 'greater-than(send_time,2025-03-01)' in requests[0]['params']['filter']
+    assert requests[1]['params'] is None and requests[2]['params'] is None
+
+
+def test_pages_through_the_fake_api(fake_api):
+    client = KlaviyoClient('pk_test', base_url=f"http://127.0.0.1:{fake_api.server_port}/api")
+    campaigns = client.get_campaigns(date(2025, 3, 1), date(2025, 3, 7))
+
+    config = fake_api.state.config
+    assert len(campaigns) == config.klaviyo_campaigns
+    assert len({campaign['id'] for campaign in campaigns}) == config.klaviyo_campaigns
+    assert fake_api.state.stats()['calls']['klaviyo_campaigns_page'] == config.klaviyo_campaigns // config.klaviyo_page_size
@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+
+import pytest
+from facebook_business.exceptions import FacebookRequestError
+
+import rate_limiter
+from rate_limiter import (
+    RateLimitScheduler, account_for_path, endpoint_for_path, parse_usage_headers
+)
+
+
+class FakeResponse:
+    def __init__(self, headers=None):
+        self._headers = headers or {}
+
+    def headers(self):
+        return self._headers
+
+
+def usage_headers(pct, regain_minutes=0):
+    return {'x-business-use-case-usage': json.dumps({'1001': [{
+        'type': 'ads_insights', 'call_count': pct, 'total_cputime': 0, 'total_time': 0,
+        'estimated_time_to_regain_access': regain_minutes
+    }]})}
+
+
+def graph_error(code, headers=None):
+    return FacebookRequestError(
+        "error", {'method': 'GET', 'path': '/act_1001/insights'}, 400, headers or {},
+        json.dumps({'error': {'message': 'error', 'code': code}})
+    )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return RateLimitScheduler(sleep=clock.sleep, clock=clock)
+
+
+def test_paths_map_to_accounts_and_endpoints():
+    assert account_for_path('https://graph.facebook.com/v21.0/act_1001/insights') == 'act_1001'
+    assert account_for_path(('act_1001', 'insights')) == 'act_1001'
+    assert account_for_path('/v21.0/900000000000001') == rate_limiter.OTHER_BUCKET
+    assert endpoint_for_path('/v21.0/act_1001/insights?limit=500') == 'insights'
+    assert endpoint_for_path('/v21.0/900000000000001') == 'object'
+
+
+def test_usage_headers_take_the_highest_reading():
+    headers = {
+        'X-Ad-Account-Usage': json.dumps({'acc_id_util_pct': 20, 'reset_time_duration': 30}),
+        'x-fb-ads-insights-throttle': json.dumps({'acc_id_util_pct': 55, 'app_id_util_pct': 10}),
+        **usage_headers(40, regain_minutes=2)
+    }
+    assert parse_usage_headers(headers) == {'usage_pct': 55.0, 'regain_seconds': 120.0}
+    assert parse_usage_headers({'content-type': 'application/json'}) is None
+    assert parse_usage_headers({'x-ad-account-usage': 'not json'}) is None
+
+
+def test_calls_go_straight_through_under_the_soft_limit(scheduler, clock):
+    scheduler.run('act_1001', lambda: FakeResponse(usage_headers(30)))
+    scheduler.run('act_1001', lambda: FakeResponse(usage_headers(30)))
+    assert clock.sleeps == []
+    assert scheduler.snapshot()['act_1001'] == {'usage_pct': 30.0, 'regain_in': 0, 'calls': 2, 'throttled': 0}
+
+
+# Between the soft and hard limits calls are spread out, more the closer to the limit
+def test_calls_are_spaced_out_near_the_limit(scheduler, monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, 'uniform', lambda low, high: high)
+    scheduler.record('act_1001', usage_headers(rate_limiter.USAGE_SOFT_LIMIT))
+    assert scheduler.delay_for('act_1001') == 0
+
+    halfway = (rate_limiter.USAGE_SOFT_LIMIT + rate_limiter.USAGE_HARD_LIMIT) / 2
+    scheduler.record('act_1001', usage_headers(halfway))
+    assert scheduler.delay_for('act_1001') == pytest.approx(rate_limiter.MAX_SPREAD_DELAY / 2)
+    assert scheduler.delay_for('act_other') == 0
+
+
+def test_over_the_hard_limit_waits_for_the_budget_to_recover(scheduler, clock):
+    scheduler.record('act_1001', usage_headers(99, regain_minutes=2))
+    assert scheduler.delay_for('act_1001') == pytest.approx(120)
+
+    scheduler.record('act_1001', usage_headers(99, regain_minutes=60))
+    assert scheduler.delay_for('act_1001') == rate_limiter.MAX_WAIT
+
+    scheduler.record('act_1001', usage_headers(99))
+    assert scheduler.delay_for('act_1001') == rate_limiter.HARD_LIMIT_WAIT
+
+    scheduler.run('act_1001', lambda: FakeResponse(usage_headers(10)))
+    assert clock.sleeps == [rate_limiter.HARD_LIMIT_WAIT]
+
+
+def test_throttle_errors_are_retried_with_backoff(scheduler, clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, 'uniform', lambda low, high: high)
+    outcomes = [graph_error(80004), graph_error(17), FakeResponse(usage_headers(10))]
+
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert isinstance(scheduler.run('act_1001', call), FakeResponse)
+    assert clock.sleeps == [rate_limiter.BACKOFF_BASE, rate_limiter.BACKOFF_BASE * 2]
+    assert scheduler.snapshot()['act_1001']['throttled'] == 2
+
+
+def test_other_errors_are_not_retried(scheduler, clock):
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise graph_error(100)
+
+    with pytest.raises(FacebookRequestError):
+        scheduler.run('act_1001', call)
+    assert len(calls) == 1 and clock.sleeps == []
+
+
+def test_gives_up_after_max_retries(scheduler):
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise graph_error(80004)
+
+    with pytest.raises(FacebookRequestError):
+        scheduler.run('act_1001', call)
+    assert len(calls) == rate_limiter.MAX_RETRIES + 1
+
+
+def test_concurrent_calls_per_account_are_capped():
+    scheduler = RateLimitScheduler(max_concurrent=2)
+    lock = threading.Lock()
+    running = {'act_1001': 0, 'act_2002': 0}
+    peak = {'act_1001': 0, 'act_2002': 0}
+
+    def call(account_id):
+        with lock:
+            running[account_id] += 1
+            peak[account_id] = max(peak[account_id], running[account_id])
+        time.sleep(0.05)
+        with lock:
+            running[account_id] -= 1
+        return FakeResponse()
+
+    threads = [
+        threading.Thread(target=scheduler.run, args=(account_id, lambda account_id=account_id: call(account_id)))
+        for account_id in ['act_1001'] * 6 + ['act_2002'] * 6
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == {'act_1001': 2, 'act_2002': 2}
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from insights_frame import enforce_dtypes
+from recommendations import ACTION_COLUMNS, DEFAULT_THRESHOLDS, evaluate_rules, resolve_thresholds
+
+
+def frame(rows):
+    return enforce_dtypes(pd.DataFrame([{'campaign_name': 'Campaign', **row} for row in rows]))
+
+
+def test_first_matching_rule_wins():
+    # Both a great CPA (SCALE) and high CPM + low CTR (AUDIENCE ISSUE) - SCALE comes first
+    adsets = frame([{'adset_name': 'both', 'spend': 100, 'purchases': 5, 'cpa': 20, 'cpm': 80, 'ctr': 0.5},
+                    {'adset_name': 'audience', 'spend': 10, 'purchases': 0, 'cpa': 0, 'cpm': 80, 'ctr': 0.5}])
+    actions = evaluate_rules(adsets, 'adset')
+    assert dict(zip(actions['name'], actions['action'])) == {'both': 'SCALE AD SET', 'audience': 'AUDIENCE ISSUE'}
+
+    # A good CTR with many impressions is a winner even with no purchases (not a landing page issue)
+    ads = frame([{'ad_name': 'winner', 'spend': 50, 'impressions': 5000, 'ctr': 3.0, 'purchases': 0},
+                 {'ad_name': 'landing', 'spend': 50, 'impressions': 500, 'ctr': 1.8, 'purchases': 0}])
+    actions = evaluate_rules(ads, 'ad')
+    assert dict(zip(actions['name'], actions['action'])) == {'winner': 'WINNING CREATIVE', 'landing': 'LANDING PAGE ISSUE'}
+
+
+def test_rows_matching_no_rule_are_left_out():
+    campaigns = frame([{'campaign_name': 'steady', 'spend': 40, 'roas': 3.0, 'purchases': 2}])
+    actions = evaluate_rules(campaigns, 'campaign')
+    assert actions.empty and list(actions.columns) == ACTION_COLUMNS
+    assert evaluate_rules(frame([]), 'campaign').empty
+
+
+@pytest.mark.parametrize('level, rows, order', [
+    # Campaigns: highest ROAS first
+    ('campaign', [{'campaign_name': 'a', 'roas': 1.0, 'spend': 100}, {'campaign_name': 'b', 'roas': 6.0, 'purchases': 9},
+                  {'campaign_name': 'c', 'roas': 5.0, 'purchases': 9}], ['b', 'c', 'a']),
+    # Ad sets: lowest CPA first (ties keep their order)
+    ('adset', [{'adset_name': 'a', 'cpa': 25, 'purchases': 1}, {'adset_name': 'b', 'cpa': 5, 'purchases': 1},
+               {'adset_name': 'c', 'cpa': 25, 'purchases': 1}], ['b', 'a', 'c']),
+    # Ads: highest CTR first
+    ('ad', [{'ad_name': 'a', 'ctr': 0.2, 'spend': 30}, {'ad_name': 'b', 'ctr': 4.0, 'impressions': 2000},
+            {'ad_name': 'c', 'ctr': 2.5, 'impressions': 2000}], ['b', 'c', 'a'])
+])
+def test_actions_are_ranked_by_level_priority(level, rows, order):
+    assert list(evaluate_rules(frame(rows), level)['name']) == order
+
+
+def test_detail_uses_the_row_metrics():
+    campaigns = frame([{'campaign_name': 'poor', 'roas': 1.25, 'spend': 80}])
+    row = evaluate_rules(campaigns, 'campaign').iloc[0]
+    assert (row['action'], row['kind'], row['icon']) == ('PAUSE CAMPAIGN', 'error', '❌')
+    assert row['detail'] == "Poor performance: 1.25x ROAS after $80.00 spend"
+
+
+def test_client_overrides_change_the_thresholds():
+    thresholds = resolve_thresholds({'campaign_pause_min_spend': 500})
+    assert thresholds['campaign_pause_min_spend'] == 500
+    assert thresholds['campaign_scale_min_roas'] == DEFAULT_THRESHOLDS['campaign_scale_min_roas']
+
+    campaigns = frame([{'campaign_name': 'poor', 'roas': 1.25, 'spend': 80}])
+    assert evaluate_rules(campaigns, 'campaign', thresholds).empty
+    assert resolve_thresholds() == DEFAULT_THRESHOLDS
+
+
+def test_unknown_threshold_names_are_rejected():
+    with pytest.raises(ValueError, match='campaign_pause_min_spnd'):
+        resolve_thresholds({'campaign_pause_min_spnd': 500})
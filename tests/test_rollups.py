@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from benchmarks.fake_api import insights_rows
+from insights_frame import process_insights_data
+from rollups import rollup_insights
+
+AVG_ORDER_VALUE = 40.0
+NUMERIC_COLUMNS = ['spend', 'impressions', 'clicks', 'purchases', 'revenue', 'actual_revenue', 'roas', 'cpa', 'ctr', 'cpm']
+
+
+# Campaigns and ad sets summed from the ad rows match what the level queries return
+@pytest.mark.parametrize('level, key', [('campaign', 'campaign_id'), ('adset', 'adset_id')])
+def test_rollups_match_the_level_fetches(level, key):
+    ad_rows = insights_rows('act_1001', 'ad', '2025-03-01', '2025-03-07', False, 60)
+    level_rows = insights_rows('act_1001', level, '2025-03-01', '2025-03-07', False, 60)
+
+    rolled = rollup_insights(process_insights_data(ad_rows, AVG_ORDER_VALUE), level).sort_values(key).reset_index(drop=True)
+    fetched = process_insights_data(level_rows, AVG_ORDER_VALUE).sort_values(key).reset_index(drop=True)
+
+    assert len(rolled) > 1 and list(rolled[key]) == list(fetched[key])
+    assert list(rolled['campaign_name'].astype(str)) == list(fetched['campaign_name'].astype(str))
+    for column in NUMERIC_COLUMNS:
+        np.testing.assert_allclose(rolled[column].to_numpy(dtype='float64'), fetched[column].to_numpy(dtype='float64'),
+                                   rtol=1e-9, atol=1e-6, err_msg=column)
+
+
+# Ratios come from the summed totals - not summed or averaged across ads
+def test_ratios_are_recomputed_from_the_totals():
+    ads = process_insights_data([
+        {'campaign_id': '1', 'campaign_name': 'A', 'ad_id': '1', 'spend': '90', 'impressions': '1000', 'clicks': '100',
+         'cpm': '90', 'actions': [{'action_type': 'purchase', 'value': '3'}],
+         'action_values': [{'action_type': 'purchase', 'value': '270'}]},
+        {'campaign_id': '1', 'campaign_name': 'A', 'ad_id': '2', 'spend': '10', 'impressions': '9000', 'clicks': '90',
+         'cpm': '1.11', 'actions': [{'action_type': 'purchase', 'value': '1'}],
+         'action_values': [{'action_type': 'purchase', 'value': '10'}]}
+    ], AVG_ORDER_VALUE)
+
+    campaign = rollup_insights(ads, 'campaign').iloc[0]
+
+    assert (campaign['spend'], campaign['impressions'], campaign['clicks'], campaign['purchases']) == (100, 10000, 190, 4)
+    assert campaign['roas'] == pytest.approx(280 / 100)
+    assert campaign['cpa'] == pytest.approx(100 / 4)
+    assert campaign['ctr'] == pytest.approx(190 / 10000 * 100)
+    assert campaign['cpm'] == pytest.approx(100 / 10000 * 1000)
+
+
+def test_no_ads_is_an_empty_rollup():
+    assert rollup_insights(process_insights_data([], AVG_ORDER_VALUE), 'adset').empty
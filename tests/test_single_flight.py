@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import CoalescedTimeout, SingleFlight
+
+
+# Runs flight.do(key, fn) on n threads that all start together; returns their outcomes
+def run_together(flight, key, fn, n):
+    barrier = threading.Barrier(n)
+    outcomes = [None] * n
+
+    def worker(i):
+        barrier.wait()
+        try:
+            outcomes[i] = ('ok', flight.do(key, fn))
+        except Exception as e:
+            outcomes[i] = ('error', e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return ['row']
+
+    outcomes = run_together(flight, 'key', fetch, 8)
+
+    assert len(calls) == 1
+    assert outcomes == [('ok', ['row'])] * 8
+    assert flight.stats() == {'leaders': 1, 'coalesced': 7, 'in_flight': 0}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.stats()['leaders'] == 2
+
+
+# Every waiter sees the leader's error, and the next call runs again
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.2)
+        raise RuntimeError('upstream down')
+
+    outcomes = run_together(flight, 'key', failing, 4)
+
+    assert [kind for kind, _ in outcomes] == ['error'] * 4
+    assert all(str(error) == 'upstream down' for _, error in outcomes)
+    assert not flight.in_flight('key')
+    assert flight.do('key', lambda: 'recovered') == 'recovered'
+
+
+def test_waiter_gives_up_after_its_timeout():
+    flight = SingleFlight()
+    release = threading.Event()
+    flight.start('key', release.wait)
+    try:
+        with pytest.raises(CoalescedTimeout):
+            flight.do('key', lambda: 'never runs', timeout=0.05)
+    finally:
+        release.set()
+
+
+def test_start_runs_in_the_background_once():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        release.wait(5)
+        return 'fresh'
+
+    flight.start('key', refresh)
+    flight.start('key', refresh)
+    assert flight.in_flight('key')
+
+    # A caller arriving meanwhile waits for the background run's result
+    waiter = []
+    thread = threading.Thread(target=lambda: waiter.append(flight.do('key', lambda: 'own fetch')))
+    thread.start()
+    time.sleep(0.05)
+    release.set()
+    thread.join(5)
+
+    assert waiter == ['fresh']
+    assert len(calls) == 1
+    assert not flight.in_flight('key')
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from trends import TREND_ADDITIVE, bucket_days_for, top_campaigns, trend_series
+
+SINCE, UNTIL = '2024-12-31', '2025-01-12'  # 13 days
+
+
+# Campaign i spends (i + 1) x the day of the month, with revenue, impressions and clicks to match
+@pytest.fixture
+def daily_df():
+    rows = []
+    for day in pd.date_range(SINCE, UNTIL):
+        for i in range(4):
+            rows.append({
+                'date': day, 'campaign_id': str(i), 'campaign_name': f"Campaign {i}",
+                'spend': float((i + 1) * day.day), 'revenue': float(day.day * (4 - i)),
+                'impressions': 1000 * (i + 1), 'clicks': 10 * (i + 1)
+            })
+    return pd.DataFrame(rows)
+
+
+def test_bucket_days_keep_points_under_the_cap():
+    assert bucket_days_for('2025-01-01', '2025-04-01', max_points=91) == 1
+    assert bucket_days_for('2024-01-01', '2024-12-31', max_points=91) == 5
+    assert bucket_days_for(SINCE, UNTIL, max_points=5) == 3
+
+
+def test_top_campaigns_rank_ratios_from_the_summed_totals(daily_df):
+    assert top_campaigns(daily_df, 'spend', 2) == ['3', '2']
+    assert top_campaigns(daily_df, 'roas', 2) == ['0', '1']
+
+
+# Buckets end on `until`; the first one is clipped to `since` and holds fewer days
+def test_buckets_end_on_the_last_day(daily_df):
+    trend_df, bucket_days = trend_series(daily_df, SINCE, UNTIL, top_n=4, max_points=5)
+    line = trend_df[trend_df['series'] == 'Campaign 3']
+
+    assert bucket_days == 3
+    assert list(line['date'].dt.strftime('%Y-%m-%d')) == ['2024-12-31', '2025-01-01', '2025-01-04', '2025-01-07', '2025-01-10']
+    assert list(line['days']) == [1, 3, 3, 3, 3]
+    # The short bucket is the real one day's total, not scaled up
+    assert list(line['spend']) == [4 * 31, 4 * (1 + 2 + 3), 4 * (4 + 5 + 6), 4 * (7 + 8 + 9), 4 * (10 + 11 + 12)]
+
+
+def test_series_reconcile_with_the_daily_rows(daily_df):
+    trend_df, bucket_days = trend_series(daily_df, SINCE, UNTIL, top_n=2, max_points=5)
+
+    assert list(trend_df['series'].unique()) == ['Campaign 3', 'Campaign 2', 'Other campaigns (2)']
+    for column in TREND_ADDITIVE:
+        assert trend_df[column].sum() == pytest.approx(daily_df[column].sum())
+
+    # "Other" is everything but the top campaigns, point by point
+    per_point = trend_df.groupby('date')['spend'].sum()
+    top = trend_df[trend_df['series'] != 'Other campaigns (2)'].groupby('date')['spend'].sum()
+    other = trend_df[trend_df['series'] == 'Other campaigns (2)'].set_index('date')['spend']
+    assert list(other) == pytest.approx(list(per_point - top))
+    assert other.sum() == pytest.approx(daily_df[daily_df['campaign_id'].isin(['0', '1'])]['spend'].sum())
+
+    # Ratios come from the bucket's sums
+    point = trend_df.iloc[1]
+    assert point['roas'] == pytest.approx(point['revenue'] / point['spend'])
+    assert point['ctr'] == pytest.approx(point['clicks'] / point['impressions'] * 100)
+
+
+def test_daily_range_has_one_point_per_day(daily_df):
+    trend_df, bucket_days = trend_series(daily_df, SINCE, UNTIL, top_n=1)
+    assert bucket_days == 1
+    assert len(trend_df) == 2 * 13 and set(trend_df['days']) == {1}
@@ -0,0 +1,115 @@
+# Daily trend series for the charts, built from time_increment=1 campaign rows
+# Everything is aggregated here, before it reaches the browser, so a chart's size
+# doesn't grow with the account: only the top campaigns by the chosen metric get
+# their own line (the rest are summed into one "Other" line), and ranges longer
+# than TREND_MAX_POINTS days are bucketed into multi-day points.
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from insights_frame import process_insights_data
+from pipeline import DATE_PRESETS, preset_date_range
+
+TREND_TOP_N = int(os.environ.get("DASHBOARD_TREND_TOP_N", 8))
+TREND_MAX_TOP_N = 25
+# Points per line - every preset range stays daily (a preset counts both its
+# first and last day, so "Last 90 Days" is 91 days); a year becomes 5-day buckets
+PRESET_MAX_DAYS = max((end - start).days + 1 for start, end in map(preset_date_range, DATE_PRESETS))
+TREND_MAX_POINTS = int(os.environ.get("DASHBOARD_TREND_MAX_POINTS", PRESET_MAX_DAYS))
+
+# Metric -> axis label
+TREND_METRICS = {
+    'spend': "Spend ($)",
+    'revenue': "Revenue ($)",
+    'roas': "ROAS (x)",
+    'ctr': "CTR (%)"
+}
+
+# Summed per day / bucket; the ratios are recomputed from these, never averaged
+TREND_ADDITIVE = ['spend', 'revenue', 'impressions', 'clicks']
+
+DAILY_COLUMNS = ['date', 'campaign_id', 'campaign_name'] + TREND_ADDITIVE
+
+
+# One row per campaign per day, with the dashboard's revenue rules (actual purchase
+# value, or purchases x AOV)
+def daily_frame(daily_rows, avg_order_value):
+    df = process_insights_data(daily_rows, avg_order_value)
+    if df.empty:
+        return pd.DataFrame({column: pd.Series(dtype='float64') for column in DAILY_COLUMNS})
+    # process_insights_data keeps row order, so dates line up with the rows
+    df['date'] = pd.to_datetime([row.get('date_start') for row in daily_rows])
+    df['campaign_name'] = df['campaign_name'].astype(str)
+    return df[DAILY_COLUMNS]
+
+
+def _add_ratios(df):
+    spend = df['spend'].to_numpy(dtype='float64')
+    impressions = df['impressions'].to_numpy(dtype='float64')
+    # Days with nothing to divide by are gaps in the line, not zeros
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['roas'] = np.where(spend > 0, df['revenue'].to_numpy(dtype='float64') / spend, np.nan)
+        df['ctr'] = np.where(impressions > 0, df['clicks'].to_numpy(dtype='float64') / impressions * 100, np.nan)
+    return df
+
+
+# Campaign ids of the top_n campaigns by metric over the whole range
+def top_campaigns(daily_df, metric, top_n):
+    totals = _add_ratios(
+        daily_df.groupby('campaign_id', sort=False)[TREND_ADDITIVE].sum()
+    )
+    ranked = totals[metric].dropna()
+    return list(ranked.nlargest(top_n).index)
+
+
+# Days per point so a range never has more than max_points points per line
+def bucket_days_for(since, until, max_points=TREND_MAX_POINTS):
+    days = (pd.Timestamp(until) - pd.Timestamp(since)).days + 1
+    return max(1, math.ceil(days / max_points))
+
+
+# Long frame: series, date, days, spend, revenue, impressions, clicks, roas, ctr - one
+# row per line per point, at most (top_n + 1) x max_points rows. Buckets end on the
+# last day, so the latest point is always a full bucket; when the range doesn't
+# divide evenly the first one is short. Sums are always the real totals of the days
+# in the bucket - `days` says how many that is, so the chart can mark a short one.
+# Dates are the first day of each bucket; days with no delivery are zeros (spend)
+# or gaps (ratios).
+def trend_series(daily_df, since, until, rank_by='spend', top_n=TREND_TOP_N, max_points=TREND_MAX_POINTS):
+    since = pd.Timestamp(since).normalize()
+    until = pd.Timestamp(until).normalize()
+    bucket_days = bucket_days_for(since, until, max_points)
+    if daily_df.empty:
+        return pd.DataFrame(columns=['series', 'date', 'days'] + TREND_ADDITIVE + ['roas', 'ctr']), bucket_days
+
+    top_ids = top_campaigns(daily_df, rank_by, top_n)
+    names = daily_df.drop_duplicates('campaign_id').set_index('campaign_id')['campaign_name']
+    # Two campaigns can share a name - those get their id added so they stay two lines
+    duplicated = names[top_ids][names[top_ids].duplicated(keep=False)].index
+    labels = {
+        campaign_id: f"{names[campaign_id]} ({campaign_id})" if campaign_id in duplicated else names[campaign_id]
+        for campaign_id in top_ids
+    }
+    other_count = daily_df['campaign_id'].nunique() - len(top_ids)
+    other_label = f"Other campaigns ({other_count})"
+
+    series = daily_df['campaign_id'].map(labels).fillna(other_label)
+    # Buckets counted back from `until`; the oldest one starts at `since` at the earliest
+    offset = (until - daily_df['date']).dt.days // bucket_days
+    bucket_start = (until - pd.to_timedelta((offset + 1) * bucket_days - 1, unit='D')).clip(lower=since)
+    grouped = daily_df[TREND_ADDITIVE].groupby([series.rename('series'), bucket_start.rename('date')]).sum()
+
+    # Every line gets every point, so a campaign that stopped shows as zero spend
+    ordered_series = [labels[campaign_id] for campaign_id in top_ids] + ([other_label] if other_count > 0 else [])
+    total_days = (until - since).days + 1
+    bucket_count = math.ceil(total_days / bucket_days)
+    buckets = [max(since, until - pd.Timedelta(days=(k + 1) * bucket_days - 1)) for k in reversed(range(bucket_count))]
+    full_index = pd.MultiIndex.from_product([ordered_series, buckets], names=['series', 'date'])
+    trend_df = grouped.reindex(full_index, fill_value=0).reset_index()
+
+    first_days = total_days - (bucket_count - 1) * bucket_days
+    trend_df.insert(2, 'days', np.where(trend_df['date'] == buckets[0], first_days, bucket_days))
+    return _add_ratios(trend_df), bucket_days